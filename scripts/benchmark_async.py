@@ -0,0 +1,124 @@
+'''
+Compares the throughput of the synchronous request path on a thread pool with the asyncio request path, serving
+getThing requests from a repository that waits a simulated I/O latency on each call.
+
+Run from the repository root with: python -m scripts.benchmark_async [requests] [latencyMilliseconds]
+'''
+import asyncio
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from src.commons.api_gateway import APIGateway
+from src.thing.async_authorizer import AsyncAuthorizer
+from src.thing.async_lambda_mapper import AsyncLambdaMapper
+from src.thing.async_logic import AsyncLogic
+from src.thing.async_repository import AsyncRepository
+from src.thing.authorizer import Authorizer
+from src.thing.lambda_mapper import LambdaMapper
+from src.thing.logic import Logic
+from src.thing.repository import Repository
+
+CONCURRENCIES = (10, 100, 1000)
+EVENT = {
+    'httpMethod': 'GET',
+    'path': '/thing/001',
+    'headers': {'Host': 'localhost', 'X-Forwarded-Proto': 'http', 'X-Forwarded-Port': '80'},
+    'requestContext': {
+        'authorizer': {'principalId': json.dumps({'organizationId': 'ORG001', 'roles': ['ROLE_THING_USER']})}
+    },
+    'pathParameters': {'uuid': '001'}
+}
+
+
+class SlowRepository:
+    'Repository waiting latency seconds before each getThing, like a remote backend'
+
+    def __init__(self, repository, latency):
+        self.repository = repository
+        self.latency = latency
+
+    def getThing(self, uuid):
+        time.sleep(self.latency)
+        return self.repository.getThing(uuid)
+
+
+class AsyncSlowRepository:
+    'Natively asynchronous repository awaiting latency seconds before each getThing'
+
+    def __init__(self, repository, latency):
+        self.repository = repository
+        self.latency = latency
+
+    async def getThing(self, uuid):
+        await asyncio.sleep(self.latency)
+        return self.repository.getThing(uuid)
+
+
+def apiGatewayFactory(event):
+    return APIGateway(logging.getLogger, event)
+
+
+def runThreads(repository, requests, threads):
+    logic = Logic(logging.getLogger, repository)
+    mapper = LambdaMapper(logging.getLogger, apiGatewayFactory, Authorizer(logging.getLogger, logic))
+    with ThreadPoolExecutor(threads) as executor:
+        responses = list(executor.map(lambda i: mapper.getThing(EVENT), range(requests)))
+    assert all(response['statusCode'] == 200 for response in responses)
+
+
+def runAsyncio(repository, requests, concurrency):
+    logic = AsyncLogic(logging.getLogger, repository)
+    mapper = AsyncLambdaMapper(logging.getLogger, apiGatewayFactory, AsyncAuthorizer(logging.getLogger, logic))
+
+    async def getThing(semaphore):
+        async with semaphore:
+            return await mapper.getThing(EVENT)
+
+    async def getAll():
+        # built in the coroutine, so that it is bound to the running loop on Python 3.6 too
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(getThing(semaphore) for i in range(requests)))
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        responses = loop.run_until_complete(getAll())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert all(response['statusCode'] == 200 for response in responses)
+
+
+def measure(name, concurrency, requests, run):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print('{0:<22} concurrency={1:<5} {2:>10.0f} requests/s'.format(name, concurrency, requests / elapsed))
+
+
+def main(requests, latency):
+    repository = Repository(logging.getLogger)
+    for concurrency in CONCURRENCIES:
+        measure('sync thread pool', concurrency, requests, partial(
+            runThreads, SlowRepository(repository, latency), requests, concurrency
+        ))
+        measure('asyncio', concurrency, requests, partial(
+            runAsyncio, AsyncSlowRepository(repository, latency), requests, concurrency
+        ))
+        with ThreadPoolExecutor(concurrency) as executor:
+            measure('asyncio over executor', concurrency, requests, partial(
+                runAsyncio,
+                AsyncRepository(logging.getLogger, SlowRepository(repository, latency), executor),
+                requests,
+                concurrency
+            ))
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        (float(sys.argv[2]) if len(sys.argv) > 2 else 10) / 1000
+    )
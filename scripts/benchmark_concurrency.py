@@ -0,0 +1,71 @@
+'''
+Measures the throughput of a mixed read and write workload on the thing Repository with 1 to 32 threads.
+
+Run from the repository root with: python -m scripts.benchmark_concurrency [operations] [shards]
+'''
+import logging
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from src.commons.nsp_error import NspError
+from src.thing.repository import Repository
+
+THINGS = 10000
+OWNERS = 100
+THREADS = (1, 2, 4, 8, 16, 32)
+
+
+def createThing(i):
+    now = datetime.now()
+    return {
+        'uuid': '{0:08d}'.format(i),
+        'owner': 'ORG{0:03d}'.format(i % OWNERS),
+        'name': 'Thing {0}'.format(i),
+        'description': 'Description of thing {0}'.format(i),
+        'created': now,
+        'lastModified': now
+    }
+
+
+def work(repository, operations, seed):
+    'Runs operations reads (80%) and compare-and-set updates (20%) of random things'
+    rnd = random.Random(seed)
+    for i in range(operations):
+        uuid = '{0:08d}'.format(rnd.randrange(THINGS))
+        thing = repository.getThing(uuid)
+        if rnd.random() < 0.2:
+            try:
+                repository.updateThing(
+                    dict(thing, name='Thing {0}'.format(i), lastModified=datetime.now()),
+                    expectedLastModified=thing['lastModified']
+                )
+            except NspError:
+                pass
+        elif rnd.random() < 0.1:
+            repository.listThings(thing['owner'], sort='-lastModified', limit=20)
+
+
+def main(operations, shards):
+    repository = Repository(logging.getLogger, config={'shards': shards})
+    repository.createThings([createThing(i) for i in range(THINGS)])
+    for count in THREADS:
+        threads = [
+            threading.Thread(target=work, args=(repository, operations // count, seed)) for seed in range(count)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print('{0:>2} threads: {1:>10.0f} operations/s'.format(count, operations / elapsed))
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    )
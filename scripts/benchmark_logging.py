@@ -0,0 +1,90 @@
+'''
+Measures the per-request logging cost of the thing pipeline at INFO and DEBUG level, with the synchronous handler and
+with the non-blocking LogPipeline.
+
+Run from the repository root with: python -m scripts.benchmark_logging [requests]
+'''
+import json
+import logging
+import sys
+import time
+
+import src.commons.log
+from src.commons.api_gateway import APIGateway
+from src.commons.log import configureLogging
+from src.thing.authorizer import Authorizer
+from src.thing.lambda_mapper import LambdaMapper
+from src.thing.logic import Logic
+from src.thing.repository import Repository
+
+EVENT = {
+    'httpMethod': 'GET',
+    'path': '/thing/001',
+    'headers': {'Host': 'localhost', 'X-Forwarded-Proto': 'http', 'X-Forwarded-Port': '80'},
+    'pathParameters': {'uuid': '001'},
+    'requestContext': {
+        'authorizer': {
+            'principalId': json.dumps({'organizationId': 'ORG001', 'roles': ['ROLE_THING_USER']})
+        }
+    }
+}
+
+
+def loggingConfig(level):
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'json': {'()': 'src.commons.log.JsonFormatter'}},
+        'handlers': {
+            'devnull': {
+                'level': level,
+                'class': 'logging.FileHandler',
+                'filename': '/dev/null',
+                'formatter': 'json'
+            }
+        },
+        'root': {'level': level, 'handlers': ['devnull']}
+    }
+
+
+def createMapper():
+    def apiGatewayFactory(event):
+        return APIGateway(logging.getLogger, event)
+    repository = Repository(logging.getLogger)
+    logic = Logic(logging.getLogger, repository)
+    authorizer = Authorizer(logging.getLogger, logic)
+    return LambdaMapper(logging.getLogger, apiGatewayFactory, authorizer)
+
+
+def measure(requests, level, queued, repeats=3):
+    'Returns the best time per request, in microseconds, of `repeats` runs'
+    pipeline = configureLogging(loggingConfig(level), {'enabled': queued})
+    mapper = createMapper()
+    best = None
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        for i in range(requests):
+            mapper.getThing(EVENT)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    if pipeline is not None:
+        pipeline.flush()
+        pipeline.stop()
+        src.commons.log.currentPipeline = None
+    return best / requests * 1e6
+
+
+def main(requests):
+    measure(requests, 'CRITICAL', False, 1)
+    baseline = measure(requests, 'CRITICAL', False)
+    print('{0:<10} {1:<10} {2:>14} {3:>16}'.format('level', 'handler', 'us/request', 'logging us/req'))
+    for level in ('INFO', 'DEBUG'):
+        for queued in (False, True):
+            perRequest = measure(requests, level, queued)
+            print('{0:<10} {1:<10} {2:>14.1f} {3:>16.1f}'.format(
+                level, 'queue' if queued else 'sync', perRequest, perRequest - baseline
+            ))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,53 @@
+'''
+Compares the memory used by the in-memory repository keeping the things as dicts and as compact ThingRecords, with
+its sort, search and tombstone indexes and its change log.
+
+Run from the repository root with: python -m scripts.benchmark_memory [things]
+'''
+import logging
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+from src.thing.repository import Repository
+
+OWNERS = 100
+BATCH_SIZE = 10000
+
+
+def createThing(i, created):
+    return {
+        'uuid': '{0:08d}-0000-4000-8000-000000000000'.format(i),
+        'owner': 'ORG{0:03d}'.format(i % OWNERS),
+        'name': 'Thing {0}'.format(i),
+        'description': 'Description of thing {0}'.format(i),
+        'created': created,
+        'lastModified': created
+    }
+
+
+def measure(count, compact):
+    'Returns the bytes allocated by a repository holding count things, compact or not'
+    base = datetime(2000, 1, 1)
+    tracemalloc.start()
+    repository = Repository(logging.getLogger, config={'compact': compact})
+    for start in range(0, count, BATCH_SIZE):
+        repository.createThings([
+            createThing(i, base + timedelta(seconds=i)) for i in range(start, min(count, start + BATCH_SIZE))
+        ])
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    repository.close()
+    return current
+
+
+def main(count):
+    dicts = measure(count, False)
+    records = measure(count, True)
+    print('dicts:   {0:>8.1f} MB ({1:.0f} bytes/thing)'.format(dicts / 2 ** 20, dicts / count))
+    print('records: {0:>8.1f} MB ({1:.0f} bytes/thing)'.format(records / 2 ** 20, records / count))
+    print('saving:  {0:>8.1f} MB ({1:.0%})'.format((dicts - records) / 2 ** 20, 1 - records / dicts))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,43 @@
+'''
+Measures indexing and query throughput of the thing SearchIndex.
+
+Run from the repository root with: python -m scripts.benchmark_search [things]
+'''
+import random
+import sys
+import time
+
+from src.thing.search_index import SearchIndex
+
+OWNERS = 100
+VOCABULARY = ['word{0}'.format(i) for i in range(50000)]
+
+
+def createThing(i, rnd):
+    return {
+        'uuid': '{0:08d}'.format(i),
+        'owner': 'ORG{0:03d}'.format(i % OWNERS),
+        'name': ' '.join(rnd.choices(VOCABULARY[:5000], k=3)),
+        'description': ' '.join(rnd.choices(VOCABULARY, k=20))
+    }
+
+
+def main(count):
+    rnd = random.Random(42)
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(count):
+        index.add(createThing(i, rnd))
+    elapsed = time.perf_counter() - start
+    print('indexed {0} things in {1:.1f}s ({2:.0f} things/s)'.format(count, elapsed, count / elapsed))
+    queries = [' '.join(rnd.choices(VOCABULARY[:5000], k=2)) for i in range(1000)]
+    for (operator, owner) in (('and', None), ('or', None), ('and', 'ORG001'), ('or', 'ORG001')):
+        start = time.perf_counter()
+        for query in queries:
+            index.search(owner, query, operator, limit=20)
+        elapsed = time.perf_counter() - start
+        print('{0:<4} owner={1:<7} {2:>10.1f} us/query'.format(operator, str(owner), elapsed / len(queries) * 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
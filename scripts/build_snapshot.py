@@ -0,0 +1,22 @@
+'''
+Builds a binary thing snapshot, to be set as the repository.snapshot configuration, from a newline delimited json
+file like the ones written by scripts.export_things.
+
+Run from the repository root with: python -m scripts.build_snapshot INPUT OUTPUT
+'''
+import sys
+import time
+
+import src.commons.ndjson as ndjson
+from src.thing.snapshot import writeSnapshot
+
+
+def main(inputPath, outputPath):
+    start = time.perf_counter()
+    with open(inputPath) as infile, open(outputPath, 'wb') as outfile:
+        count = writeSnapshot(ndjson.load(infile), outfile)
+    print('wrote {0} things to {1} in {2:.1f}s'.format(count, outputPath, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,36 @@
+'''
+Exports the things of a tenant, or of all the tenants, as newline delimited json, streaming them from the repository
+in fixed-size chunks so that memory stays flat regardless of the number of things.
+
+Run from the repository root with: python -m scripts.export_things [--owner ORG] [--output FILE] [--chunk-size BYTES]
+'''
+import argparse
+import sys
+
+import src.commons.ndjson as ndjson
+from src.commons.principal import Principal
+from src.container import Container
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Export things as newline delimited json')
+    parser.add_argument('--owner', help='organization to export, all the organizations if omitted')
+    parser.add_argument('--output', help='output file, the standard output if omitted')
+    parser.add_argument('--chunk-size', type=int, default=ndjson.DEFAULT_CHUNK_SIZE, help='write chunk size')
+    args = parser.parse_args(argv)
+    container = Container()
+    try:
+        principal = Principal({'organizationId': None, 'roles': {Principal.ROLE_ADMIN}})
+        things = container.thingAuthorizer().exportThings(principal, args.owner)
+        if args.output is None:
+            count = ndjson.dump(things, sys.stdout, args.chunk_size)
+        else:
+            with open(args.output, 'w') as outfile:
+                count = ndjson.dump(things, outfile, args.chunk_size)
+        print('exported {0} things'.format(count), file=sys.stderr)
+    finally:
+        container.shutdown()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+'''
+Imports things from a newline delimited json file, validating the lines in a process pool and writing the valid
+things in batches, with the ownership and creation rules of createThing. Prints the errors of the rejected lines to the
+standard error and a throughput report at the end. Without --owner the things are imported as an admin, so each line
+needs an owner.
+
+Run from the repository root with:
+python -m scripts.import_things FILE [--owner ORG] [--batch-size N] [--workers N] [--max-pending-batches N]
+'''
+import argparse
+import sys
+
+from src.commons.principal import Principal
+from src.container import Container
+from src.thing.importer import Importer
+
+
+def printError(lineNumber, message, causes):
+    print('line {0}: {1}{2}'.format(lineNumber, message, ''.join('\n    ' + cause for cause in causes or [])),
+          file=sys.stderr)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Import things from newline delimited json')
+    parser.add_argument('input', help='input file, - for the standard input')
+    parser.add_argument(
+        '--owner', help='import as a user of this organization instead of as an admin, who needs an owner on each line'
+    )
+    parser.add_argument('--batch-size', type=int, default=1000, help='lines per validation and write batch')
+    parser.add_argument('--workers', type=int, help='validation processes, 0 to validate in this process')
+    parser.add_argument('--max-pending-batches', type=int, default=4, help='batches validated ahead of the writes')
+    args = parser.parse_args(argv)
+    if args.owner is None:
+        principal = Principal({'organizationId': None, 'roles': {Principal.ROLE_ADMIN}})
+    else:
+        principal = Principal({'organizationId': args.owner, 'roles': {'ROLE_THING_USER'}})
+    container = Container()
+    try:
+        importer = Importer(container.loggerFactory, container.thingAuthorizer(), container.metrics())
+        infile = sys.stdin if args.input == '-' else open(args.input)
+        try:
+            report = importer.importThings(
+                principal,
+                infile,
+                batchSize=args.batch_size,
+                workers=args.workers,
+                maxPendingBatches=args.max_pending_batches,
+                onError=printError
+            )
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+        print('imported {imported} things, {failed} failed, in {seconds:.1f}s ({thingsPerSecond:.0f} things/s)'.format(
+            **report
+        ), file=sys.stderr)
+    finally:
+        container.shutdown()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,18 +1,40 @@
+import asyncio
+
+
 def mockLoggerFactory(*pargs):
     class MockLogger:
-        def debug(*pargs):
+        def isEnabledFor(*pargs):
+            return True
+
+        def debug(*pargs, **kwargs):
             pass
 
-        def info(*pargs):
+        def info(*pargs, **kwargs):
             pass
 
-        def warn(*pargs):
+        def warn(*pargs, **kwargs):
             pass
 
-        def error(*pargs):
+        def error(*pargs, **kwargs):
             pass
 
-        def critical(*pargs):
+        def critical(*pargs, **kwargs):
             pass
 
     return MockLogger
+
+
+def runCoroutine(coroutine):
+    'Runs a coroutine to completion on a new event loop, returning its result'
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def completed(value):
+    'Returns a coroutine returning value, to stub the coroutine methods of MagicMocks with side_effect'
+    async def coroutine():
+        return value
+    return coroutine()
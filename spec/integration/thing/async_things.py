@@ -0,0 +1,99 @@
+import asyncio
+import json
+import unittest
+
+from src.container import Container
+from spec.helper import runCoroutine
+
+
+class AsyncThingsLambdaSpec(unittest.TestCase):
+    def setUp(self):
+        self.container = Container()
+        self.sut = self.container.asyncThingLambdaMapper()
+
+    def createEvent(self, method, path, roles=('ROLE_THING_USER',), **event):
+        event.update({
+            'httpMethod': method,
+            'path': path,
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps({'organizationId': 'ORG001', 'roles': list(roles)})
+                }
+            }
+        })
+        return event
+
+    def testCrud(self):
+        'Should create, get, update, list and delete a thing through the async request path'
+        async def crud():
+            response = await self.sut.createThing(self.createEvent(
+                'POST', '/thing', body=json.dumps({'name': 'Async thing', 'description': 'async'})
+            ))
+            self.assertEqual(response['statusCode'], 201)
+            thing = json.loads(response['body'])
+            uuid = thing['uuid']
+            pathParameters = {'uuid': uuid}
+            response = await self.sut.getThing(
+                self.createEvent('GET', '/thing/' + uuid, pathParameters=pathParameters)
+            )
+            self.assertEqual(json.loads(response['body'])['name'], 'Async thing')
+            response = await self.sut.getThing(
+                self.createEvent('GET', '/thing/001', pathParameters={'uuid': '001'})
+            )
+            thing = json.loads(response['body'])
+            thing['name'] = 'Renamed thing'
+            response = await self.sut.updateThing(self.createEvent(
+                'PUT', '/thing/001', pathParameters={'uuid': '001'}, body=json.dumps(thing)
+            ))
+            self.assertEqual(response['statusCode'], 200)
+            response = await self.sut.listThings(self.createEvent(
+                'GET', '/thing', queryStringParameters={'namePrefix': 'renamed'}
+            ))
+            self.assertEqual([thing['uuid'] for thing in json.loads(response['body'])], ['001'])
+            response = await self.sut.deleteThing(
+                self.createEvent('DELETE', '/thing/' + uuid, pathParameters=pathParameters)
+            )
+            self.assertEqual(response['statusCode'], 204)
+            response = await self.sut.getThing(
+                self.createEvent('GET', '/thing/' + uuid, pathParameters=pathParameters)
+            )
+            self.assertEqual(response['statusCode'], 404)
+        runCoroutine(crud())
+
+    def testConcurrentRequests(self):
+        'Should serve concurrent requests on one event loop'
+        async def getAll():
+            return await asyncio.gather(*(
+                self.sut.getThing(self.createEvent('GET', '/thing/001', pathParameters={'uuid': '001'}))
+                for i in range(20)
+            ))
+        responses = runCoroutine(getAll())
+        self.assertEqual({response['statusCode'] for response in responses}, {200})
+
+    def testListChanges(self):
+        'Should list the changes after the cursor of the epoch through the async request path'
+        self.container.thingRepository().deleteThing('001')
+        response = runCoroutine(self.sut.listChanges(self.createEvent('GET', '/thing/changes')))
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([change['uuid'] for change in body['changes']], ['001'])
+        response = runCoroutine(self.sut.listChanges(self.createEvent(
+            'GET', '/thing/changes', queryStringParameters={'after': str(body['next']), 'epoch': body['epoch']}
+        )))
+        self.assertEqual(json.loads(response['body'])['changes'], [])
+        response = runCoroutine(self.sut.listChanges(self.createEvent(
+            'GET', '/thing/changes', queryStringParameters={'after': '1', 'epoch': 'restarted'}
+        )))
+        self.assertEqual(response['statusCode'], 410)
+
+    def testForbidden(self):
+        'Should return a 403 response if the principal has no thing role'
+        response = runCoroutine(self.sut.searchThings(self.createEvent(
+            'GET', '/thing/search', roles=(), queryStringParameters={'q': 'thing'}
+        )))
+        self.assertEqual(response['statusCode'], 403)
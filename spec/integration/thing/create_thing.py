@@ -81,6 +81,38 @@ class CreateThingLambdaSpec(unittest.TestCase):
         self.assertEqual(body['resource'], 'http://localhost/thing')
         self.assertRegex(body['timestamp'], ISO_DATETIME_Z_REGEX)
 
+    def test201IdempotencyKey(self):
+        'Should create a thing once for the retries of a request with an Idempotency-Key'
+        event = {
+            'httpMethod': 'POST',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80',
+                'Idempotency-Key': 'create-a-name'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'body': json.dumps({'name': 'a name', 'description': 'a description'})
+        }
+        things = len(self.container.thingRepository().data)
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 201)
+        replay = handler(event, None, self.container)
+        self.assertEqual(replay['statusCode'], 201)
+        self.assertEqual(replay['body'], response['body'])
+        self.assertEqual(replay['headers']['Location'], response['headers']['Location'])
+        self.assertEqual(replay['headers']['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.container.thingRepository().data), things + 1)
+        self.principal['roles'].clear()
+        event['requestContext']['authorizer']['principalId'] = json.dumps(self.principal)
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 403)
+
     # def test201(self):
     #     'Should return a 201 response with the created thing'
     #     uuid = '001'
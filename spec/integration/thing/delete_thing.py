@@ -4,6 +4,7 @@ import email.utils
 
 from src.thing.lambdas.delete_thing import handler
 from src.commons.jsonutils import json2datetime
+from src.container import Container
 
 ISO_DATETIME_Z_REGEX = '^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$'
 
@@ -14,6 +15,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
             'organizationId': 'ORG001',
             'roles': ['ROLE_THING_USER']
         }
+        self.container = Container()
 
     def test401(self):
         'Should return a 401 response if there is no principal'
@@ -35,7 +37,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 401)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -65,7 +67,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
             },
             'pathParameters': None
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 400)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -98,7 +100,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 403)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -130,7 +132,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 404)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -163,7 +165,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 404)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -195,7 +197,7 @@ class DeleteThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 204)
         self.assertEqual(response['headers'], {
             'Access-Control-Allow-Origin': '*'
@@ -4,6 +4,7 @@ import email.utils
 
 from src.thing.lambdas.get_thing import handler
 from src.commons.jsonutils import json2datetime
+from src.container import Container
 
 ISO_DATETIME_Z_REGEX = '^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$'
 
@@ -15,6 +16,7 @@ class GetThingLambdaSpec(unittest.TestCase):
             'organizationId': 'ORG001',
             'roles': ['ROLE_THING_USER']
         }
+        self.container = Container()
 
     def test401(self):
         'Should return a 401 response if there is no principal'
@@ -36,7 +38,7 @@ class GetThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 401)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -66,7 +68,7 @@ class GetThingLambdaSpec(unittest.TestCase):
             },
             'pathParameters': None
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 400)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -99,7 +101,7 @@ class GetThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 403)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -111,6 +113,30 @@ class GetThingLambdaSpec(unittest.TestCase):
         self.assertEqual(body['resource'], 'http://localhost/thing/dario')
         self.assertRegex(body['timestamp'], ISO_DATETIME_Z_REGEX)
 
+    def test403ClaimedPermissions(self):
+        'Should return a 403 response if the principal claims permissions without the roles'
+        self.principal['roles'].clear()
+        self.principal['permissions'] = 2147483647
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing/001',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'pathParameters': {
+                'uuid': '001'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 403)
+
     def test404NotExists(self):
         'Should return a 404 response if the thing does not exist'
         uuid = 'unknown'
@@ -131,7 +157,7 @@ class GetThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 404)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -164,7 +190,7 @@ class GetThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 404)
         self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*'})
         body = json.loads(response['body'])
@@ -196,7 +222,7 @@ class GetThingLambdaSpec(unittest.TestCase):
                 'uuid': uuid
             }
         }
-        response = handler(event, None)
+        response = handler(event, None, self.container)
         self.assertEqual(response['statusCode'], 200)
         body = json.loads(response['body'])
         self.assertEqual(response['headers'], {
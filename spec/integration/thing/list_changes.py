@@ -0,0 +1,62 @@
+import json
+import unittest
+
+from src.thing.lambdas.list_changes import handler
+from src.container import Container
+
+
+class ListChangesLambdaSpec(unittest.TestCase):
+    def setUp(self):
+        self.principal = {
+            'organizationId': 'ORG001',
+            'roles': ['ROLE_THING_USER']
+        }
+        self.container = Container()
+
+    def createEvent(self, queryStringParameters):
+        return {
+            'httpMethod': 'GET',
+            'path': '/thing/changes',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': queryStringParameters
+        }
+
+    def test200(self):
+        'Should return a 200 response with the changes of the organization after the sequence'
+        repository = self.container.thingRepository()
+        repository.deleteThing('001')
+        repository.deleteThing('002')
+        repository.deleteThing('003')
+        response = handler(self.createEvent({'after': '1'}), None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([change['uuid'] for change in body['changes']], ['003'])
+        self.assertEqual(body['next'], 3)
+
+    def test410OtherEpoch(self):
+        'Should return a 410 response if the epoch is not the one of the change log, as after a restart'
+        repository = self.container.thingRepository()
+        repository.deleteThing('001')
+        epoch = json.loads(handler(self.createEvent({}), None, self.container)['body'])['epoch']
+        response = handler(self.createEvent({'after': '1', 'epoch': epoch}), None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        response = handler(self.createEvent({'after': '1', 'epoch': 'restarted'}), None, self.container)
+        self.assertEqual(response['statusCode'], 410)
+        response = handler(self.createEvent({'after': '5'}), None, self.container)
+        self.assertEqual(response['statusCode'], 410)
+
+    def test400InvalidAfter(self):
+        'Should return a 400 response if the after parameter is not a non-negative integer'
+        response = handler(self.createEvent({'after': '-1'}), None, self.container)
+        self.assertEqual(response['statusCode'], 400)
+        body = json.loads(response['body'])
+        self.assertEqual(body['message'], 'Invalid query string parameter "after"')
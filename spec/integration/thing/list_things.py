@@ -132,4 +132,152 @@ class ListThingLambdaSpec(unittest.TestCase):
         for thing in body:
             thing['created'] = json2datetime(thing['created'])
             thing['lastModified'] = json2datetime(thing['lastModified'])
-        self.assertEqual(body, list(self.container.thingRepository().data.values()))
+        things = self.container.thingRepository().data.values()
+        self.assertEqual(body, sorted(things, key=lambda thing: thing['created']))
+
+    def test200NamePrefix(self):
+        'Should return a 200 response with the things of the principal whose name starts with namePrefix'
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': {
+                'namePrefix': 'thing',
+                'limit': '1'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([thing['uuid'] for thing in body], ['001'])
+
+    def test200Sort(self):
+        'Should return a 200 response with the things of the principal sorted by the sort parameter'
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': {
+                'sort': '-name'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([thing['uuid'] for thing in body], ['003', '001'])
+
+    def test200ModifiedSince(self):
+        'Should return a 200 response with the things of the principal modified and deleted after modifiedSince'
+        self.container.thingRepository().deleteThing('001')
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': {
+                'modifiedSince': '2000-01-01T00:00:00.000Z'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([thing['uuid'] for thing in body['things']], ['003'])
+        self.assertEqual([tombstone['uuid'] for tombstone in body['tombstones']], ['001'])
+
+    def test400InvalidModifiedSince(self):
+        'Should return a 400 response if the modifiedSince parameter is not a valid datetime'
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': {
+                'modifiedSince': '2020-13-45T00:00:00.000Z'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 400)
+        body = json.loads(response['body'])
+        self.assertEqual(body['message'], 'Invalid query string parameter "modifiedSince"')
+
+    def test400InvalidSort(self):
+        'Should return a 400 response if the sort parameter is not a sort field'
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': {
+                'sort': 'owner'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 400)
+        body = json.loads(response['body'])
+        self.assertEqual(body['message'], 'Invalid query string parameter "sort"')
+
+    def test400InvalidLimit(self):
+        'Should return a 400 response if the limit parameter is not a positive integer'
+        event = {
+            'httpMethod': 'GET',
+            'path': '/thing',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': {
+                'limit': '0'
+            }
+        }
+        response = handler(event, None, self.container)
+        self.assertEqual(response['statusCode'], 400)
+        body = json.loads(response['body'])
+        self.assertEqual(body['message'], 'Invalid query string parameter "limit"')
@@ -0,0 +1,80 @@
+import json
+import unittest
+
+from src.thing.lambdas.patch_thing import handler
+from src.container import Container
+
+
+class PatchThingLambdaSpec(unittest.TestCase):
+    def setUp(self):
+        self.principal = {
+            'organizationId': 'ORG001',
+            'roles': ['ROLE_THING_USER']
+        }
+        self.container = Container()
+
+    def createEvent(self, uuid, patch, contentType='application/merge-patch+json'):
+        return {
+            'httpMethod': 'PATCH',
+            'path': '/thing/{0}'.format(uuid),
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80',
+                'Content-Type': contentType
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'pathParameters': {
+                'uuid': uuid
+            },
+            'body': json.dumps(patch)
+        }
+
+    def test200(self):
+        'Should return a 200 response with the patched thing'
+        thing = self.container.thingRepository().getThing('001')
+        response = handler(self.createEvent('001', {'name': 'Patched thing'}), None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['uuid'], '001')
+        self.assertEqual(body['name'], 'Patched thing')
+        self.assertEqual(body['description'], thing['description'])
+        self.assertEqual(self.container.thingRepository().getThing('001')['name'], 'Patched thing')
+
+    def test200ApplicationJSON(self):
+        'Should accept a merge patch with the application/json Content-Type'
+        response = handler(
+            self.createEvent('001', {'description': 'Patched'}, 'application/json'), None, self.container
+        )
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['description'], 'Patched')
+
+    def test403(self):
+        'Should return a 403 response if the principal is not authorized'
+        self.principal['roles'].clear()
+        response = handler(self.createEvent('001', {'name': 'Patched thing'}), None, self.container)
+        self.assertEqual(response['statusCode'], 403)
+        self.assertEqual(json.loads(response['body'])['message'], 'Principal is not authorized to update things')
+
+    def test404(self):
+        'Should return a 404 response if the thing does not exist'
+        response = handler(self.createEvent('unknown', {'name': 'Patched thing'}), None, self.container)
+        self.assertEqual(response['statusCode'], 404)
+
+    def test415(self):
+        'Should return a 415 response if the Content-Type is not JSON'
+        response = handler(self.createEvent('001', {'name': 'Patched thing'}, 'text/plain'), None, self.container)
+        self.assertEqual(response['statusCode'], 415)
+
+    def test422(self):
+        'Should return a 422 response if the patch is invalid or changes read-only properties'
+        response = handler(self.createEvent('001', {'name': None}), None, self.container)
+        self.assertEqual(response['statusCode'], 422)
+        self.assertEqual(json.loads(response['body'])['message'], 'Invalid thing patch')
+        response = handler(self.createEvent('001', {'owner': 'ORG002'}), None, self.container)
+        self.assertEqual(response['statusCode'], 422)
+        self.assertEqual(json.loads(response['body'])['message'], 'Cannot change read-only properties')
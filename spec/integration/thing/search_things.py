@@ -0,0 +1,45 @@
+import json
+import unittest
+
+from src.thing.lambdas.search_things import handler
+from src.container import Container
+
+
+class SearchThingsLambdaSpec(unittest.TestCase):
+    def setUp(self):
+        self.principal = {
+            'organizationId': 'ORG001',
+            'roles': ['ROLE_THING_USER']
+        }
+        self.container = Container()
+
+    def createEvent(self, queryStringParameters):
+        return {
+            'httpMethod': 'GET',
+            'path': '/thing/search',
+            'headers': {
+                'Host': 'localhost',
+                'X-Forwarded-Proto': 'http',
+                'X-Forwarded-Port': '80'
+            },
+            'requestContext': {
+                'authorizer': {
+                    'principalId': json.dumps(self.principal)
+                }
+            },
+            'queryStringParameters': queryStringParameters
+        }
+
+    def test400MissingQuery(self):
+        'Should return a 400 response if the q parameter is missing'
+        response = handler(self.createEvent(None), None, self.container)
+        self.assertEqual(response['statusCode'], 400)
+        body = json.loads(response['body'])
+        self.assertEqual(body['message'], 'Missing query string parameter "q"')
+
+    def test200(self):
+        'Should return a 200 response with the things of the organization matching the query'
+        response = handler(self.createEvent({'q': 'thing', 'operator': 'or'}), None, self.container)
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(sorted(thing['uuid'] for thing in body), ['001', '003'])
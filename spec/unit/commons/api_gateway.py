@@ -9,6 +9,7 @@ from src.commons.http_error import HttpError
 from src.commons.principal import Principal
 import src.commons.jsonutils as jsonutils
 from src.commons.api_gateway import APIGateway
+from src.commons.request_context import getRequestContext, clearRequestContext
 from spec.helper import mockLoggerFactory
 
 
@@ -417,6 +418,7 @@ class APIGatewayCreateErrorResponse(unittest.TestCase):
         httpError = HttpError.wrap(error)
         httpError.method = sut.getHttpMethod()
         httpError.resource = sut.getHttpResource()
+        httpError.requestId = None
         response = sut.createErrorResponse(error)
         self.assertEqual(response, {
             'statusCode': httpError.statusCode,
@@ -442,6 +444,43 @@ class APIGatewayCreateErrorResponse(unittest.TestCase):
         self.assertEqual(body['resource'], httpError.resource)
         self.assertEqual(body['causes'], [])
 
+    def testRetryAfter(self):
+        'APIGateway.createErrorResponse() should set the Retry-After header of an error with retryAfter'
+        sut = APIGateway(mockLoggerFactory, {})
+        response = sut.createErrorResponse(NspError(NspError.TOO_MANY_REQUESTS, 'message', retryAfter=3))
+        self.assertEqual(response['statusCode'], 429)
+        self.assertEqual(response['headers'], {'Access-Control-Allow-Origin': '*', 'Retry-After': '3'})
+        self.assertEqual(json.loads(response['body'])['retryAfter'], 3)
+
+    def testRequestId(self):
+        'APIGateway.createErrorResponse() should echo the API Gateway request id in the body'
+        event = {'requestContext': {'requestId': 'request-id'}}
+        sut = APIGateway(mockLoggerFactory, event)
+        response = sut.createErrorResponse(HttpError(HttpError.NOT_FOUND, 'message'))
+        self.assertEqual(json.loads(response['body'])['requestId'], 'request-id')
+
+
+class APIGatewayInit(unittest.TestCase):
+    def tearDown(self):
+        clearRequestContext()
+
+    def testRequestContext(self):
+        'APIGateway() should capture the request id and the trace header in the request context'
+        event = {
+            'headers': {'X-Amzn-Trace-Id': 'Root=1-trace'},
+            'requestContext': {'requestId': 'request-id'}
+        }
+        sut = APIGateway(mockLoggerFactory, event)
+        self.assertEqual(sut.requestId, 'request-id')
+        self.assertEqual(sut.traceId, 'Root=1-trace')
+        self.assertEqual(getRequestContext(), {'requestId': 'request-id', 'traceId': 'Root=1-trace'})
+
+    def testMissingRequestContext(self):
+        'APIGateway() should start an empty request context if the event has no request id or trace header'
+        sut = APIGateway(mockLoggerFactory, {})
+        self.assertIsNone(sut.requestId)
+        self.assertEqual(getRequestContext(), {})
+
 
 class APIGatewayGetAndValidateEntity(unittest.TestCase):
     def testNotJSON(self):
@@ -459,6 +498,27 @@ class APIGatewayGetAndValidateEntity(unittest.TestCase):
         self.assertEqual(cm.exception.statusCode, 415)
         self.assertEqual(cm.exception.message, 'Expected application/json Content-Type')
 
+    def testMediaTypes(self):
+        'APIGateway.getAndValidateEntity() should accept the given media types only'
+        event = {
+            'headers': {
+                'Content-Type': 'application/merge-patch+json; charset=utf-8'
+            },
+            'body': '{"name": "name"}'
+        }
+        sut = APIGateway(mockLoggerFactory, event)
+        mediaTypes = ('application/merge-patch+json', 'application/json')
+        self.assertEqual(sut.getAndValidateEntity({}, 'patch', mediaTypes), {'name': 'name'})
+        with self.assertRaises(HttpError) as cm:
+            sut.getAndValidateEntity({}, 'patch')
+        self.assertEqual(cm.exception.statusCode, 415)
+        event['headers']['Content-Type'] = 'text/plain'
+        with self.assertRaises(HttpError) as cm:
+            sut.getAndValidateEntity({}, 'patch', mediaTypes)
+        self.assertEqual(
+            cm.exception.message, 'Expected application/merge-patch+json or application/json Content-Type'
+        )
+
     def testMissing(self):
         'APIGateway.getAndValidateEntity() should raise a 400 HttpError if body is missing'
         event = {}
@@ -81,3 +81,13 @@ class ConfigLoadConfig(unittest.TestCase):
         schemaFile.close()
         configFile.close()
         self.assertEqual(config, json.loads(content))
+
+    def testIdempotencyTableName(self):
+        'config.loadConfig() should reject the "dynamodb" idempotency backend without a "tableName"'
+        content = '{"idempotency": {"backend": "dynamodb"}}'
+        configFile = tempfile.NamedTemporaryFile(mode='w+t')
+        configFile.write(content)
+        configFile.flush()
+        with self.assertRaises(jsonschema.ValidationError) as cm:
+            config = self.sut(configFileName=configFile.name)
+        configFile.close()
@@ -0,0 +1,87 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.deadline import Deadline, Deadlines, checkDeadline, getDeadline, getTimeout, setDeadline
+from src.commons.nsp_error import NspError
+from spec.helper import mockLoggerFactory
+
+
+def createContext(remainingMillis):
+    context = MagicMock()
+    context.get_remaining_time_in_millis.return_value = remainingMillis
+    return context
+
+
+class DeadlineSpec(unittest.TestCase):
+    def tearDown(self):
+        setDeadline(None)
+
+    def testFromContext(self):
+        'Deadline.fromContext() should expire safetyMarginMillis before the Lambda timeout'
+        deadline = Deadline.fromContext(createContext(1000), safetyMarginMillis=200)
+        self.assertAlmostEqual(deadline.remaining(), 0.8, delta=0.05)
+        self.assertIsNone(Deadline.fromContext(None))
+
+    def testTimeout(self):
+        'Deadline.timeout() should not exceed the time left'
+        deadline = Deadline(time.monotonic() + 1)
+        self.assertEqual(deadline.timeout(0.5), 0.5)
+        self.assertLessEqual(deadline.timeout(5), 1)
+        self.assertLessEqual(deadline.timeout(), 1)
+        self.assertEqual(Deadline(time.monotonic() - 1).timeout(5), 0)
+
+    def testCheck(self):
+        'Deadline.check() should raise DEADLINE_EXCEEDED and notify onExceeded once the deadline has passed'
+        onExceeded = MagicMock()
+        Deadline(time.monotonic() + 1, onExceeded).check('call')
+        onExceeded.assert_not_called()
+        with self.assertRaises(NspError) as context:
+            Deadline(time.monotonic() - 1, onExceeded).check('call')
+        self.assertEqual(context.exception.code, NspError.DEADLINE_EXCEEDED)
+        onExceeded.assert_called_once_with()
+
+    def testCurrentDeadline(self):
+        'checkDeadline() and getTimeout() should apply the deadline of the current request, if any'
+        checkDeadline('call')
+        self.assertEqual(getTimeout(5), 5)
+        setDeadline(Deadline(time.monotonic() - 1))
+        self.assertEqual(getTimeout(5), 0)
+        with self.assertRaises(NspError):
+            checkDeadline('call')
+
+
+class DeadlinesSpec(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MagicMock()
+        self.sut = Deadlines(mockLoggerFactory, {'safetyMarginMillis': 100, 'minimumMillis': 50}, self.metrics)
+
+    def tearDown(self):
+        self.sut.stop()
+
+    def testStart(self):
+        'Deadlines.start() should set the deadline of the request, and stop() clear it'
+        deadline = self.sut.start(createContext(1000))
+        self.assertIs(getDeadline(), deadline)
+        self.sut.stop()
+        self.assertIsNone(getDeadline())
+
+    def testWithoutContext(self):
+        'Deadlines.start() should not set a deadline without a Lambda context'
+        self.assertIsNone(self.sut.start(None))
+        self.assertIsNone(getDeadline())
+
+    def testInsufficient(self):
+        'Deadlines.start() should raise SERVICE_UNAVAILABLE if less than minimumMillis are left'
+        with self.assertRaises(NspError) as context:
+            self.sut.start(createContext(120))
+        self.assertEqual(context.exception.code, NspError.SERVICE_UNAVAILABLE)
+        self.metrics.count.assert_called_once_with('DeadlineInsufficient')
+
+    def testExceeded(self):
+        'The deadlines started by Deadlines should count the DeadlineExceeded metric'
+        self.sut.start(createContext(160))
+        time.sleep(0.07)
+        with self.assertRaises(NspError):
+            checkDeadline('call')
+        self.metrics.count.assert_called_once_with('DeadlineExceeded')
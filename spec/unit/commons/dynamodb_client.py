@@ -0,0 +1,64 @@
+import unittest
+
+from src.commons.dynamodb_client import DynamoDBClient
+
+
+class ConditionalCheckFailed(Exception):
+    response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+
+
+class Table:
+    'In-memory stand-in of a boto3 DynamoDB table, evaluating the two conditions of DynamoDBClient'
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key, ConsistentRead):
+        item = self.items.get(Key['key'])
+        return {} if item is None else {'Item': dict(item)}
+
+    def put_item(self, Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues=None):
+        current = self.items.get(Item['key'])
+        if ConditionExpression == 'attribute_not_exists(#key)':
+            passed = current is None
+        else:
+            passed = current is not None and current['version'] == ExpressionAttributeValues[':version']
+        if not passed:
+            raise ConditionalCheckFailed()
+        self.items[Item['key']] = Item
+
+
+class DynamoDBClientSpec(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        self.table = Table()
+        self.sut = DynamoDBClient('table', self.table, lambda: self.now)
+
+    def testMissing(self):
+        'DynamoDBClient.get() should return (None, None) for a missing key'
+        self.assertEqual(self.sut.get('key'), (None, None))
+
+    def testCompareAndSet(self):
+        'DynamoDBClient.compareAndSet() should store the value only if the version of the key is still the given one'
+        self.assertTrue(self.sut.compareAndSet('key', {'a': 1}, None, 10))
+        self.assertFalse(self.sut.compareAndSet('key', {'a': 2}, None, 10))
+        self.assertEqual(self.sut.get('key'), ({'a': 1}, 1))
+        self.assertEqual(self.table.items['key']['expiresAt'], 1010)
+        self.assertTrue(self.sut.compareAndSet('key', {'a': 3}, 1, 10))
+        self.assertFalse(self.sut.compareAndSet('key', {'a': 4}, 1, 10))
+        self.assertEqual(self.sut.get('key'), ({'a': 3}, 2))
+
+    def testExpired(self):
+        'DynamoDBClient.get() should return no value but the version of an expired key not yet deleted'
+        self.sut.compareAndSet('key', {'a': 1}, None, 10)
+        self.now = 1010
+        self.assertEqual(self.sut.get('key'), (None, 1))
+        self.assertTrue(self.sut.compareAndSet('key', {'a': 2}, 1, 10))
+
+    def testError(self):
+        'DynamoDBClient.compareAndSet() should raise the other errors of DynamoDB'
+        def putItem(**kwargs):
+            raise IOError()
+        self.table.put_item = putItem
+        with self.assertRaises(IOError):
+            self.sut.compareAndSet('key', {'a': 1}, None, 10)
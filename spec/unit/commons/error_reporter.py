@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.error_reporter import ErrorReporter
+from src.commons.http_error import HttpError
+from src.commons.nsp_error import NspError
+
+
+class ErrorReporterReport(unittest.TestCase):
+    def setUp(self):
+        self.logger = MagicMock()
+        self.metrics = MagicMock()
+        self.now = 0
+        self.sut = ErrorReporter(lambda name: self.logger, {}, self.metrics, lambda: self.now)
+
+    def testHttpError(self):
+        'ErrorReporter.report() should return the HttpError as it is and count it'
+        error = HttpError(HttpError.NOT_FOUND, 'message')
+        self.assertIs(self.sut.report(error), error)
+        self.metrics.count.assert_called_once_with('Errors')
+        self.logger.error.assert_not_called()
+
+    def testNspError(self):
+        'ErrorReporter.report() should wrap the NspError without logging its traceback'
+        result = self.sut.report(NspError(NspError.THING_NOT_FOUND, 'message'))
+        self.assertEqual(result.statusCode, HttpError.NOT_FOUND)
+        self.assertEqual(result.message, 'message')
+        self.logger.error.assert_not_called()
+
+    def testCompactException(self):
+        'ErrorReporter.report() should wrap unexpected errors in a compact 500, logging the traceback'
+        error = KeyError('secret')
+        result = self.sut.report(error)
+        self.assertEqual(result.statusCode, HttpError.INTERNAL_SERVER_ERROR)
+        self.assertEqual(result.message, 'Internal server error')
+        self.logger.error.assert_called_once_with('Unexpected error: %r', error, exc_info=error)
+        self.metrics.count.assert_any_call('Errors')
+        self.metrics.count.assert_any_call('ServerErrors')
+
+    def testFullException(self):
+        'ErrorReporter.report() should put the traceback in the message if the detail is full'
+        sut = ErrorReporter(lambda name: self.logger, {'detail': 'full'}, self.metrics)
+        try:
+            raise KeyError('secret')
+        except KeyError as error:
+            result = sut.report(error)
+        self.assertTrue(result.message.startswith("KeyError('secret'):\n"))
+
+    def testRateLimit(self):
+        'ErrorReporter.report() should log at most maxTracebacksPerInterval tracebacks in each interval'
+        config = {'maxTracebacksPerInterval': 2, 'tracebackIntervalSeconds': 10}
+        sut = ErrorReporter(lambda name: self.logger, config, self.metrics, lambda: self.now)
+        for i in range(5):
+            sut.report(Exception())
+        self.assertEqual(self.logger.error.call_count, 2)
+        self.now = 10
+        sut.report(Exception())
+        self.logger.error.assert_any_call('%d error tracebacks suppressed in the last %s seconds', 3, 10)
+        self.assertEqual(self.logger.error.call_count, 4)
@@ -12,8 +12,12 @@ class HttpErrorSpec(unittest.TestCase):
         'All the expected status codes should be defined'
         self.assertEqual(HttpError.BAD_REQUEST, 400)
         self.assertEqual(HttpError.FORBIDDEN, 403)
+        self.assertEqual(HttpError.GATEWAY_TIMEOUT, 504)
+        self.assertEqual(HttpError.GONE, 410)
         self.assertEqual(HttpError.INTERNAL_SERVER_ERROR, 500)
         self.assertEqual(HttpError.NOT_FOUND, 404)
+        self.assertEqual(HttpError.TOO_MANY_REQUESTS, 429)
+        self.assertEqual(HttpError.SERVICE_UNAVAILABLE, 503)
         self.assertEqual(HttpError.UNAUTHORIZED, 401)
         self.assertEqual(HttpError.UNPROCESSABLE_ENTITY, 422)
         self.assertEqual(HttpError.UNSUPPORTED_MEDIA_TYPE, 415)
@@ -62,6 +66,12 @@ class HttpErrorSpec(unittest.TestCase):
         self.assertEqual(e.statusCode, 403)
         self.assertEqual(e.statusReason, 'Forbidden')
 
+    def test_GONE(self):
+        'The GONE instance should have the expected attributes'
+        e = HttpError(HttpError.GONE, 'message')
+        self.assertEqual(e.statusCode, 410)
+        self.assertEqual(e.statusReason, 'Gone')
+
     def test_INTERNAL_SERVER_ERROR(self):
         'The INTERNAL_SERVER_ERROR instance should have the expected attributes'
         e = HttpError(HttpError.INTERNAL_SERVER_ERROR, 'message')
@@ -106,6 +116,37 @@ class HttpErrorSpec(unittest.TestCase):
         self.assertEqual(e.statusCode, 403)
         self.assertEqual(e.message, 'message')
 
+    def test_wrap_CHANGES_EXPIRED(self):
+        'It should wrap the CHANGES_EXPIRED NspError'
+        e = HttpError.wrap(NspError(NspError.CHANGES_EXPIRED, 'message'))
+        self.assertEqual(e.statusCode, 410)
+        self.assertEqual(e.message, 'message')
+
+    def test_wrap_THING_CONFLICT(self):
+        'It should wrap the THING_CONFLICT NspError'
+        e = HttpError.wrap(NspError(NspError.THING_CONFLICT, 'message'))
+        self.assertEqual(e.statusCode, 409)
+        self.assertEqual(e.message, 'message')
+
+    def test_wrap_SERVICE_UNAVAILABLE(self):
+        'It should wrap the SERVICE_UNAVAILABLE NspError'
+        e = HttpError.wrap(NspError(NspError.SERVICE_UNAVAILABLE, 'message'))
+        self.assertEqual(e.statusCode, 503)
+        self.assertEqual(e.statusReason, 'Service unavailable')
+
+    def test_wrap_DEADLINE_EXCEEDED(self):
+        'It should wrap the DEADLINE_EXCEEDED NspError'
+        e = HttpError.wrap(NspError(NspError.DEADLINE_EXCEEDED, 'message'))
+        self.assertEqual(e.statusCode, 504)
+        self.assertEqual(e.statusReason, 'Gateway timeout')
+
+    def test_wrap_TOO_MANY_REQUESTS(self):
+        'It should wrap the TOO_MANY_REQUESTS NspError with its retryAfter'
+        e = HttpError.wrap(NspError(NspError.TOO_MANY_REQUESTS, 'message', retryAfter=2))
+        self.assertEqual(e.statusCode, 429)
+        self.assertEqual(e.statusReason, 'Too many requests')
+        self.assertEqual(e.retryAfter, 2)
+
     def test_wrap_INTERNAL_SERVER_ERROR(self):
         'It should wrap the INTERNAL_SERVER_ERROR NspError'
         e = HttpError.wrap(NspError(NspError.INTERNAL_SERVER_ERROR, 'message'))
@@ -125,12 +166,23 @@ class HttpErrorSpec(unittest.TestCase):
         self.assertEqual(e.message, 'message')
 
     def test_wrapException(self):
-        'It should wrap an Exception with the expected attributes'
+        'It should wrap an Exception with a compact message by default'
         try:
-            raise(Exception('hello'))
+            raise Exception('hello')
         except Exception as exception:
             e = HttpError.wrap(exception)
             self.assertEqual(e.statusCode, HttpError.INTERNAL_SERVER_ERROR)
+            self.assertEqual(e.message, 'Internal server error')
+            self.assertEqual(e.causes, [])
+            self.assertIsInstance(e.timestamp, datetime.datetime)
+
+    def test_wrapExceptionFullDetail(self):
+        'It should wrap an Exception with the traceback in the message if the detail is full'
+        try:
+            raise Exception('hello')
+        except Exception as exception:
+            e = HttpError.wrap(exception, HttpError.FULL_DETAIL)
+            self.assertEqual(e.statusCode, HttpError.INTERNAL_SERVER_ERROR)
             self.assertEqual(e.message, repr(exception) + ':\n' + ''.join(traceback.format_tb(sys.exc_info()[2])))
             self.assertEqual(e.causes, [])
             self.assertIsInstance(e.timestamp, datetime.datetime)
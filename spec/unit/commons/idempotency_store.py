@@ -0,0 +1,111 @@
+import unittest
+
+from src.commons.idempotency_store import IdempotencyStore, SharedIdempotencyStore, createIdempotencyStore
+
+
+class IdempotencyStoreSpec(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.sut = IdempotencyStore(maxEntries=2, ttlSeconds=10, clock=lambda: self.now)
+
+    def testReserve(self):
+        'IdempotencyStore.reserve() should reserve a new key and return the entry of a reserved one'
+        self.assertIsNone(self.sut.reserve('key', 'fingerprint'))
+        entry = self.sut.reserve('key', 'another fingerprint')
+        self.assertEqual(entry.fingerprint, 'fingerprint')
+        self.assertIsNone(entry.response)
+
+    def testComplete(self):
+        'IdempotencyStore.complete() should store the response of the key'
+        self.sut.reserve('key', 'fingerprint')
+        self.sut.complete('key', {'statusCode': 201})
+        self.assertEqual(self.sut.reserve('key', 'fingerprint').response, {'statusCode': 201})
+
+    def testRelease(self):
+        'IdempotencyStore.release() should drop the reservation of the key'
+        self.sut.reserve('key', 'fingerprint')
+        self.sut.release('key')
+        self.assertIsNone(self.sut.reserve('key', 'fingerprint'))
+
+    def testExpires(self):
+        'IdempotencyStore should drop the entries after ttlSeconds'
+        self.sut.reserve('key', 'fingerprint')
+        self.now = 10
+        self.assertIsNone(self.sut.reserve('key', 'fingerprint'))
+
+    def testBounded(self):
+        'IdempotencyStore should drop the oldest entries past maxEntries'
+        for key in ['a', 'b', 'c']:
+            self.sut.reserve(key, 'fingerprint')
+        self.assertEqual(list(self.sut.entries), ['b', 'c'])
+        self.assertIsNone(self.sut.reserve('a', 'fingerprint'))
+
+
+class VersionedClient:
+    'In-memory stand-in of a shared key-value store with versioned compare-and-set'
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key, (None, None))
+
+    def compareAndSet(self, key, value, version, ttlSeconds):
+        if self.values.get(key, (None, None))[1] != version:
+            return False
+        self.values[key] = (value, (version or 0) + 1)
+        self.ttls[key] = ttlSeconds
+        return True
+
+
+class SharedIdempotencyStoreSpec(unittest.TestCase):
+    def setUp(self):
+        self.client = VersionedClient()
+        self.sut = SharedIdempotencyStore(self.client, ttlSeconds=100, inFlightSeconds=10)
+        self.other = SharedIdempotencyStore(self.client, ttlSeconds=100, inFlightSeconds=10)
+
+    def testShared(self):
+        'SharedIdempotencyStore should share the reservations and the responses between the instances'
+        self.assertIsNone(self.sut.reserve(('ORG001', 'key'), 'fingerprint'))
+        entry = self.other.reserve(('ORG001', 'key'), 'fingerprint')
+        self.assertEqual(entry.fingerprint, 'fingerprint')
+        self.assertIsNone(entry.response)
+        self.assertEqual(self.client.ttls['idempotency:["ORG001", "key"]'], 10)
+        self.sut.complete(('ORG001', 'key'), {'statusCode': 201})
+        self.assertEqual(self.other.reserve(('ORG001', 'key'), 'fingerprint').response, {'statusCode': 201})
+        self.assertEqual(self.client.ttls['idempotency:["ORG001", "key"]'], 100)
+
+    def testRelease(self):
+        'SharedIdempotencyStore.release() should let another instance reserve the key'
+        self.sut.reserve(('ORG001', 'key'), 'fingerprint')
+        self.sut.release(('ORG001', 'key'))
+        self.assertIsNone(self.other.reserve(('ORG001', 'key'), 'fingerprint'))
+        self.assertIsNone(self.sut.reserve(('ORG002', 'key'), 'fingerprint'))
+
+
+class CreateIdempotencyStoreSpec(unittest.TestCase):
+    def testDefault(self):
+        'createIdempotencyStore() should return an IdempotencyStore without a configuration'
+        sut = createIdempotencyStore()
+        self.assertIsInstance(sut, IdempotencyStore)
+        self.assertEqual((sut.maxEntries, sut.ttlSeconds), (10000, 86400))
+
+    def testMemory(self):
+        'createIdempotencyStore() should size the IdempotencyStore of the "memory" backend from the configuration'
+        sut = createIdempotencyStore({'backend': 'memory', 'maxEntries': 10, 'ttlSeconds': 60})
+        self.assertEqual((sut.maxEntries, sut.ttlSeconds), (10, 60))
+
+    def testDynamoDB(self):
+        'createIdempotencyStore() should return a SharedIdempotencyStore on the client for the "dynamodb" backend'
+        client = VersionedClient()
+        sut = createIdempotencyStore({'backend': 'dynamodb', 'tableName': 'table', 'ttlSeconds': 60,
+                                      'inFlightSeconds': 5, 'keyPrefix': 'prefix:'}, client)
+        self.assertIsInstance(sut, SharedIdempotencyStore)
+        self.assertIs(sut.client, client)
+        self.assertEqual((sut.keyPrefix, sut.ttlSeconds, sut.inFlightSeconds), ('prefix:', 60, 5))
+
+    def testDynamoDBWithoutTable(self):
+        'createIdempotencyStore() should raise for the "dynamodb" backend without a "tableName"'
+        with self.assertRaises(ValueError):
+            createIdempotencyStore({'backend': 'dynamodb'})
@@ -88,6 +88,12 @@ class JSONUtilsJson2DateTime(unittest.TestCase):
         'jsonutils.json2datetime() should convert a string with a numeric timezone offset'
         self.doTest(datetime(2013, 1, 31, 3, 45, 0, 123000), '2013-01-31T04:45:00.123+01:00')
 
+    def testZPrecision(self):
+        'jsonutils.json2datetime() should convert Z strings without or with up to microsecond fractions'
+        self.doTest(datetime(2013, 1, 31, 3, 45, 0), '2013-01-31T03:45:00Z')
+        self.doTest(datetime(2013, 1, 31, 3, 45, 0, 100000), '2013-01-31T03:45:00.1Z')
+        self.doTest(datetime(2013, 1, 31, 3, 45, 0, 123456), '2013-01-31T03:45:00.123456Z')
+
 
 class JSONUtilsDumpDefault(unittest.TestCase):
     def setUp(self):
@@ -195,3 +201,38 @@ class JSONUtilsGetAtPath(unittest.TestCase):
         self.assertEqual(self.sut(self.dct, ['one', 'two', 'three'], 'default'), self.dct['one']['two']['three'])
         self.assertEqual(self.sut(self.dct, ['one', 'four'], 'default'), self.dct['one']['four'])
         self.assertEqual(self.sut(self.dct, ['one', 'four', '0'], 'default'), 5)
+
+
+class JSONUtilsMergePatch(unittest.TestCase):
+    def setUp(self):
+        self.sut = mergePatch
+
+    def testRFC7386Examples(self):
+        'jsonutils.mergePatch() should return the results of the examples of RFC 7386'
+        examples = [
+            ({'a': 'b'}, {'a': 'c'}, {'a': 'c'}),
+            ({'a': 'b'}, {'b': 'c'}, {'a': 'b', 'b': 'c'}),
+            ({'a': 'b'}, {'a': None}, {}),
+            ({'a': 'b', 'b': 'c'}, {'a': None}, {'b': 'c'}),
+            ({'a': ['b']}, {'a': 'c'}, {'a': 'c'}),
+            ({'a': 'c'}, {'a': ['b']}, {'a': ['b']}),
+            ({'a': {'b': 'c'}}, {'a': {'b': 'd', 'c': None}}, {'a': {'b': 'd'}}),
+            ({'a': [{'b': 'c'}]}, {'a': [1]}, {'a': [1]}),
+            (['a', 'b'], ['c', 'd'], ['c', 'd']),
+            ({'a': 'b'}, ['c'], ['c']),
+            ({'a': 'foo'}, None, None),
+            ({'a': 'foo'}, 'bar', 'bar'),
+            ({'e': None}, {'a': 1}, {'e': None, 'a': 1}),
+            ([1, 2], {'a': 'b', 'c': None}, {'a': 'b'}),
+            ({}, {'a': {'bb': {'ccc': None}}}, {'a': {'bb': {}}})
+        ]
+        for (target, patch, result) in examples:
+            self.assertEqual(self.sut(target, patch), result)
+
+    def testDoesNotModify(self):
+        'jsonutils.mergePatch() should not modify the target or the patch'
+        target = {'a': {'b': 'c'}, 'd': 'e'}
+        patch = {'a': {'b': None}, 'd': None}
+        self.assertEqual(self.sut(target, patch), {'a': {}})
+        self.assertEqual(target, {'a': {'b': 'c'}, 'd': 'e'})
+        self.assertEqual(patch, {'a': {'b': None}, 'd': None})
@@ -0,0 +1,139 @@
+import io
+import json
+import logging
+import sys
+import unittest
+
+import src.commons.log
+from src.commons.log import JsonFormatter, LogPipeline, configureLogging
+
+LOGGING_CONFIG = {
+    'version': 1,
+    'formatters': {
+        'json': {
+            '()': 'src.commons.log.JsonFormatter'
+        }
+    },
+    'handlers': {
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+            'formatter': 'json'
+        }
+    },
+    'root': {
+        'level': 'INFO',
+        'handlers': ['console']
+    }
+}
+
+
+def createRecord(msg='message %s', args=('arg',), exc_info=None, **extra):
+    record = logging.LogRecord('name', logging.INFO, 'path', 1, msg, args, exc_info)
+    record.__dict__.update(extra)
+    return record
+
+
+class JsonFormatterFormat(unittest.TestCase):
+    def setUp(self):
+        self.sut = JsonFormatter()
+
+    def testFields(self):
+        'JsonFormatter.format() should return a JSON object with timestamp, level, logger and message'
+        entry = json.loads(self.sut.format(createRecord()))
+        self.assertRegex(entry['timestamp'], '^\\d{4}-\\d{2}-\\d{2}T\\d{2}:\\d{2}:\\d{2}\\.\\d{3}Z$')
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'name')
+        self.assertEqual(entry['message'], 'message arg')
+
+    def testExtra(self):
+        'JsonFormatter.format() should include the extra attributes of the record'
+        entry = json.loads(self.sut.format(createRecord(key='value')))
+        self.assertEqual(entry['key'], 'value')
+
+    def testException(self):
+        'JsonFormatter.format() should include the formatted exception'
+        try:
+            raise ValueError('error')
+        except ValueError:
+            entry = json.loads(self.sut.format(createRecord(exc_info=sys.exc_info())))
+        self.assertIn('ValueError: error', entry['exception'])
+
+
+class LogPipelineSpec(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.Logger('pipeline')
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        handler.setLevel(logging.INFO)
+        self.logger.addHandler(handler)
+        self.sut = LogPipeline(self.logger)
+
+    def testStart(self):
+        'LogPipeline.start() should replace the handlers of the logger with a QueueHandler'
+        self.sut.start()
+        self.assertEqual(self.logger.handlers, [self.sut.queueHandler])
+        self.sut.stop()
+
+    def testFlush(self):
+        'LogPipeline.flush() should wait until the enqueued records are written'
+        self.sut.start()
+        self.logger.warning('message %s', 'arg')
+        self.sut.flush()
+        self.assertEqual(self.stream.getvalue(), 'message arg\n')
+        self.sut.stop()
+
+    def testException(self):
+        'LogPipeline should keep the exception and the stack of the records for the formatter'
+        self.logger.handlers[0].setFormatter(JsonFormatter())
+        self.sut.start()
+        try:
+            raise ValueError('error')
+        except ValueError:
+            self.logger.exception('message %s', 'arg', stack_info=True)
+        self.sut.flush()
+        self.sut.stop()
+        entry = json.loads(self.stream.getvalue())
+        self.assertEqual(entry['message'], 'message arg')
+        self.assertIn('ValueError: error', entry['exception'])
+        self.assertIn('Stack (most recent call last)', entry['stack'])
+
+    def testHandlerLevel(self):
+        'LogPipeline should not enqueue records below the level of every handler'
+        self.sut.start()
+        self.logger.debug('message')
+        self.assertTrue(self.sut.queue.empty())
+        self.sut.stop()
+
+    def testStop(self):
+        'LogPipeline.stop() should restore the handlers of the logger'
+        handlers = self.logger.handlers[:]
+        self.sut.start()
+        self.sut.stop()
+        self.assertEqual(self.logger.handlers, handlers)
+
+
+class ConfigureLogging(unittest.TestCase):
+    def tearDown(self):
+        if src.commons.log.currentPipeline is not None:
+            src.commons.log.currentPipeline.stop()
+            src.commons.log.currentPipeline = None
+
+    def testQueue(self):
+        'configureLogging() should start a LogPipeline for the root logger by default'
+        pipeline = configureLogging(LOGGING_CONFIG)
+        self.assertIsInstance(pipeline, LogPipeline)
+        self.assertEqual(logging.getLogger().handlers, [pipeline.queueHandler])
+
+    def testNoQueue(self):
+        'configureLogging() should not start a LogPipeline if disabled'
+        pipeline = configureLogging(LOGGING_CONFIG, {'enabled': False})
+        self.assertIsNone(pipeline)
+        self.assertIsInstance(logging.getLogger().handlers[0], logging.StreamHandler)
+
+    def testReplace(self):
+        'configureLogging() should stop the previous LogPipeline'
+        first = configureLogging(LOGGING_CONFIG)
+        second = configureLogging(LOGGING_CONFIG)
+        self.assertIsNot(first, second)
+        self.assertEqual(logging.getLogger().handlers, [second.queueHandler])
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import threading
+import unittest
+
+import src.commons.metrics
+from src.commons.metrics import Metrics, NULL_STAGE
+from src.commons.request_context import contextvars, setRequestContext, clearRequestContext
+from spec.helper import mockLoggerFactory, runCoroutine
+
+
+class MetricsDisabled(unittest.TestCase):
+    def setUp(self):
+        self.lines = []
+        self.sut = Metrics(mockLoggerFactory, {'enabled': False}, self.lines.append)
+
+    def testStage(self):
+        'Metrics.stage() should return the shared no-op stage if metrics are disabled'
+        self.assertIs(self.sut.stage('stage'), NULL_STAGE)
+
+    def testFlush(self):
+        'Metrics.flush() should not emit anything if metrics are disabled'
+        with self.sut.stage('stage'):
+            pass
+        self.sut.count('counter')
+        self.sut.flush('operation')
+        self.assertEqual(self.lines, [])
+
+    def testDefault(self):
+        'Metrics should be disabled without a configuration'
+        sut = Metrics(mockLoggerFactory)
+        self.assertFalse(sut.enabled)
+
+
+class MetricsEnabled(unittest.TestCase):
+    def setUp(self):
+        self.lines = []
+        self.sut = Metrics(mockLoggerFactory, {'enabled': True, 'namespace': 'ns'}, self.lines.append)
+
+    def testStages(self):
+        'Metrics.stage() should record the exclusive time of nested stages'
+        with self.sut.stage('outer'):
+            self.sut.record('inner', 0)
+            with self.sut.stage('inner'):
+                pass
+        self.assertEqual(set(self.sut.timings.keys()), {'outer', 'inner'})
+        self.assertGreaterEqual(self.sut.timings['outer'], 0)
+        self.assertGreaterEqual(self.sut.timings['inner'], 0)
+
+    def testStageAccumulates(self):
+        'Metrics.stage() should accumulate the time of stages with the same name'
+        self.sut.record('stage', 1.5)
+        self.sut.record('stage', 2.5)
+        self.assertEqual(self.sut.timings['stage'], 4.0)
+
+    def testStageRecordsOnError(self):
+        'Metrics.stage() should record the stage time even if the stage raises'
+        with self.assertRaises(ValueError):
+            with self.sut.stage('stage'):
+                raise ValueError()
+        self.assertIn('stage', self.sut.timings)
+        self.assertEqual(self.sut.stack, [])
+
+    def testFlush(self):
+        'Metrics.flush() should emit an Embedded Metric Format line and reset the collected values'
+        src.commons.metrics.coldStart = True
+        self.sut.record('stage', 1.5)
+        self.sut.count('counter', 2)
+        self.sut.setProperty('property', 'value')
+        self.sut.flush('operation')
+        self.assertEqual(len(self.lines), 1)
+        line = json.loads(self.lines[0])
+        directive = line['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(directive['Namespace'], 'ns')
+        self.assertEqual(directive['Dimensions'], [['Operation']])
+        self.assertEqual(directive['Metrics'], [
+            {'Name': 'stage', 'Unit': 'Milliseconds'},
+            {'Name': 'counter', 'Unit': 'Count'},
+            {'Name': 'ColdStart', 'Unit': 'Count'}
+        ])
+        self.assertIsInstance(line['_aws']['Timestamp'], int)
+        self.assertEqual(line['Operation'], 'operation')
+        self.assertEqual(line['ColdStart'], 1)
+        self.assertEqual(line['stage'], 1.5)
+        self.assertEqual(line['counter'], 2)
+        self.assertEqual(line['property'], 'value')
+        self.assertEqual(self.sut.timings, {})
+        self.assertEqual(self.sut.counts, {})
+
+    def testWarmFlush(self):
+        'Metrics.flush() should flag only the first flush of the execution environment as a cold start'
+        src.commons.metrics.coldStart = True
+        self.sut.flush('operation')
+        self.sut.flush('operation')
+        self.assertEqual(json.loads(self.lines[0])['ColdStart'], 1)
+        self.assertEqual(json.loads(self.lines[1])['ColdStart'], 0)
+
+    def testRequestContext(self):
+        'Metrics.flush() should include the values of the current request context'
+        setRequestContext(requestId='request-id', traceId='trace-id')
+        self.sut.flush('operation')
+        clearRequestContext()
+        line = json.loads(self.lines[0])
+        self.assertEqual(line['requestId'], 'request-id')
+        self.assertEqual(line['traceId'], 'trace-id')
+
+    def testEmitError(self):
+        'Metrics.flush() should not raise if the metrics cannot be emitted'
+        def emit(line):
+            raise IOError()
+        sut = Metrics(mockLoggerFactory, {'enabled': True}, emit)
+        sut.flush('operation')
+
+    def testConcurrentThreads(self):
+        'Metrics should keep the stages and counters of requests handled in different threads apart'
+        errors = []
+
+        def handle(operation):
+            try:
+                for _ in range(200):
+                    with self.sut.stage('outer'):
+                        with self.sut.stage('inner'):
+                            self.sut.count(operation)
+                    self.sut.flush(operation)
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=handle, args=('operation{0}'.format(i),)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.lines), 800)
+        for line in map(json.loads, self.lines):
+            self.assertEqual(line[line['Operation']], 1)
+            self.assertEqual(len([name for name in line if name.startswith('operation')]), 1)
+
+    @unittest.skipIf(contextvars is None, 'the asyncio tasks share the metrics without contextvars (Python < 3.7)')
+    def testConcurrentTasks(self):
+        'Metrics should keep the counters of requests handled in different asyncio tasks apart'
+        async def handle(operation):
+            self.sut.count(operation)
+            await asyncio.sleep(0)
+            self.sut.flush(operation)
+
+        async def handleAll():
+            await asyncio.gather(*[handle('operation{0}'.format(i)) for i in range(4)])
+        runCoroutine(handleAll())
+        self.assertEqual(len(self.lines), 4)
+        for line in map(json.loads, self.lines):
+            self.assertEqual(len([name for name in line if name.startswith('operation')]), 1)
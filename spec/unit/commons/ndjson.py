@@ -0,0 +1,39 @@
+import io
+import unittest
+from datetime import datetime
+
+import src.commons.ndjson as ndjson
+
+
+class NdjsonSpec(unittest.TestCase):
+    def setUp(self):
+        self.records = [{'uuid': str(i), 'created': datetime(2000, 1, 1)} for i in range(5)]
+
+    def testDumps(self):
+        'ndjson.dumps() should serialize a record to a compact json line with json datetimes'
+        self.assertEqual(ndjson.dumps(self.records[0]), '{"uuid":"0","created":"2000-01-01T00:00:00.000Z"}\n')
+
+    def testDumpChunks(self):
+        'ndjson.dumpChunks() should yield chunks of whole lines of at least chunkSize characters, but the last'
+        line = ndjson.dumps(self.records[0])
+        chunks = list(ndjson.dumpChunks(self.records, chunkSize=2 * len(line)))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 2, 1])
+        self.assertEqual(''.join(chunks), ''.join(ndjson.dumps(record) for record in self.records))
+
+    def testDumpChunksIsLazy(self):
+        'ndjson.dumpChunks() should only consume the records needed for the next chunk'
+        consumed = []
+
+        def records():
+            for record in self.records:
+                consumed.append(record)
+                yield record
+
+        next(ndjson.dumpChunks(records(), chunkSize=1))
+        self.assertEqual(len(consumed), 1)
+
+    def testDumpAndLoad(self):
+        'ndjson.load() should read back the records written by ndjson.dump(), skipping blank lines'
+        outfile = io.StringIO()
+        self.assertEqual(ndjson.dump(iter(self.records), outfile, chunkSize=10), 5)
+        self.assertEqual(list(ndjson.load(io.StringIO(outfile.getvalue() + '\n'))), self.records)
@@ -0,0 +1,57 @@
+import unittest
+
+from src.commons.nsp_error import NspError
+from src.commons.policy import Policy
+from src.commons.principal import Principal
+from spec.helper import mockLoggerFactory
+
+ACTIONS = {'read': 'read things', 'write': 'write things', 'export': 'export things'}
+
+
+class PolicySpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = Policy(mockLoggerFactory, ACTIONS, {'roles': {
+            'ROLE_ADMIN': ['*'],
+            'ROLE_READER': ['read'],
+            'ROLE_WRITER': ['read', 'write']
+        }})
+
+    def testCheck(self):
+        'Policy.check() should return if a role of the principal permits the action'
+        self.sut.check(Principal({'roles': {'ROLE_READER'}}), 'read')
+        self.sut.check(Principal({'roles': {'ROLE_READER', 'ROLE_WRITER'}}), 'write')
+        self.sut.check(Principal({'roles': {'ROLE_ADMIN'}}), 'export')
+
+    def testRaises(self):
+        'Policy.check() should raise FORBIDDEN with the description of the action'
+        for roles in [{'ROLE_READER'}, {'ROLE_UNKNOWN'}, set()]:
+            with self.assertRaises(NspError) as cm:
+                self.sut.check(Principal({'roles': roles}), 'write')
+            self.assertEqual(cm.exception.code, NspError.FORBIDDEN)
+            self.assertEqual(cm.exception.message, 'Principal is not authorized to write things')
+
+    def testCachesPermissions(self):
+        'Policy.getPermissions() should return the same permissions for the same role set'
+        permissions = self.sut.getPermissions(Principal({'roles': {'ROLE_WRITER'}}))
+        self.assertEqual(self.sut.getPermissions(Principal({'roles': ['ROLE_WRITER']})), permissions)
+        self.assertNotEqual(self.sut.getPermissions(Principal({'roles': {'ROLE_READER'}})), permissions)
+
+    def testIgnoresPrincipalPermissions(self):
+        'Policy.check() should ignore the permissions claimed by the principal'
+        for permissions in [2147483647, ['write']]:
+            principal = Principal({'roles': set(), 'permissions': permissions})
+            with self.assertRaises(NspError) as cm:
+                self.sut.check(principal, 'write')
+            self.assertEqual(cm.exception.code, NspError.FORBIDDEN)
+
+    def testDefaultRoles(self):
+        'Policy should use the default roles if the config has none'
+        sut = Policy(mockLoggerFactory, ACTIONS, {}, {'ROLE_READER': ['read']})
+        self.assertTrue(sut.isAllowed(Principal({'roles': {'ROLE_READER'}}), 'read'))
+        sut = Policy(mockLoggerFactory, ACTIONS, {'roles': {}}, {'ROLE_READER': ['read']})
+        self.assertFalse(sut.isAllowed(Principal({'roles': {'ROLE_READER'}}), 'read'))
+
+    def testUnknownAction(self):
+        'Policy should raise ValueError if a role permits an unknown action'
+        with self.assertRaises(ValueError):
+            Policy(mockLoggerFactory, ACTIONS, {'roles': {'ROLE_READER': ['read', 'delete']}})
@@ -0,0 +1,136 @@
+import threading
+import time
+import unittest
+
+from src.commons.deadline import Deadline, setDeadline
+from src.commons.nsp_error import NspError
+from src.commons.pool import Pool
+from spec.helper import mockLoggerFactory
+
+
+class Connection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class PoolSpec(unittest.TestCase):
+    def setUp(self):
+        self.connections = []
+
+    def create(self):
+        connection = Connection(len(self.connections))
+        self.connections.append(connection)
+        return connection
+
+    def createPool(self, **config):
+        return Pool(
+            mockLoggerFactory, 'test', self.create, Connection.close, lambda connection: connection.healthy, config
+        )
+
+    def testReuses(self):
+        'Pool should reuse the released resources'
+        sut = self.createPool()
+        with sut.resource() as connection:
+            pass
+        with sut.resource() as other:
+            self.assertIs(other, connection)
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(sut.stats()['created'], 1)
+        self.assertEqual(sut.stats()['idle'], 1)
+        self.assertEqual(sut.stats()['inUse'], 0)
+
+    def testFill(self):
+        'Pool.fill() should create the resources up to minSize'
+        sut = self.createPool(minSize=2)
+        sut.fill()
+        self.assertEqual(sut.stats()['size'], 2)
+        self.assertEqual(sut.stats()['idle'], 2)
+
+    def testMaxSize(self):
+        'Pool.acquire() should raise SERVICE_UNAVAILABLE when all the resources stay in use past the timeout'
+        sut = self.createPool(maxSize=1, acquireTimeoutSeconds=0.01)
+        sut.acquire()
+        with self.assertRaises(NspError) as context:
+            sut.acquire()
+        self.assertEqual(context.exception.code, NspError.SERVICE_UNAVAILABLE)
+        self.assertEqual(sut.stats()['timeouts'], 1)
+        self.assertEqual(sut.stats()['waits'], 1)
+
+    def testDeadline(self):
+        'Pool.acquire() should not wait past the deadline of the request'
+        sut = self.createPool(maxSize=1, acquireTimeoutSeconds=5)
+        sut.acquire()
+        setDeadline(Deadline(time.monotonic() + 0.01))
+        try:
+            with self.assertRaises(NspError) as context:
+                sut.acquire()
+        finally:
+            setDeadline(None)
+        self.assertEqual(context.exception.code, NspError.DEADLINE_EXCEEDED)
+
+    def testWaitsForRelease(self):
+        'Pool.acquire() should wait for a resource to be released when the pool is full'
+        sut = self.createPool(maxSize=1, acquireTimeoutSeconds=5)
+        connection = sut.acquire()
+        timer = threading.Timer(0.01, sut.release, args=(connection,))
+        timer.start()
+        self.assertIs(sut.acquire(), connection)
+        timer.join()
+
+    def testBroken(self):
+        'Pool.resource() should close the resource if the block raises'
+        sut = self.createPool()
+        with self.assertRaises(ValueError):
+            with sut.resource() as connection:
+                raise ValueError()
+        self.assertTrue(connection.closed)
+        self.assertEqual(sut.stats()['size'], 0)
+
+    def testHealthCheck(self):
+        'Pool.acquire() should replace the idle resources failing the health check'
+        sut = self.createPool(healthCheckSeconds=0)
+        connection = sut.acquire()
+        sut.release(connection)
+        connection.healthy = False
+        other = sut.acquire()
+        self.assertIsNot(other, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(sut.stats()['failedChecks'], 1)
+
+    def testEvictIdle(self):
+        'Pool.evictIdle() should close the resources idle for too long, keeping minSize'
+        sut = self.createPool(minSize=1, idleSeconds=0)
+        connections = [sut.acquire() for i in range(3)]
+        for connection in connections:
+            sut.release(connection)
+        sut.evictIdle()
+        self.assertEqual(sut.stats()['size'], 1)
+        self.assertEqual([connection.closed for connection in connections], [True, True, False])
+
+    def testClose(self):
+        'Pool.close() should close the idle resources, the ones in use when released, and refuse new acquisitions'
+        sut = self.createPool()
+        (idle, inUse) = (sut.acquire(), sut.acquire())
+        sut.release(idle)
+        sut.close()
+        self.assertTrue(idle.closed)
+        self.assertFalse(inUse.closed)
+        sut.release(inUse)
+        self.assertTrue(inUse.closed)
+        with self.assertRaises(NspError):
+            sut.acquire()
+
+    def testCreateFails(self):
+        'Pool.acquire() should free the place of a resource whose creation failed'
+        sut = Pool(mockLoggerFactory, 'test', self.fail, config={'maxSize': 1})
+        with self.assertRaises(IOError):
+            sut.acquire()
+        self.assertEqual(sut.stats()['size'], 0)
+
+    def fail(self):
+        raise IOError('unreachable')
@@ -0,0 +1,106 @@
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.profiler import Profiler, signProfileRequest, PROFILE_HEADER
+from spec.helper import mockLoggerFactory
+
+
+class ProfilerShouldProfile(unittest.TestCase):
+    def testDisabled(self):
+        'Profiler.shouldProfile() should return False if profiling is disabled'
+        sut = Profiler(mockLoggerFactory, {'enabled': False, 'sampleRate': 1}, {})
+        self.assertFalse(sut.shouldProfile({}))
+
+    def testSampleRate(self):
+        'Profiler.shouldProfile() should return True for the sampled requests'
+        self.assertTrue(Profiler(mockLoggerFactory, {'enabled': True, 'sampleRate': 1}, {}).shouldProfile({}))
+        self.assertFalse(Profiler(mockLoggerFactory, {'enabled': True, 'sampleRate': 0}, {}).shouldProfile({}))
+
+    def testEnvironment(self):
+        'Profiler.shouldProfile() should let the environment variables override the configuration'
+        environ = {'PROFILING_ENABLED': 'true', 'PROFILING_SAMPLE_RATE': '1'}
+        sut = Profiler(mockLoggerFactory, {'enabled': False, 'sampleRate': 0}, environ)
+        self.assertTrue(sut.shouldProfile({}))
+
+    def testSignedHeader(self):
+        'Profiler.shouldProfile() should return True if the request carries a valid signed header'
+        sut = Profiler(mockLoggerFactory, {'secret': 'secret'}, {})
+        event = {'headers': {PROFILE_HEADER: signProfileRequest('secret', int(time.time()) + 60)}}
+        self.assertTrue(sut.shouldProfile(event))
+
+    def testWrongSignature(self):
+        'Profiler.shouldProfile() should return False if the header is not signed with the secret'
+        sut = Profiler(mockLoggerFactory, {'secret': 'secret'}, {})
+        event = {'headers': {PROFILE_HEADER: signProfileRequest('other', int(time.time()) + 60)}}
+        self.assertFalse(sut.shouldProfile(event))
+
+    def testExpiredSignature(self):
+        'Profiler.shouldProfile() should return False if the signed header is expired'
+        sut = Profiler(mockLoggerFactory, {'secret': 'secret'}, {})
+        event = {'headers': {PROFILE_HEADER: signProfileRequest('secret', int(time.time()) - 60)}}
+        self.assertFalse(sut.shouldProfile(event))
+
+    def testMalformedHeader(self):
+        'Profiler.shouldProfile() should return False if the header is malformed'
+        sut = Profiler(mockLoggerFactory, {'secret': 'secret'}, {})
+        self.assertFalse(sut.shouldProfile({'headers': {PROFILE_HEADER: 'hello'}}))
+
+
+class ProfilerProfile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testNotSampled(self):
+        'Profiler.profile() should call the function and write nothing if the request is not sampled'
+        sut = Profiler(mockLoggerFactory, {'outputDirectory': self.directory.name}, {})
+        function = MagicMock(return_value='response')
+        self.assertEqual(sut.profile('operation', 'event', function), 'response')
+        function.assert_called_once_with('event')
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def testPstats(self):
+        'Profiler.profile() should write a pstats file for the sampled requests'
+        config = {'enabled': True, 'sampleRate': 1, 'outputDirectory': self.directory.name}
+        sut = Profiler(mockLoggerFactory, config, {})
+        self.assertEqual(sut.profile('operation', {}, lambda event: 'response'), 'response')
+        fileNames = os.listdir(self.directory.name)
+        self.assertEqual(len(fileNames), 1)
+        self.assertRegex(fileNames[0], '^operation-\\d+-[0-9a-f]{8}\\.pstats$')
+        pstats.Stats(os.path.join(self.directory.name, fileNames[0]))
+
+    def testCollapsed(self):
+        'Profiler.profile() should write collapsed stacks for the sampled requests'
+        config = {
+            'enabled': True,
+            'sampleRate': 1,
+            'outputDirectory': self.directory.name,
+            'format': 'collapsed',
+            'samplingIntervalMs': 1
+        }
+        sut = Profiler(mockLoggerFactory, config, {})
+        sut.profile('operation', {}, lambda event: time.sleep(0.05))
+        fileNames = os.listdir(self.directory.name)
+        self.assertEqual(len(fileNames), 1)
+        with open(os.path.join(self.directory.name, fileNames[0])) as infile:
+            lines = infile.readlines()
+        self.assertGreater(len(lines), 0)
+        for line in lines:
+            self.assertRegex(line, '^\\S+ \\d+\n$')
+
+    def testRaises(self):
+        'Profiler.profile() should write the profile and re-raise if the function raises'
+        config = {'enabled': True, 'sampleRate': 1, 'outputDirectory': self.directory.name}
+        sut = Profiler(mockLoggerFactory, config, {})
+
+        def function(event):
+            raise ValueError()
+        with self.assertRaises(ValueError):
+            sut.profile('operation', {}, function)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
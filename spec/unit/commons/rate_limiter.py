@@ -0,0 +1,160 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.nsp_error import NspError
+from src.commons.principal import Principal
+from src.commons.rate_limiter import LocalTokenBucketStore, RateLimiter, SharedTokenBucketStore
+from spec.helper import mockLoggerFactory
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class VersionedClient:
+    'In-memory stand-in of a shared key-value store with versioned compare-and-set'
+
+    def __init__(self):
+        self.values = {}
+        self.conflicts = 0
+
+    def get(self, key):
+        return self.values.get(key, (None, None))
+
+    def compareAndSet(self, key, value, version, ttlSeconds):
+        if self.conflicts > 0:
+            self.conflicts -= 1
+            return False
+        if self.values.get(key, (None, None))[1] != version:
+            return False
+        self.values[key] = (value, (version or 0) + 1)
+        return True
+
+
+class LocalTokenBucketStoreSpec(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.sut = LocalTokenBucketStore(clock=self.clock)
+
+    def testBurst(self):
+        'LocalTokenBucketStore.take() should allow burst requests, then refuse them with the seconds to wait'
+        self.assertEqual([self.sut.take('org', 1, 3) for i in range(3)], [(True, None)] * 3)
+        self.assertEqual(self.sut.take('org', 1, 3), (False, 1))
+        self.assertEqual(self.sut.take('org', 0.5, 3), (False, 2))
+        self.assertEqual(self.sut.take('other', 1, 3), (True, None))
+
+    def testRefill(self):
+        'LocalTokenBucketStore.take() should refill the buckets at rate tokens per second, up to burst'
+        for i in range(2):
+            self.sut.take('org', 2, 2)
+        self.clock.now += 0.5
+        self.assertEqual(self.sut.take('org', 2, 2), (True, None))
+        self.assertEqual(self.sut.take('org', 2, 2)[0], False)
+        self.clock.now += 100
+        self.assertEqual([self.sut.take('org', 2, 2)[0] for i in range(3)], [True, True, False])
+
+    def testEvictFull(self):
+        'LocalTokenBucketStore should drop the least recently used buckets that have refilled'
+        self.sut.take('a', 1, 1)
+        self.sut.take('b', 1, 1)
+        self.clock.now += 10
+        self.sut.take('c', 1, 1)
+        self.assertEqual(list(self.sut.buckets), ['c'])
+
+    def testEvictOwnLimits(self):
+        'LocalTokenBucketStore should judge whether a bucket has refilled by its own rate and burst'
+        self.sut.take('slow', 0.01, 10)
+        self.clock.now += 10
+        self.sut.take('fast', 100, 1)
+        self.assertEqual(list(self.sut.buckets), ['slow', 'fast'])
+
+    def testEvictLeastRecentlyUsed(self):
+        'LocalTokenBucketStore should drop the least recently used buckets when it has maxKeys'
+        sut = LocalTokenBucketStore(maxKeys=2, clock=self.clock)
+        sut.take('a', 1, 1)
+        sut.take('b', 1, 1)
+        sut.take('a', 1, 1)
+        sut.take('c', 1, 1)
+        self.assertEqual(list(sut.buckets), ['a', 'c'])
+        self.assertEqual(sut.take('a', 1, 1), (False, 1))
+
+
+class SharedTokenBucketStoreSpec(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.client = VersionedClient()
+        self.sut = SharedTokenBucketStore(self.client, clock=self.clock)
+
+    def testBurst(self):
+        'SharedTokenBucketStore.take() should keep the bucket in the shared store'
+        self.assertEqual([self.sut.take('org', 1, 2) for i in range(2)], [(True, None)] * 2)
+        self.assertEqual(self.sut.take('org', 1, 2), (False, 1))
+        other = SharedTokenBucketStore(self.client, clock=self.clock)
+        self.assertEqual(other.take('org', 1, 2), (False, 1))
+        self.assertEqual(self.client.values['rate-limit:org'][1], 4)
+
+    def testConflicts(self):
+        'SharedTokenBucketStore.take() should retry concurrent updates, and refuse when they keep failing'
+        self.client.conflicts = 2
+        self.assertEqual(self.sut.take('org', 1, 2), (True, None))
+        self.client.conflicts = 5
+        self.assertEqual(self.sut.take('org', 1, 2), (False, 1))
+
+
+class RateLimiterSpec(unittest.TestCase):
+    def setUp(self):
+        self.store = MagicMock()
+        self.store.take.return_value = (True, None)
+        self.metrics = MagicMock()
+        self.config = {
+            'enabled': True,
+            'default': {'rate': 1, 'burst': 2},
+            'limits': {'ROLE_THING_USER': {'rate': 10, 'burst': 20}, 'ROLE_BATCH': {'rate': 100, 'burst': 100}}
+        }
+        self.sut = RateLimiter(mockLoggerFactory, self.config, self.metrics, self.store)
+
+    def createPrincipal(self, *roles):
+        return Principal({'organizationId': 'ORG001', 'roles': set(roles)})
+
+    def testRoleLimit(self):
+        'RateLimiter.check() should apply the highest rate limit of the roles of the principal'
+        self.sut.check(self.createPrincipal('ROLE_THING_USER', 'ROLE_BATCH'))
+        self.store.take.assert_called_once_with('ORG001', 100, 100, 1)
+
+    def testDefaultLimit(self):
+        'RateLimiter.check() should apply the default limit to the principals without a limited role'
+        self.sut.check(self.createPrincipal('ROLE_OTHER'))
+        self.store.take.assert_called_once_with('ORG001', 1, 2, 1)
+
+    def testExempt(self):
+        'RateLimiter.check() should not limit the admins'
+        self.sut.check(self.createPrincipal('ROLE_ADMIN', 'ROLE_THING_USER'))
+        self.store.take.assert_not_called()
+
+    def testDisabled(self):
+        'RateLimiter.check() should not limit anything unless enabled'
+        sut = RateLimiter(mockLoggerFactory, dict(self.config, enabled=False), self.metrics, self.store)
+        sut.check(self.createPrincipal('ROLE_THING_USER'))
+        self.store.take.assert_not_called()
+
+    def testLimited(self):
+        'RateLimiter.check() should raise TOO_MANY_REQUESTS with retryAfter and count RateLimited'
+        self.store.take.return_value = (False, 3)
+        with self.assertRaises(NspError) as context:
+            self.sut.check(self.createPrincipal('ROLE_THING_USER'))
+        self.assertEqual(context.exception.code, NspError.TOO_MANY_REQUESTS)
+        self.assertEqual(context.exception.retryAfter, 3)
+        self.metrics.count.assert_called_once_with('RateLimited')
+
+    def testLocalStore(self):
+        'RateLimiter should keep the buckets in memory by default'
+        sut = RateLimiter(mockLoggerFactory, self.config)
+        principal = self.createPrincipal('ROLE_OTHER')
+        sut.check(principal)
+        sut.check(principal)
+        with self.assertRaises(NspError):
+            sut.check(principal)
@@ -0,0 +1,64 @@
+import logging
+import threading
+import unittest
+
+from src.commons.request_context import (
+    ThreadLocalVar, RequestContextFilter, setRequestContext, getRequestContext, clearRequestContext
+)
+
+
+class RequestContextSetRequestContext(unittest.TestCase):
+    def tearDown(self):
+        clearRequestContext()
+
+    def testSet(self):
+        'setRequestContext() should replace the current request context dropping the None values'
+        setRequestContext(requestId='request-id', traceId=None)
+        self.assertEqual(getRequestContext(), {'requestId': 'request-id'})
+        setRequestContext(traceId='trace-id')
+        self.assertEqual(getRequestContext(), {'traceId': 'trace-id'})
+
+    def testClear(self):
+        'clearRequestContext() should empty the current request context'
+        setRequestContext(requestId='request-id')
+        clearRequestContext()
+        self.assertEqual(getRequestContext(), {})
+
+    def testThreads(self):
+        'The request context should not leak across threads'
+        setRequestContext(requestId='request-id')
+        contexts = []
+        thread = threading.Thread(target=lambda: contexts.append(getRequestContext()))
+        thread.start()
+        thread.join()
+        self.assertEqual(contexts, [{}])
+
+
+class RequestContextThreadLocalVar(unittest.TestCase):
+    def test(self):
+        'ThreadLocalVar should return the default until a value is set'
+        var = ThreadLocalVar('name', default={})
+        self.assertEqual(var.get(), {})
+        var.set({'a': 1})
+        self.assertEqual(var.get(), {'a': 1})
+
+
+class RequestContextRequestContextFilter(unittest.TestCase):
+    def tearDown(self):
+        clearRequestContext()
+
+    def testAttaches(self):
+        'RequestContextFilter.filter() should attach the request context to the record'
+        setRequestContext(requestId='request-id', traceId='trace-id')
+        record = logging.LogRecord('name', logging.INFO, 'path', 1, 'message', None, None)
+        self.assertTrue(RequestContextFilter().filter(record))
+        self.assertEqual(record.requestId, 'request-id')
+        self.assertEqual(record.traceId, 'trace-id')
+
+    def testDoesNotOverwrite(self):
+        'RequestContextFilter.filter() should not overwrite the values already attached to the record'
+        setRequestContext(requestId='request-id')
+        record = logging.LogRecord('name', logging.INFO, 'path', 1, 'message', None, None)
+        record.requestId = 'other'
+        RequestContextFilter().filter(record)
+        self.assertEqual(record.requestId, 'other')
@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.resource_manager import ResourceManager
+from spec.helper import mockLoggerFactory
+
+
+class ResourceManagerSpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = ResourceManager(mockLoggerFactory, {'pools': {'db': {'minSize': 2}}})
+
+    def testPool(self):
+        'ResourceManager.pool() should create the pool once, with its configuration, filled to minSize'
+        create = MagicMock()
+        pool = self.sut.pool('db', create)
+        self.assertIs(self.sut.pool('db', create), pool)
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual(self.sut.stats()['db']['idle'], 2)
+
+    def testClose(self):
+        'ResourceManager.close() should close the pools and the registered resources, the most recent first'
+        closed = []
+        self.sut.register(lambda: closed.append('first'))
+        self.sut.pool('db', MagicMock, close=lambda resource: closed.append('pool'))
+        self.sut.register(lambda: closed.append('last'))
+        self.sut.close()
+        self.assertEqual(closed, ['last', 'pool', 'pool', 'first'])
+        self.assertEqual(self.sut.stats(), {})
+
+    def testCloseErrors(self):
+        'ResourceManager.close() should close the other resources when one fails'
+        close = MagicMock()
+        self.sut.register(close)
+        self.sut.register(MagicMock(side_effect=IOError()))
+        self.sut.close()
+        close.assert_called_once_with()
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from src.commons.sharded_map import ShardedMap
+
+
+class ShardedMapSpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = ShardedMap(4, [('a', 1), ('b', 2), ('c', 3)])
+
+    def testItems(self):
+        'ShardedMap should be initialized with the items'
+        self.assertEqual(len(self.sut), 3)
+        self.assertEqual(dict(self.sut.items()), {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(sorted(self.sut), ['a', 'b', 'c'])
+        self.assertEqual(sorted(self.sut.values()), [1, 2, 3])
+
+    def testGetAndSet(self):
+        'ShardedMap should get, set and replace values like a dict'
+        self.sut['d'] = 4
+        self.sut['a'] = 5
+        self.assertEqual(self.sut['d'], 4)
+        self.assertEqual(self.sut.get('a'), 5)
+        self.assertIsNone(self.sut.get('e'))
+        self.assertIn('d', self.sut)
+        self.assertNotIn('e', self.sut)
+        with self.assertRaises(KeyError):
+            self.sut['e']
+
+    def testPop(self):
+        'ShardedMap.pop() should remove and return the value, or the default'
+        self.assertEqual(self.sut.pop('a'), 1)
+        self.assertNotIn('a', self.sut)
+        self.assertIsNone(self.sut.pop('a', None))
+        with self.assertRaises(KeyError):
+            self.sut.pop('a')
+
+    def testLock(self):
+        'ShardedMap.lock() should return the same reentrant lock for the same key'
+        self.assertIs(self.sut.lock('a'), self.sut.lock('a'))
+        with self.sut.lock('a'):
+            self.sut['a'] = 6
+        self.assertEqual(self.sut['a'], 6)
+
+    def testLockAll(self):
+        'ShardedMap.lockAll() should hold the locks of all the shards'
+        def tryLocks(results):
+            for lock in self.sut.locks:
+                results.append(lock.acquire(blocking=False))
+                if results[-1]:
+                    lock.release()
+
+        def tryLocksInThread():
+            results = []
+            thread = threading.Thread(target=tryLocks, args=(results,))
+            thread.start()
+            thread.join()
+            return results
+        with self.sut.lockAll():
+            self.assertEqual(tryLocksInThread(), [False] * 4)
+        self.assertEqual(tryLocksInThread(), [True] * 4)
+
+    def testConcurrentWrites(self):
+        'ShardedMap should not lose writes of concurrent threads'
+        def writer(thread):
+            for i in range(1000):
+                self.sut['{0}-{1}'.format(thread, i)] = i
+        threads = [threading.Thread(target=writer, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.sut), 8003)
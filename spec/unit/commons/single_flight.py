@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from src.commons.deadline import Deadline, setDeadline
+from src.commons.nsp_error import NspError
+from src.commons.single_flight import AsyncSingleFlight, SingleFlight
+from spec.helper import runCoroutine
+
+
+class SingleFlightSpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def blockingCall(self, result=None, error=None):
+        def call():
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+        return call
+
+    def runConcurrently(self, key, function, count):
+        'Starts a leader call, then count - 1 calls while it is in flight, returning the results or errors'
+        results = [None] * count
+
+        def run(i):
+            try:
+                results[i] = self.sut.do(key, function)
+            except Exception as error:
+                results[i] = error
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        threads[0].start()
+        self.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while self.sut.stats()['calls'] < count:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def testDo(self):
+        'SingleFlight.do() should return the result of the function, not shared'
+        self.assertEqual(self.sut.do('key', lambda: 'result'), ('result', False))
+        self.assertEqual(self.sut.do('key', lambda: 'again'), ('again', False))
+        self.assertEqual(self.sut.stats(), {'calls': 2, 'shared': 0, 'hotKeys': []})
+
+    def testShared(self):
+        'SingleFlight.do() should share the call in flight with the concurrent calls of the same key'
+        results = self.runConcurrently('key', self.blockingCall('result'), 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), [('result', False)] + [('result', True)] * 3)
+        self.assertEqual(self.sut.stats(), {'calls': 4, 'shared': 3, 'hotKeys': [('key', 3)]})
+        self.assertEqual(self.sut.calls, {})
+
+    def testSharedError(self):
+        'SingleFlight.do() should raise the error of the call in flight in all the concurrent calls of the same key'
+        error = NspError(NspError.SERVICE_UNAVAILABLE, 'Unavailable')
+        results = self.runConcurrently('key', self.blockingCall(error=error), 3)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [error] * 3)
+        self.assertEqual(self.sut.do('key', lambda: 'result'), ('result', False))
+
+    def testDistinctKeys(self):
+        'SingleFlight.do() should not share the calls of different keys'
+        self.sut.do('a', lambda: self.assertEqual(self.sut.do('b', lambda: 'b'), ('b', False)))
+        self.assertEqual(self.sut.stats()['shared'], 0)
+
+    def testDeadline(self):
+        'SingleFlight.do() should not wait for the call in flight past the deadline of the request'
+        thread = threading.Thread(target=self.sut.do, args=('key', self.blockingCall('result')))
+        thread.start()
+        self.started.wait(5)
+        setDeadline(Deadline(time.monotonic() + 0.01))
+        try:
+            with self.assertRaises(NspError) as context:
+                self.sut.do('key', lambda: 'result')
+        finally:
+            setDeadline(None)
+            self.release.set()
+            thread.join()
+        self.assertEqual(context.exception.code, NspError.DEADLINE_EXCEEDED)
+
+    def testHotKeys(self):
+        'SingleFlight.stats() should keep the shared counts of at most maxKeys keys'
+        self.sut = SingleFlight(maxKeys=2)
+        for key in ['a', 'b', 'a', 'c']:
+            self.sut.counters.record(key, True)
+        self.assertEqual(self.sut.stats(), {'calls': 4, 'shared': 4, 'hotKeys': [('c', 1)]})
+
+
+class AsyncSingleFlightSpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = AsyncSingleFlight()
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    def testShared(self):
+        'AsyncSingleFlight.do() should share the call in flight with the concurrent calls of the same key'
+        async def run():
+            return await asyncio.gather(*(self.sut.do('key', self.call) for i in range(3)))
+        self.assertEqual(runCoroutine(run()), [('result', False), ('result', True), ('result', True)])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.sut.stats(), {'calls': 3, 'shared': 2, 'hotKeys': [('key', 2)]})
+        self.assertEqual(self.sut.calls, {})
+
+    def testCancelled(self):
+        'AsyncSingleFlight.do() should not cancel the call in flight when its first caller is cancelled'
+        async def run():
+            leader = asyncio.ensure_future(self.sut.do('key', self.call))
+            follower = asyncio.ensure_future(self.sut.do('key', self.call))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+        self.assertEqual(runCoroutine(run()), ('result', True))
+        self.assertEqual(self.calls, 1)
@@ -0,0 +1,72 @@
+import unittest
+
+from src.commons.sorted_index import SortedIndex
+
+
+class SortedIndexSpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = SortedIndex(lambda entity: entity['name'])
+        for (uuid, owner, name) in [('1', 'A', 'b'), ('2', 'B', 'a'), ('3', 'A', 'c'), ('4', 'A', 'a')]:
+            self.sut.add({'uuid': uuid, 'owner': owner, 'name': name})
+
+    def testEntries(self):
+        'SortedIndex.entries() should return the entries sorted by key and uuid, per owner or for all the owners'
+        self.assertEqual(self.sut.entries(None), [('a', '2'), ('a', '4'), ('b', '1'), ('c', '3')])
+        self.assertEqual(self.sut.entries('A'), [('a', '4'), ('b', '1'), ('c', '3')])
+        self.assertEqual(self.sut.entries('C'), [])
+
+    def testRemove(self):
+        'SortedIndex.remove() should remove the entry of the entity'
+        self.sut.remove({'uuid': '2', 'owner': 'B', 'name': 'a'})
+        self.assertEqual(self.sut.entries(None), [('a', '4'), ('b', '1'), ('c', '3')])
+        self.assertEqual(self.sut.entries('B'), [])
+        self.assertNotIn('B', self.sut.byOwner)
+
+    def testRemoveMissing(self):
+        'SortedIndex.remove() should ignore entities that are not indexed'
+        self.sut.remove({'uuid': '9', 'owner': 'A', 'name': 'a'})
+        self.assertEqual(len(self.sut.entries(None)), 4)
+
+    def testRange(self):
+        'SortedIndex.range() should return the positions delimiting the keys in [low, high)'
+        self.assertEqual(self.sut.range(None, 'b', 'c'), (2, 3))
+        self.assertEqual(self.sut.range(None), (0, 4))
+        self.assertEqual(self.sut.range('A', 'b'), (1, 3))
+
+    def testPrefixRange(self):
+        'SortedIndex.prefixRange() should return the positions delimiting the keys starting with the prefix'
+        self.assertEqual(self.sut.prefixRange(None, 'a'), (0, 2))
+        self.assertEqual(self.sut.prefixRange(None, 'z'), (4, 4))
+
+    def testPage(self):
+        'SortedIndex.page() should return the uuids of the requested page of the range'
+        self.assertEqual(self.sut.page(None, 0, 4), ['2', '4', '1', '3'])
+        self.assertEqual(self.sut.page(None, 0, 4, offset=1, limit=2), ['4', '1'])
+        self.assertEqual(self.sut.page(None, 1, 3, offset=1, limit=5), ['1'])
+        self.assertEqual(self.sut.page(None, 0, 4, offset=10), [])
+
+    def testPageDescending(self):
+        'SortedIndex.page() should return the uuids of the requested page of the range in descending order'
+        self.assertEqual(self.sut.page(None, 0, 4, descending=True), ['3', '1', '4', '2'])
+        self.assertEqual(self.sut.page(None, 0, 4, offset=1, limit=2, descending=True), ['1', '4'])
+        self.assertEqual(self.sut.page(None, 1, 3, offset=1, limit=5, descending=True), ['4'])
+        self.assertEqual(self.sut.page(None, 0, 4, offset=10, descending=True), [])
+
+    def testEntriesAfter(self):
+        'SortedIndex.entriesAfter() should iterate over the entries with key strictly greater than low'
+        self.assertEqual(list(self.sut.entriesAfter(None, 'a')), [('b', '1'), ('c', '3')])
+        self.assertEqual(list(self.sut.entriesAfter('A', '')), [('a', '4'), ('b', '1'), ('c', '3')])
+        self.assertEqual(list(self.sut.entriesAfter('B', 'a')), [])
+
+    def testEntriesAfterEntry(self):
+        'SortedIndex.entriesAfter() should iterate over the entries after the given key and uuid'
+        self.assertEqual(list(self.sut.entriesAfter(None, 'a', '2')), [('a', '4'), ('b', '1'), ('c', '3')])
+        self.assertEqual(list(self.sut.entriesAfter(None, 'a', '4')), [('b', '1'), ('c', '3')])
+
+    def testAddAll(self):
+        'SortedIndex.addAll() should add the entities keeping the entries sorted'
+        self.sut.addAll([{'uuid': '5', 'owner': 'B', 'name': 'a'}, {'uuid': '6', 'owner': 'C', 'name': 'b'}])
+        self.assertEqual(self.sut.entries('B'), [('a', '2'), ('a', '5')])
+        self.assertEqual(self.sut.entries('C'), [('b', '6')])
+        self.assertEqual(self.sut.entries(None), sorted(self.sut.entries(None)))
+        self.assertEqual(len(self.sut.entries(None)), 6)
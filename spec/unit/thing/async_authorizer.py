@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.nsp_error import NspError
+from src.thing.async_authorizer import AsyncAuthorizer
+from spec.helper import completed, mockLoggerFactory, runCoroutine
+
+
+class AsyncAuthorizerSpec(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.principal = MagicMock()
+        self.policy = MagicMock()
+        self.sut = AsyncAuthorizer(mockLoggerFactory, self.logic, policy=self.policy)
+
+    def testCreateThing(self):
+        'AsyncAuthorizer.createThing() should check the authorization, set the owner and await logic.createThing()'
+        self.principal.getOwner.return_value = 'org'
+        self.logic.createThing.side_effect = lambda principal, thing: completed(thing)
+        result = runCoroutine(self.sut.createThing(self.principal, {'owner': 'other'}))
+        self.assertEqual(result, {'owner': 'org'})
+        self.policy.check.assert_called_once_with(self.principal, 'createThing')
+        self.principal.getOwner.assert_called_once_with('other')
+
+    def testGetUpdateDeleteThing(self):
+        'AsyncAuthorizer.getThing(), updateThing() and deleteThing() should check the authorization'
+        self.logic.getThing.side_effect = lambda principal, uuid: completed('got')
+        self.logic.updateThing.side_effect = lambda principal, uuid, thing: completed('updated')
+        self.logic.deleteThing.side_effect = lambda principal, uuid: completed(None)
+        self.assertEqual(runCoroutine(self.sut.getThing(self.principal, 'uuid')), 'got')
+        self.assertEqual(runCoroutine(self.sut.updateThing(self.principal, 'uuid', {})), 'updated')
+        self.assertIsNone(runCoroutine(self.sut.deleteThing(self.principal, 'uuid')))
+        self.assertEqual([call[0][1] for call in self.policy.check.call_args_list], [
+            'getThing', 'updateThing', 'deleteThing'
+        ])
+
+    def testListAndSearchThings(self):
+        'AsyncAuthorizer.listThings() and searchThings() should apply the owner filter'
+        self.principal.getOwnerFilter.return_value = 'org'
+        self.logic.listThings.side_effect = lambda principal, owner, **options: completed([owner, options])
+        self.logic.searchThings.side_effect = lambda principal, owner, query, **options: completed([owner, query])
+        self.assertEqual(runCoroutine(self.sut.listThings(self.principal, None, limit=1)), ['org', {'limit': 1}])
+        self.assertEqual(runCoroutine(self.sut.searchThings(self.principal, None, 'query')), ['org', 'query'])
+
+    def testListChanges(self):
+        'AsyncAuthorizer.listChanges() should check the authorization and apply the owner filter'
+        self.principal.getOwnerFilter.return_value = 'org'
+        self.logic.listChanges.side_effect = lambda principal, owner, **options: completed([owner, options])
+        self.assertEqual(runCoroutine(self.sut.listChanges(self.principal, None, after=1)), ['org', {'after': 1}])
+        self.policy.check.assert_called_once_with(self.principal, 'listChanges')
+
+    def testForbidden(self):
+        'AsyncAuthorizer should not call the logic if the principal is not authorized'
+        self.policy.check.side_effect = NspError(NspError.FORBIDDEN, 'forbidden')
+        with self.assertRaises(NspError):
+            runCoroutine(self.sut.getThing(self.principal, 'uuid'))
+        self.logic.getThing.assert_not_called()
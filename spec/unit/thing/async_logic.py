@@ -0,0 +1,109 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from src.commons.nsp_error import NspError
+from src.commons.principal import Principal
+from src.thing.async_logic import AsyncLogic
+from src.thing.async_repository import AsyncRepository
+from spec.helper import mockLoggerFactory, runCoroutine
+
+
+class AsyncLogicSpec(unittest.TestCase):
+    def setUp(self):
+        self.repository = MagicMock()
+        self.sut = AsyncLogic(mockLoggerFactory, AsyncRepository(mockLoggerFactory, self.repository))
+        self.principal = Principal({'organizationId': '001', 'roles': []})
+        self.thing = {
+            'uuid': 'uuid',
+            'owner': '001',
+            'created': datetime(2012, 12, 26),
+            'lastModified': datetime(2012, 12, 26),
+            'name': 'name'
+        }
+
+    def testCreateThing(self):
+        'AsyncLogic.createThing() should set the uuid and the timestamps and create the thing'
+        self.repository.createThing.side_effect = lambda thing: thing
+        result = runCoroutine(self.sut.createThing(self.principal, {'owner': '001', 'name': 'name'}))
+        self.assertIsNotNone(result['uuid'])
+        self.assertEqual(result['created'], result['lastModified'])
+        self.repository.getThing.assert_not_called()
+
+    def testCreateThingAlreadyExists(self):
+        'AsyncLogic.createThing() should raise THING_ALREADY_EXISTS if the uuid is taken'
+        self.repository.getThing.return_value = self.thing
+        with self.assertRaises(NspError) as context:
+            runCoroutine(self.sut.createThing(self.principal, {'uuid': 'uuid', 'owner': '001'}))
+        self.assertEqual(context.exception.code, NspError.THING_ALREADY_EXISTS)
+        self.repository.createThing.assert_not_called()
+
+    def testGetThingNotFound(self):
+        'AsyncLogic.getThing() should raise THING_NOT_FOUND if the thing does not exist'
+        self.repository.getThing.return_value = None
+        with self.assertRaises(NspError) as context:
+            runCoroutine(self.sut.getThing(self.principal, 'uuid'))
+        self.assertEqual(context.exception.code, NspError.THING_NOT_FOUND)
+
+    def testGetThingNotVisible(self):
+        'AsyncLogic.getThing() should raise THING_NOT_FOUND if the thing belongs to another organization'
+        self.repository.getThing.return_value = dict(self.thing, owner='002')
+        with self.assertRaises(NspError) as context:
+            runCoroutine(self.sut.getThing(self.principal, 'uuid'))
+        self.assertEqual(context.exception.code, NspError.THING_NOT_FOUND)
+
+    def testUpdateThing(self):
+        'AsyncLogic.updateThing() should update lastModified and compare and set on the old one'
+        self.repository.getThing.return_value = self.thing
+        self.repository.updateThing.side_effect = lambda thing, expectedLastModified: thing
+        newThing = dict(self.thing, name='another name')
+        result = runCoroutine(self.sut.updateThing(self.principal, 'uuid', newThing))
+        self.assertEqual(result['name'], 'another name')
+        self.assertGreater(result['lastModified'], self.thing['lastModified'])
+        self.repository.updateThing.assert_called_once_with(newThing, expectedLastModified=datetime(2012, 12, 26))
+
+    def testUpdateThingReadOnlyProperties(self):
+        'AsyncLogic.updateThing() should raise THING_UNPROCESSABLE if a read-only property changes'
+        self.repository.getThing.return_value = self.thing
+        with self.assertRaises(NspError) as context:
+            runCoroutine(self.sut.updateThing(self.principal, 'uuid', dict(self.thing, created=datetime(2013, 1, 1))))
+        self.assertEqual(context.exception.code, NspError.THING_UNPROCESSABLE)
+        self.repository.updateThing.assert_not_called()
+
+    def testPatchThing(self):
+        'AsyncLogic.patchThing() should update the thing merged with the patch'
+        self.repository.getThing.return_value = self.thing
+        self.repository.updateThing.side_effect = lambda thing, expectedLastModified: thing
+        result = runCoroutine(self.sut.patchThing(self.principal, 'uuid', {'name': 'another name'}))
+        self.assertEqual(result['name'], 'another name')
+        self.assertEqual(self.thing['name'], 'name')
+        self.assertGreater(result['lastModified'], self.thing['lastModified'])
+
+    def testUpdateThingUnchanged(self):
+        'AsyncLogic.updateThing() should not write an update that changes nothing'
+        self.repository.getThing.return_value = self.thing
+        result = runCoroutine(self.sut.updateThing(self.principal, 'uuid', dict(self.thing)))
+        self.assertIs(result, self.thing)
+        self.repository.updateThing.assert_not_called()
+
+    def testDeleteThing(self):
+        'AsyncLogic.deleteThing() should delete the visible thing'
+        self.repository.getThing.return_value = self.thing
+        runCoroutine(self.sut.deleteThing(self.principal, 'uuid'))
+        self.repository.deleteThing.assert_called_once_with('uuid')
+
+    def testListAndSearchThings(self):
+        'AsyncLogic.listThings() and searchThings() should return the things of the repository'
+        self.repository.listThings.return_value = ['listed']
+        self.repository.searchThings.return_value = ['found']
+        self.assertEqual(runCoroutine(self.sut.listThings(self.principal, '001', limit=1)), ['listed'])
+        self.assertEqual(runCoroutine(self.sut.searchThings(self.principal, '001', 'query')), ['found'])
+        self.repository.listThings.assert_called_once_with('001', limit=1)
+        self.repository.searchThings.assert_called_once_with('001', 'query')
+
+    def testListChanges(self):
+        'AsyncLogic.listChanges() should return the changes of the repository'
+        self.repository.listChanges.return_value = {'changes': []}
+        result = runCoroutine(self.sut.listChanges(self.principal, '001', after=1, epoch='epoch'))
+        self.assertEqual(result, {'changes': []})
+        self.repository.listChanges.assert_called_once_with('001', after=1, epoch='epoch')
@@ -0,0 +1,59 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from src.commons.deadline import Deadline, setDeadline
+from src.commons.nsp_error import NspError
+from src.thing.async_repository import AsyncRepository
+from spec.helper import mockLoggerFactory, runCoroutine
+
+
+class AsyncRepositorySpec(unittest.TestCase):
+    def setUp(self):
+        self.repository = MagicMock()
+        self.sut = AsyncRepository(mockLoggerFactory, self.repository)
+
+    def testDelegates(self):
+        'AsyncRepository should delegate to the methods of the repository and return their values'
+        self.repository.getThing.return_value = 'thing'
+        self.repository.listThings.return_value = ['thing']
+        self.repository.listChanges.return_value = {'changes': []}
+        self.assertEqual(runCoroutine(self.sut.getThing('uuid')), 'thing')
+        self.assertEqual(runCoroutine(self.sut.listThings('owner', offset=1)), ['thing'])
+        self.repository.getThing.assert_called_once_with('uuid')
+        self.assertEqual(runCoroutine(self.sut.listChanges('owner', after=1)), {'changes': []})
+        self.repository.listThings.assert_called_once_with('owner', offset=1)
+        self.repository.listChanges.assert_called_once_with('owner', after=1)
+
+    def testUpdateThing(self):
+        'AsyncRepository.updateThing() should pass expectedLastModified'
+        runCoroutine(self.sut.updateThing({'uuid': 'uuid'}, expectedLastModified='date'))
+        self.repository.updateThing.assert_called_once_with({'uuid': 'uuid'}, expectedLastModified='date')
+
+    def testExecutor(self):
+        'AsyncRepository should run the calls in the executor if given'
+        self.repository.searchThings.return_value = ['thing']
+        with ThreadPoolExecutor(1) as executor:
+            sut = AsyncRepository(mockLoggerFactory, self.repository, executor)
+            self.assertEqual(runCoroutine(sut.searchThings('owner', 'query', limit=2)), ['thing'])
+        self.repository.searchThings.assert_called_once_with('owner', 'query', limit=2)
+
+    def testDeadline(self):
+        'AsyncRepository should not wait for the executor past the deadline of the request'
+        self.repository.getThing.side_effect = lambda uuid: time.sleep(0.2)
+        with ThreadPoolExecutor(1) as executor:
+            sut = AsyncRepository(mockLoggerFactory, self.repository, executor)
+            setDeadline(Deadline(time.monotonic() + 0.01))
+            try:
+                with self.assertRaises(NspError) as context:
+                    runCoroutine(sut.getThing('uuid'))
+            finally:
+                setDeadline(None)
+        self.assertEqual(context.exception.code, NspError.DEADLINE_EXCEEDED)
+
+    def testRaises(self):
+        'AsyncRepository should propagate the errors of the repository'
+        self.repository.deleteThing.side_effect = KeyError('uuid')
+        with self.assertRaises(KeyError):
+            runCoroutine(self.sut.deleteThing('uuid'))
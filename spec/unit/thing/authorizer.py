@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock
 from src.commons.nsp_error import NspError
+from src.commons.principal import Principal
 from src.thing.authorizer import Authorizer
 from spec.helper import mockLoggerFactory
 
@@ -9,16 +10,17 @@ class AuthorizerCreateThing(unittest.TestCase):
     def setUp(self):
         self.logic = MagicMock()
         self.principal = MagicMock()
-        self.sut = Authorizer(mockLoggerFactory, self.logic)
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
 
     def testItCallsTheExpectedMethods(self):
         '''
-        ThingAuthorizer.createThing() should call principal.checkAuthorization(), principal.getOwner() and
+        ThingAuthorizer.createThing() should call policy.check(), principal.getOwner() and
         logic.createThing()
         '''
         thing = {'owner': 'org'}
         self.sut.createThing(self.principal, thing)
-        self.principal.checkAuthorization.assert_called_once_with({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'create things')
+        self.policy.check.assert_called_once_with(self.principal, 'createThing')
         self.principal.getOwner.assert_called_once_with('org')
         self.logic.createThing.assert_called_once_with(self.principal, thing)
 
@@ -29,18 +31,25 @@ class AuthorizerCreateThing(unittest.TestCase):
         value = self.sut.createThing(self.principal, {})
         self.assertIs(value, thing)
 
+    def testAuthorizeCreateThing(self):
+        'ThingAuthorizer.authorizeCreateThing() should check the createThing action and the rate limit only'
+        self.sut.authorizeCreateThing(self.principal)
+        self.policy.check.assert_called_once_with(self.principal, 'createThing')
+        self.logic.createThing.assert_not_called()
+
 
 class AuthorizerGetThing(unittest.TestCase):
     def setUp(self):
         self.logic = MagicMock()
         self.principal = MagicMock()
-        self.sut = Authorizer(mockLoggerFactory, self.logic)
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
 
     def testItCallsTheExpectedMethods(self):
-        'ThingAuthorizer.getThing() should call principal.checkAuthorization() and logic.getThing()'
+        'ThingAuthorizer.getThing() should call policy.check() and logic.getThing()'
         uuid = 'uuid'
         self.sut.getThing(self.principal, uuid)
-        self.principal.checkAuthorization.assert_called_once_with({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'get things')
+        self.policy.check.assert_called_once_with(self.principal, 'getThing')
         self.logic.getThing.assert_called_once_with(self.principal, uuid)
 
     def testItReturnsTheExpectedValue(self):
@@ -55,14 +64,15 @@ class AuthorizerUpdateThing(unittest.TestCase):
     def setUp(self):
         self.logic = MagicMock()
         self.principal = MagicMock()
-        self.sut = Authorizer(mockLoggerFactory, self.logic)
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
 
     def testItCallsTheExpectedMethods(self):
-        'ThingAuthorizer.updateThing() should call principal.checkAuthorization() and logic.updateThing()'
+        'ThingAuthorizer.updateThing() should call policy.check() and logic.updateThing()'
         uuid = 'uuid'
         thing = 'thing'
         self.sut.updateThing(self.principal, uuid, thing)
-        self.principal.checkAuthorization.assert_called_once_with({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'update things')
+        self.policy.check.assert_called_once_with(self.principal, 'updateThing')
         self.logic.updateThing.assert_called_once_with(self.principal, uuid, thing)
 
     def testItReturnsTheExpectedValue(self):
@@ -77,13 +87,14 @@ class AuthorizerDeleteThing(unittest.TestCase):
     def setUp(self):
         self.logic = MagicMock()
         self.principal = MagicMock()
-        self.sut = Authorizer(mockLoggerFactory, self.logic)
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
 
     def testItCallsTheExpectedMethods(self):
-        'ThingAuthorizer.deleteThing() should call principal.checkAuthorization() and logic.deleteThing()'
+        'ThingAuthorizer.deleteThing() should call policy.check() and logic.deleteThing()'
         uuid = 'uuid'
         self.sut.deleteThing(self.principal, uuid)
-        self.principal.checkAuthorization.assert_called_once_with({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'delete things')
+        self.policy.check.assert_called_once_with(self.principal, 'deleteThing')
         self.logic.deleteThing.assert_called_once_with(self.principal, uuid)
 
     def testItReturnsTheExpectedValue(self):
@@ -98,18 +109,19 @@ class AuthorizerListThings(unittest.TestCase):
     def setUp(self):
         self.logic = MagicMock()
         self.principal = MagicMock()
-        self.sut = Authorizer(mockLoggerFactory, self.logic)
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
 
     def testItCallsTheExpectedMethods(self):
         '''
-        ThingAuthorizer.listThings() should call principal.checkAuthorization(), principal.getOwnerFilter() and
+        ThingAuthorizer.listThings() should call policy.check(), principal.getOwnerFilter() and
         logic.listThings()
         '''
         owner1 = 'owner1'
         owner2 = 'owner2'
         self.principal.getOwnerFilter.return_value = owner2
         self.sut.listThings(self.principal, owner1)
-        self.principal.checkAuthorization.assert_called_once_with({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'list things')
+        self.policy.check.assert_called_once_with(self.principal, 'listThings')
         self.principal.getOwnerFilter.assert_called_once_with(owner1)
         self.logic.listThings.assert_called_once_with(self.principal, owner2)
 
@@ -119,3 +131,151 @@ class AuthorizerListThings(unittest.TestCase):
         self.logic.listThings.return_value = things
         value = self.sut.listThings(self.principal, '')
         self.assertIs(value, things)
+
+
+class AuthorizerSearchThings(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.principal = MagicMock()
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
+
+    def testItCallsTheExpectedMethods(self):
+        '''
+        ThingAuthorizer.searchThings() should call policy.check(), principal.getOwnerFilter() and
+        logic.searchThings()
+        '''
+        self.principal.getOwnerFilter.return_value = 'owner2'
+        self.sut.searchThings(self.principal, 'owner1', 'query', limit=10)
+        self.policy.check.assert_called_once_with(self.principal, 'searchThings')
+        self.principal.getOwnerFilter.assert_called_once_with('owner1')
+        self.logic.searchThings.assert_called_once_with(self.principal, 'owner2', 'query', limit=10)
+
+    def testItReturnsTheExpectedValue(self):
+        'ThingAuthorizer.searchThings() should return the value of logic.searchThings()'
+        self.logic.searchThings.return_value = 'things'
+        self.assertEqual(self.sut.searchThings(self.principal, None, 'query'), 'things')
+
+
+class AuthorizerListChanges(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.principal = MagicMock()
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
+
+    def testItCallsTheExpectedMethods(self):
+        '''
+        ThingAuthorizer.listChanges() should call policy.check(), principal.getOwnerFilter() and
+        logic.listChanges()
+        '''
+        self.principal.getOwnerFilter.return_value = 'owner2'
+        self.sut.listChanges(self.principal, 'owner1', after=10)
+        self.policy.check.assert_called_once_with(self.principal, 'listChanges')
+        self.principal.getOwnerFilter.assert_called_once_with('owner1')
+        self.logic.listChanges.assert_called_once_with(self.principal, 'owner2', after=10)
+
+    def testItReturnsTheExpectedValue(self):
+        'ThingAuthorizer.listChanges() should return the value of logic.listChanges()'
+        self.logic.listChanges.return_value = 'changes'
+        self.assertEqual(self.sut.listChanges(self.principal, None), 'changes')
+
+
+class AuthorizerExportThings(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.principal = MagicMock()
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
+
+    def testItCallsTheExpectedMethods(self):
+        'ThingAuthorizer.exportThings() should only let admins export things'
+        self.logic.exportThings.return_value = 'iterator'
+        self.assertEqual(self.sut.exportThings(self.principal, 'owner'), 'iterator')
+        self.policy.check.assert_called_once_with(self.principal, 'exportThings')
+        self.logic.exportThings.assert_called_once_with(self.principal, 'owner')
+
+
+class AuthorizerImportThings(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.logic.importThings.side_effect = lambda principal, things: things
+        self.principal = Principal({'organizationId': 'ORG001', 'roles': {'ROLE_THING_USER'}})
+        self.sut = Authorizer(mockLoggerFactory, self.logic)
+
+    def testItAppliesTheOwnershipRules(self):
+        'ThingAuthorizer.importThings() should set the owner of each thing, returning the errors in place'
+        things = [{'name': 'a'}, {'name': 'b', 'owner': 'ORG002'}, {'name': 'c'}]
+        results = self.sut.importThings(self.principal, things)
+        self.assertEqual(results[0], {'name': 'a', 'owner': 'ORG001'})
+        self.assertEqual(results[1].code, NspError.FORBIDDEN)
+        self.assertEqual(results[2], {'name': 'c', 'owner': 'ORG001'})
+        self.logic.importThings.assert_called_once_with(self.principal, [things[0], things[2]])
+
+    def testItRequiresAnOwner(self):
+        'ThingAuthorizer.importThings() should return THING_UNPROCESSABLE for a thing that would have no owner'
+        principal = Principal({'organizationId': None, 'roles': {Principal.ROLE_ADMIN}})
+        things = [{'name': 'a'}, {'name': 'b', 'owner': 'ORG002'}]
+        results = self.sut.importThings(principal, things)
+        self.assertEqual(results[0].code, NspError.THING_UNPROCESSABLE)
+        self.assertEqual(results[1], {'name': 'b', 'owner': 'ORG002'})
+        self.logic.importThings.assert_called_once_with(principal, [things[1]])
+
+    def testItChecksTheAuthorization(self):
+        'ThingAuthorizer.importThings() should raise FORBIDDEN if the principal cannot create things'
+        principal = Principal({'organizationId': 'ORG001', 'roles': set()})
+        with self.assertRaises(NspError) as cm:
+            self.sut.importThings(principal, [{'name': 'a'}])
+        self.assertEqual(cm.exception.code, NspError.FORBIDDEN)
+
+
+class AuthorizerPatchThing(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.principal = MagicMock()
+        self.policy = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, policy=self.policy)
+
+    def testItCallsTheExpectedMethods(self):
+        'ThingAuthorizer.patchThing() should check the updateThing action and return logic.patchThing()'
+        self.logic.patchThing.return_value = 'thing'
+        self.assertEqual(self.sut.patchThing(self.principal, 'uuid', {'name': 'name'}), 'thing')
+        self.policy.check.assert_called_once_with(self.principal, 'updateThing')
+        self.logic.patchThing.assert_called_once_with(self.principal, 'uuid', {'name': 'name'})
+
+
+class AuthorizerRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.rateLimiter = MagicMock()
+        self.principal = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic, rateLimiter=self.rateLimiter, policy=MagicMock())
+
+    def testChecks(self):
+        'ThingAuthorizer should check the rate limit of the principal'
+        self.sut.getThing(self.principal, 'uuid')
+        self.rateLimiter.check.assert_called_once_with(self.principal)
+
+    def testLimited(self):
+        'ThingAuthorizer should not call the logic if the principal is over its rate limit'
+        self.rateLimiter.check.side_effect = NspError(NspError.TOO_MANY_REQUESTS, 'message', retryAfter=1)
+        with self.assertRaises(NspError):
+            self.sut.listThings(self.principal, None)
+        self.logic.listThings.assert_not_called()
+
+
+class AuthorizerPolicy(unittest.TestCase):
+    def setUp(self):
+        self.logic = MagicMock()
+        self.sut = Authorizer(mockLoggerFactory, self.logic)
+
+    def testDefaultRoles(self):
+        'ThingAuthorizer should permit the thing actions to ROLE_THING_USER but exporting only to ROLE_ADMIN'
+        user = Principal({'organizationId': 'ORG001', 'roles': {'ROLE_THING_USER'}})
+        admin = Principal({'organizationId': None, 'roles': {'ROLE_ADMIN'}})
+        self.sut.getThing(user, 'uuid')
+        self.sut.exportThings(admin, None)
+        with self.assertRaises(NspError) as cm:
+            self.sut.exportThings(user, None)
+        self.assertEqual(cm.exception.code, NspError.FORBIDDEN)
+        self.assertEqual(cm.exception.message, 'Principal is not authorized to export things')
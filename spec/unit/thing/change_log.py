@@ -0,0 +1,89 @@
+import unittest
+
+from src.commons.nsp_error import NspError
+from src.thing.change_log import ChangeLog, CREATE_CHANGE, UPDATE_CHANGE, DELETE_CHANGE
+
+
+class ChangeLogSpec(unittest.TestCase):
+    def setUp(self):
+        self.sut = ChangeLog(capacity=3, clock=lambda: 'now', epoch='epoch')
+
+    def testAppend(self):
+        'ChangeLog.append() should assign monotonically increasing sequence numbers'
+        self.assertEqual(self.sut.append(CREATE_CHANGE, {'uuid': '1', 'owner': 'A'}), 1)
+        self.assertEqual(self.sut.append(DELETE_CHANGE, {'uuid': '1', 'owner': 'A'}), 2)
+        self.assertEqual(self.sut.after(None)['changes'], [
+            {'sequence': 1, 'type': 'create', 'uuid': '1', 'owner': 'A', 'timestamp': 'now',
+             'thing': {'uuid': '1', 'owner': 'A'}},
+            {'sequence': 2, 'type': 'delete', 'uuid': '1', 'owner': 'A', 'timestamp': 'now'}
+        ])
+
+    def testAfter(self):
+        'ChangeLog.after() should return the changes after the sequence and the sequence to continue after'
+        for uuid in ['1', '2', '3']:
+            self.sut.append(CREATE_CHANGE, {'uuid': uuid, 'owner': 'A'})
+        result = self.sut.after(None, 1, limit=1)
+        self.assertEqual([change['sequence'] for change in result['changes']], [2])
+        self.assertEqual(result['next'], 2)
+        result = self.sut.after(None, 2)
+        self.assertEqual([change['sequence'] for change in result['changes']], [3])
+        self.assertEqual(result['next'], 3)
+        self.assertEqual(self.sut.after(None, 3), {'changes': [], 'next': 3, 'epoch': 'epoch'})
+
+    def testAhead(self):
+        'ChangeLog.after() should raise CHANGES_EXPIRED for a sequence ahead of the log, as after a restart'
+        self.sut.append(CREATE_CHANGE, {'uuid': '1', 'owner': 'A'})
+        with self.assertRaises(NspError) as cm:
+            self.sut.after(None, 5)
+        self.assertEqual(cm.exception.code, NspError.CHANGES_EXPIRED)
+
+    def testEpoch(self):
+        'ChangeLog.after() should raise CHANGES_EXPIRED for the sequence of another epoch, accepting its own'
+        self.sut.append(CREATE_CHANGE, {'uuid': '1', 'owner': 'A'})
+        self.assertEqual(len(self.sut.after(None, 0, epoch='epoch')['changes']), 1)
+        with self.assertRaises(NspError) as cm:
+            self.sut.after(None, 0, epoch='other')
+        self.assertEqual(cm.exception.code, NspError.CHANGES_EXPIRED)
+        self.assertNotEqual(ChangeLog().epoch, ChangeLog().epoch)
+
+    def testOwner(self):
+        'ChangeLog.after() should skip the changes of other owners, still advancing the next sequence'
+        self.sut.append(CREATE_CHANGE, {'uuid': '1', 'owner': 'A'})
+        self.sut.append(CREATE_CHANGE, {'uuid': '2', 'owner': 'B'})
+        result = self.sut.after('A', 0)
+        self.assertEqual([change['uuid'] for change in result['changes']], ['1'])
+        self.assertEqual(result['next'], 2)
+
+    def testOwnerChange(self):
+        'ChangeLog.after() should show an update that changed the owner to both the old and the new owner'
+        self.sut.append(UPDATE_CHANGE, {'uuid': '1', 'owner': 'B'}, 'A')
+        self.assertEqual(len(self.sut.after('A')['changes']), 1)
+        self.assertEqual(len(self.sut.after('B')['changes']), 1)
+
+    def testOwnerTransfer(self):
+        'ChangeLog.after() should show an owner transfer to the old owner as a delete without the new thing'
+        self.sut.append(UPDATE_CHANGE, {'uuid': '1', 'owner': 'B', 'name': 'secret'}, 'A')
+        self.assertEqual(self.sut.after('A')['changes'], [
+            {'sequence': 1, 'type': 'delete', 'uuid': '1', 'owner': 'A', 'timestamp': 'now'}
+        ])
+        self.assertEqual(self.sut.after('B')['changes'], [
+            {'sequence': 1, 'type': 'update', 'uuid': '1', 'owner': 'B', 'timestamp': 'now',
+             'thing': {'uuid': '1', 'owner': 'B', 'name': 'secret'}}
+        ])
+        self.assertEqual(self.sut.after(None)['changes'][0]['type'], 'update')
+
+    def testSameOwner(self):
+        'ChangeLog.after() should show an update that kept the owner only once, with the thing'
+        self.sut.append(UPDATE_CHANGE, {'uuid': '1', 'owner': 'A'}, 'A')
+        self.assertEqual(self.sut.after('A')['changes'][0]['type'], 'update')
+        self.assertEqual(self.sut.after('B')['changes'], [])
+
+    def testExpired(self):
+        'ChangeLog.after() should raise CHANGES_EXPIRED if the changes after the sequence were dropped'
+        for uuid in ['1', '2', '3', '4']:
+            self.sut.append(CREATE_CHANGE, {'uuid': uuid, 'owner': 'A'})
+        self.assertEqual(self.sut.firstSequence(), 2)
+        self.assertEqual(len(self.sut.after(None, 1)['changes']), 3)
+        with self.assertRaises(NspError) as cm:
+            self.sut.after(None, 0)
+        self.assertEqual(cm.exception.code, NspError.CHANGES_EXPIRED)
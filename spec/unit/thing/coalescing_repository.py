@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.thing.coalescing_repository import AsyncCoalescingRepository, CoalescingRepository
+from spec.helper import mockLoggerFactory, runCoroutine
+
+
+class CoalescingRepositorySpec(unittest.TestCase):
+    def setUp(self):
+        self.repository = MagicMock()
+        self.metrics = MagicMock()
+        self.sut = CoalescingRepository(mockLoggerFactory, self.repository, {'enabled': True}, self.metrics)
+
+    def testDisabled(self):
+        'CoalescingRepository should return the repository unless enabled'
+        self.assertIs(CoalescingRepository(mockLoggerFactory, self.repository), self.repository)
+        self.assertIs(CoalescingRepository(mockLoggerFactory, self.repository, {'enabled': False}), self.repository)
+
+    def testDelegates(self):
+        'CoalescingRepository should delegate to the methods of the repository'
+        self.repository.getThing.return_value = 'thing'
+        self.repository.listThings.return_value = ['thing']
+        self.assertEqual(self.sut.getThing('uuid'), 'thing')
+        self.assertEqual(self.sut.listThings('owner', offset=1, limit=2), ['thing'])
+        self.sut.updateThing({'uuid': 'uuid'}, expectedLastModified='date')
+        self.repository.getThing.assert_called_once_with('uuid')
+        self.repository.listThings.assert_called_once_with('owner', offset=1, limit=2)
+        self.repository.updateThing.assert_called_once_with({'uuid': 'uuid'}, expectedLastModified='date')
+        self.metrics.count.assert_not_called()
+
+    def testCoalesces(self):
+        'CoalescingRepository should share one getThing() call between the concurrent reads of a uuid'
+        started = threading.Event()
+        release = threading.Event()
+
+        def getThing(uuid):
+            started.set()
+            release.wait(5)
+            return {'uuid': uuid}
+        self.repository.getThing.side_effect = getThing
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.sut.getThing('uuid'))) for i in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while self.sut.stats()['calls'] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'uuid': 'uuid'}] * 3)
+        self.repository.getThing.assert_called_once_with('uuid')
+        self.assertEqual(self.metrics.count.call_count, 2)
+        self.metrics.count.assert_called_with('CoalescedReads')
+        self.assertEqual(self.sut.stats()['hotKeys'], [(('getThing', 'uuid'), 2)])
+
+
+class AsyncCoalescingRepositorySpec(unittest.TestCase):
+    def testCoalesces(self):
+        'AsyncCoalescingRepository should share one listThings() call between the concurrent identical lists'
+        repository = MagicMock()
+        metrics = MagicMock()
+
+        async def listThings(owner, **options):
+            await asyncio.sleep(0.01)
+            return [owner]
+        repository.listThings.side_effect = listThings
+        sut = AsyncCoalescingRepository(mockLoggerFactory, repository, {'enabled': True}, metrics)
+
+        async def run():
+            return await asyncio.gather(
+                sut.listThings('a', limit=1), sut.listThings('a', limit=1), sut.listThings('a', limit=2)
+            )
+        self.assertEqual(runCoroutine(run()), [['a']] * 3)
+        self.assertEqual(repository.listThings.call_count, 2)
+        metrics.count.assert_called_once_with('CoalescedReads')
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.commons.nsp_error import NspError
+from src.thing.importer import Importer, readBatches, validateLines
+from spec.helper import mockLoggerFactory
+
+
+class ImporterValidateLines(unittest.TestCase):
+    def testValid(self):
+        'validateLines() should return the parsed things of the valid lines'
+        result = validateLines([(1, '{"name": "name", "description": "description"}')])
+        self.assertEqual(result, [(1, {'name': 'name', 'description': 'description'}, None, None)])
+
+    def testMalformed(self):
+        'validateLines() should return an error for the lines that are not JSON'
+        [(lineNumber, thing, message, causes)] = validateLines([(2, '{')])
+        self.assertEqual((lineNumber, thing, message), (2, None, 'Malformed thing JSON'))
+        self.assertEqual(len(causes), 1)
+
+    def testInvalid(self):
+        'validateLines() should return the schema errors of the invalid things'
+        [(lineNumber, thing, message, causes)] = validateLines([(3, '{"name": "name"}')])
+        self.assertEqual((lineNumber, thing, message), (3, None, 'Invalid thing'))
+        self.assertEqual(causes, ["'description' is a required property"])
+
+
+class ImporterReadBatches(unittest.TestCase):
+    def testReadBatches(self):
+        'readBatches() should group the numbered non-blank lines in batches'
+        batches = list(readBatches(['a\n', '\n', 'b\n', 'c\n'], 2))
+        self.assertEqual(batches, [[(1, 'a\n'), (3, 'b\n')], [(4, 'c\n')]])
+
+
+class ImporterImportThings(unittest.TestCase):
+    def setUp(self):
+        self.authorizer = MagicMock()
+        self.authorizer.importThings.side_effect = lambda principal, things: [
+            NspError(NspError.FORBIDDEN, 'forbidden') if thing['name'] == 'forbidden' else thing for thing in things
+        ]
+        self.errors = []
+        self.sut = Importer(mockLoggerFactory, self.authorizer)
+
+    def importThings(self, lines, **options):
+        return self.sut.importThings(
+            'principal', lines, workers=0, onError=lambda *error: self.errors.append(error), **options
+        )
+
+    def testImport(self):
+        'Importer.importThings() should write the valid things in batches through authorizer.importThings()'
+        lines = ['{{"name": "{0}", "description": ""}}\n'.format(i) for i in range(5)]
+        report = self.importThings(lines, batchSize=2)
+        self.assertEqual(report['imported'], 5)
+        self.assertEqual(report['failed'], 0)
+        self.assertEqual([len(call[0][1]) for call in self.authorizer.importThings.call_args_list], [2, 2, 1])
+        self.authorizer.importThings.assert_any_call('principal', [{'name': '4', 'description': ''}])
+
+    def testErrors(self):
+        'Importer.importThings() should report the lines rejected by the validation and by the authorizer'
+        lines = ['{"name": "ok", "description": ""}', '{', '{"name": "forbidden", "description": ""}']
+        report = self.importThings(lines)
+        self.assertEqual(report['imported'], 1)
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual([error[:2] for error in self.errors], [(2, 'Malformed thing JSON'), (3, 'forbidden')])
+
+    def testBatchError(self):
+        'Importer.importThings() should report the lines of a batch rejected as a whole, going on with the next ones'
+        def importThings(principal, things):
+            if things[0]['name'] == '0':
+                raise NspError(NspError.TOO_MANY_REQUESTS, 'too many requests')
+            return things
+
+        self.authorizer.importThings.side_effect = importThings
+        lines = ['{{"name": "{0}", "description": ""}}'.format(i) for i in range(3)]
+        report = self.importThings(lines, batchSize=2)
+        self.assertEqual(report['imported'], 1)
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual([error[:2] for error in self.errors], [(1, 'too many requests'), (2, 'too many requests')])
+
+    def testBackPressure(self):
+        'Importer.importThings() should not read more than maxPendingBatches batches ahead of the writes'
+        read = []
+
+        def lines():
+            for i in range(10):
+                read.append(i)
+                yield '{{"name": "{0}", "description": ""}}'.format(i)
+
+        def importThings(principal, things):
+            self.assertLessEqual(len(read), int(things[0]['name']) + 3)
+            return things
+
+        self.authorizer.importThings.side_effect = importThings
+        report = self.importThings(lines(), batchSize=1, maxPendingBatches=2)
+        self.assertEqual(report['imported'], 10)
+
+    def testProcessPool(self):
+        'Importer.importThings() should validate the lines in a process pool'
+        lines = ['{{"name": "{0}", "description": ""}}'.format(i) for i in range(10)] + ['{']
+        report = self.sut.importThings('principal', lines, batchSize=3, workers=2)
+        self.assertEqual(report['imported'], 10)
+        self.assertEqual(report['failed'], 1)
@@ -1,16 +1,25 @@
+import hashlib
 import json
 import unittest
+from datetime import datetime
 from unittest.mock import MagicMock
 
+from src.commons.http_error import HttpError
+from src.commons.idempotency_store import IdempotencyStore
 from src.commons.principal import Principal
 from src.commons.nsp_error import NspError
-from src.thing.lambda_mapper import LambdaMapper
+from src.thing.lambda_mapper import (
+    LambdaMapper, validateNonNegativeInteger, validatePositiveInteger, validateSearchOperator, validateSort,
+    validateDatetime
+)
 from spec.helper import mockLoggerFactory
 
 with open('resources/json-schemas/thing-create.json') as infile:
     thingCreateSchema = json.load(infile)
 with open('resources/json-schemas/thing-update.json') as infile:
     thingUpdateSchema = json.load(infile)
+with open('resources/json-schemas/thing-patch.json') as infile:
+    thingPatchSchema = json.load(infile)
 
 
 class LambdaMapperCreateThing(unittest.TestCase):
@@ -18,6 +27,7 @@ class LambdaMapperCreateThing(unittest.TestCase):
     def setUp(self):
         self.authorizer = MagicMock()
         self.apiGateway = MagicMock()
+        self.apiGateway.getHeader.return_value = None
         self.apiGatewayFactory = MagicMock(return_value=self.apiGateway)
         self.sut = LambdaMapper(mockLoggerFactory, self.apiGatewayFactory, self.authorizer)
 
@@ -76,6 +86,78 @@ class LambdaMapperCreateThing(unittest.TestCase):
         )
 
 
+class LambdaMapperIdempotentCreateThing(unittest.TestCase):
+
+    def setUp(self):
+        self.authorizer = MagicMock()
+        self.authorizer.createThing.return_value = {'uuid': 'uuid'}
+        self.apiGateway = MagicMock()
+        self.apiGateway.getAndValidatePrincipal.return_value = Principal({'organizationId': 'ORG001', 'roles': []})
+        self.apiGateway.getHeader.return_value = 'key'
+        self.apiGateway.eventGet.return_value = '{"name": "name"}'
+        self.apiGateway.createResponse.side_effect = lambda **response: dict(response, headers={})
+        self.idempotencyStore = IdempotencyStore()
+        self.sut = LambdaMapper(
+            mockLoggerFactory, MagicMock(return_value=self.apiGateway), self.authorizer,
+            idempotencyStore=self.idempotencyStore
+        )
+
+    def testReplays(self):
+        'ThingLambdaMapper.createThing() should replay the response of the first request with the Idempotency-Key'
+        response = self.sut.createThing('event')
+        replay = self.sut.createThing('event')
+        self.authorizer.createThing.assert_called_once()
+        self.assertEqual(replay['statusCode'], response['statusCode'])
+        self.assertEqual(replay['body'], response['body'])
+        self.assertEqual(replay['headers'], {'Idempotent-Replayed': 'true'})
+        self.assertEqual(response['headers'], {})
+
+    def testAuthorizesReplays(self):
+        'ThingLambdaMapper.createThing() should authorize the principal before replaying a response'
+        self.sut.createThing('event')
+        self.authorizer.authorizeCreateThing.assert_not_called()
+        self.authorizer.authorizeCreateThing.side_effect = NspError(NspError.FORBIDDEN, 'forbidden')
+        self.sut.createThing('event')
+        self.authorizer.authorizeCreateThing.assert_called_once_with(
+            self.apiGateway.getAndValidatePrincipal.return_value
+        )
+        error = self.apiGateway.createErrorResponse.call_args[0][0]
+        self.assertEqual(error.code, NspError.FORBIDDEN)
+        self.authorizer.createThing.assert_called_once()
+
+    def testScopedByOrganization(self):
+        'ThingLambdaMapper.createThing() should not share the Idempotency-Keys of different organizations'
+        self.sut.createThing('event')
+        self.apiGateway.getAndValidatePrincipal.return_value = Principal({'organizationId': 'ORG002', 'roles': []})
+        self.sut.createThing('event')
+        self.assertEqual(self.authorizer.createThing.call_count, 2)
+
+    def testAnotherRequest(self):
+        'ThingLambdaMapper.createThing() should return 422 if the Idempotency-Key was used with another body'
+        self.sut.createThing('event')
+        self.apiGateway.eventGet.return_value = '{"name": "another name"}'
+        self.sut.createThing('event')
+        error = self.apiGateway.createErrorResponse.call_args[0][0]
+        self.assertEqual(error.statusCode, HttpError.UNPROCESSABLE_ENTITY)
+        self.authorizer.createThing.assert_called_once()
+
+    def testInProgress(self):
+        'ThingLambdaMapper.createThing() should return 409 while the request with the Idempotency-Key is in flight'
+        self.idempotencyStore.reserve(('ORG001', 'key'), hashlib.sha256(b'{"name": "name"}').hexdigest())
+        self.sut.createThing('event')
+        error = self.apiGateway.createErrorResponse.call_args[0][0]
+        self.assertEqual(error.statusCode, HttpError.CONFLICT)
+        self.authorizer.createThing.assert_not_called()
+
+    def testReleasesOnError(self):
+        'ThingLambdaMapper.createThing() should let a failed request with an Idempotency-Key be retried'
+        self.authorizer.createThing.side_effect = [NspError(NspError.SERVICE_UNAVAILABLE, 'error'), {'uuid': 'uuid'}]
+        self.sut.createThing('event')
+        response = self.sut.createThing('event')
+        self.assertEqual(response['statusCode'], 201)
+        self.assertEqual(self.authorizer.createThing.call_count, 2)
+
+
 class LambdaMapperGetThing(unittest.TestCase):
 
     def setUp(self):
@@ -207,6 +289,38 @@ class LambdaMapperUpdateThing(unittest.TestCase):
         )
 
 
+class LambdaMapperPatchThing(unittest.TestCase):
+
+    def setUp(self):
+        self.authorizer = MagicMock()
+        self.apiGateway = MagicMock()
+        self.apiGatewayFactory = MagicMock(return_value=self.apiGateway)
+        self.sut = LambdaMapper(mockLoggerFactory, self.apiGatewayFactory, self.authorizer)
+
+    def testItCallsMethods(self):
+        'ThingLambdaMapper.patchThing() should validate the patch as a merge patch and call authorizer.patchThing()'
+        self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
+        self.apiGateway.getPathParameter.return_value = 'uuid'
+        self.apiGateway.getAndValidateEntity.return_value = {'name': 'name'}
+        self.authorizer.patchThing.return_value = {'uuid': 'uuid'}
+
+        self.sut.patchThing('event')
+        self.apiGateway.getAndValidateEntity.assert_called_once_with(
+            thingPatchSchema, 'thing patch', ('application/merge-patch+json', 'application/json')
+        )
+        self.authorizer.patchThing.assert_called_once_with('principal', 'uuid', {'name': 'name'})
+        self.apiGateway.createResponse.assert_called_once_with(body={'uuid': 'uuid'})
+
+    def testItReturnsErrorResponseOnInvalidPatch(self):
+        'ThingLambdaMapper.patchThing() should call apiGateway.createErrorResponse() if the patch is not valid'
+        error = Exception('error')
+        self.apiGateway.getAndValidateEntity.side_effect = error
+
+        self.sut.patchThing('event')
+        self.apiGateway.createErrorResponse.assert_called_once_with(error)
+        self.authorizer.patchThing.assert_not_called()
+
+
 class LambdaMapperDeleteThing(unittest.TestCase):
 
     def setUp(self):
@@ -276,13 +390,61 @@ class LambdaMapperListThings(unittest.TestCase):
     def testItCallsMethods(self):
         'ThingLambdaMapper.listThings() should call the right methods with the right parameters'
         self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
-        self.apiGateway.getQueryStringParameter.return_value = 'owner'
+        self.apiGateway.getQueryStringParameter.side_effect = lambda name, **kwargs: {
+            'owner': 'owner',
+            'namePrefix': 'prefix',
+            'offset': '10',
+            'limit': '5',
+            'sort': '-created'
+        }.get(name)
 
         self.sut.listThings('event')
         self.apiGatewayFactory.assert_called_once_with('event')
         self.apiGateway.getAndValidatePrincipal.assert_called_once_with()
-        self.apiGateway.getQueryStringParameter.assert_called_once_with('owner', required=False)
-        self.authorizer.listThings.assert_called_once_with('principal', 'owner')
+        self.apiGateway.getQueryStringParameter.assert_any_call('owner', required=False)
+        self.apiGateway.getQueryStringParameter.assert_any_call('namePrefix', required=False)
+        self.authorizer.listThings.assert_called_once_with(
+            'principal', 'owner', namePrefix='prefix', offset=10, limit=5, sort='-created', modifiedSince=None
+        )
+
+    def testItUsesTheDefaultPagination(self):
+        'ThingLambdaMapper.listThings() should list from the first thing without limit if there are no parameters'
+        self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
+        self.apiGateway.getQueryStringParameter.return_value = None
+
+        self.sut.listThings('event')
+        self.authorizer.listThings.assert_called_once_with(
+            'principal', None, namePrefix=None, offset=0, limit=None, sort=None, modifiedSince=None
+        )
+
+    def testItParsesModifiedSince(self):
+        'ThingLambdaMapper.listThings() should pass modifiedSince as a naive utc datetime'
+        self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
+        self.apiGateway.getQueryStringParameter.side_effect = lambda name, **kwargs: {
+            'modifiedSince': '2108-01-01T14:12:12.345+02:00'
+        }.get(name)
+
+        self.sut.listThings('event')
+        self.authorizer.listThings.assert_called_once_with(
+            'principal', None, namePrefix=None, offset=0, limit=None, sort=None,
+            modifiedSince=datetime(2108, 1, 1, 12, 12, 12, 345000)
+        )
+
+    def testItRejectsModifiedSinceWithSort(self):
+        'ThingLambdaMapper.listThings() should return 400 if modifiedSince is combined with sort or namePrefix'
+        for parameter in ['sort', 'namePrefix']:
+            with self.subTest(parameter=parameter):
+                self.apiGateway.reset_mock()
+                self.apiGateway.getQueryStringParameter.side_effect = lambda name, **kwargs: {
+                    'modifiedSince': '2108-01-01T12:12:12.345Z',
+                    parameter: 'name'
+                }.get(name)
+
+                self.sut.listThings('event')
+                self.authorizer.listThings.assert_not_called()
+                error = self.apiGateway.createErrorResponse.call_args[0][0]
+                self.assertIsInstance(error, HttpError)
+                self.assertEqual(error.statusCode, HttpError.BAD_REQUEST)
 
     def testItReturnsErrorResponseOnInvalidPrincipal(self):
         'ThingLambdaMapper.listThings() should call apiGateway.createErrorResponse() if the principal is not valid'
@@ -297,6 +459,7 @@ class LambdaMapperListThings(unittest.TestCase):
         ThingLambdaMapper.listThings() should call apiGateway.createErrorResponse() if authorizer.listThings() raises
         '''
         error = Exception('error')
+        self.apiGateway.getQueryStringParameter.return_value = None
         self.authorizer.listThings.side_effect = error
 
         self.sut.listThings('event')
@@ -305,9 +468,175 @@ class LambdaMapperListThings(unittest.TestCase):
     def testItReturnsResultResponse(self):
         'ThingLambdaMapper.listThings() should return 200 with the result of authorizer.listThings()'
         self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
-        self.apiGateway.getQueryStringParameter.return_value = 'owner'
+        self.apiGateway.getQueryStringParameter.return_value = None
         self.apiGateway.createResponse.return_value = None
         self.authorizer.listThings.return_value = 'things'
 
         self.sut.listThings('event')
         self.apiGateway.createResponse.assert_called_once_with(body='things')
+
+
+class LambdaMapperSearchThings(unittest.TestCase):
+
+    def setUp(self):
+        self.authorizer = MagicMock()
+        self.apiGateway = MagicMock()
+        self.apiGatewayFactory = MagicMock(return_value=self.apiGateway)
+        self.sut = LambdaMapper(mockLoggerFactory, self.apiGatewayFactory, self.authorizer)
+
+    def testItCallsMethods(self):
+        'ThingLambdaMapper.searchThings() should call the right methods with the right parameters'
+        self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
+        self.apiGateway.getQueryStringParameter.side_effect = lambda name, **kwargs: {
+            'q': 'query',
+            'operator': 'or',
+            'limit': '5'
+        }.get(name)
+
+        self.sut.searchThings('event')
+        self.apiGateway.getQueryStringParameter.assert_any_call('q', required=True)
+        self.authorizer.searchThings.assert_called_once_with(
+            'principal', None, 'query', operator='or', offset=0, limit=5
+        )
+
+    def testItReturnsErrorResponseOnLogicError(self):
+        '''
+        ThingLambdaMapper.searchThings() should call apiGateway.createErrorResponse() if authorizer.searchThings()
+        raises
+        '''
+        error = Exception('error')
+        self.authorizer.searchThings.side_effect = error
+
+        self.sut.searchThings('event')
+        self.apiGateway.createErrorResponse.assert_called_once_with(error)
+
+    def testItReturnsResultResponse(self):
+        'ThingLambdaMapper.searchThings() should return 200 with the result of authorizer.searchThings()'
+        self.apiGateway.getQueryStringParameter.return_value = None
+        self.authorizer.searchThings.return_value = 'things'
+
+        self.sut.searchThings('event')
+        self.apiGateway.createResponse.assert_called_once_with(body='things')
+
+
+class LambdaMapperListChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.authorizer = MagicMock()
+        self.apiGateway = MagicMock()
+        self.apiGatewayFactory = MagicMock(return_value=self.apiGateway)
+        self.sut = LambdaMapper(mockLoggerFactory, self.apiGatewayFactory, self.authorizer)
+
+    def testItCallsMethods(self):
+        'ThingLambdaMapper.listChanges() should call the right methods with the right parameters'
+        self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
+        self.apiGateway.getQueryStringParameter.side_effect = lambda name, **kwargs: {
+            'owner': 'owner',
+            'after': '10',
+            'limit': '5',
+            'epoch': 'epoch'
+        }.get(name)
+
+        self.sut.listChanges('event')
+        self.authorizer.listChanges.assert_called_once_with('principal', 'owner', after=10, limit=5, epoch='epoch')
+
+    def testItUsesTheDefaults(self):
+        'ThingLambdaMapper.listChanges() should list from the first change without limit if there are no parameters'
+        self.apiGateway.getAndValidatePrincipal.return_value = 'principal'
+        self.apiGateway.getQueryStringParameter.return_value = None
+
+        self.sut.listChanges('event')
+        self.authorizer.listChanges.assert_called_once_with('principal', None, after=0, limit=None, epoch=None)
+
+    def testItReturnsErrorResponseOnLogicError(self):
+        '''
+        ThingLambdaMapper.listChanges() should call apiGateway.createErrorResponse() if authorizer.listChanges()
+        raises
+        '''
+        error = Exception('error')
+        self.apiGateway.getQueryStringParameter.return_value = None
+        self.authorizer.listChanges.side_effect = error
+
+        self.sut.listChanges('event')
+        self.apiGateway.createErrorResponse.assert_called_once_with(error)
+
+    def testItReturnsResultResponse(self):
+        'ThingLambdaMapper.listChanges() should return 200 with the result of authorizer.listChanges()'
+        self.apiGateway.getQueryStringParameter.return_value = None
+        self.authorizer.listChanges.return_value = 'changes'
+
+        self.sut.listChanges('event')
+        self.apiGateway.createResponse.assert_called_once_with(body='changes')
+
+
+class LambdaMapperDeadline(unittest.TestCase):
+    def setUp(self):
+        self.authorizer = MagicMock()
+        self.apiGateway = MagicMock()
+        self.apiGatewayFactory = MagicMock(return_value=self.apiGateway)
+        self.sut = LambdaMapper(mockLoggerFactory, self.apiGatewayFactory, self.authorizer)
+        self.context = MagicMock()
+
+    def testInsufficient(self):
+        'ThingLambdaMapper should respond SERVICE_UNAVAILABLE without calling the authorizer if no time is left'
+        self.context.get_remaining_time_in_millis.return_value = 250
+        self.sut.getThing('event', self.context)
+        error = self.apiGateway.createErrorResponse.call_args[0][0]
+        self.assertEqual(error.code, NspError.SERVICE_UNAVAILABLE)
+        self.authorizer.getThing.assert_not_called()
+
+    def testExceeded(self):
+        'ThingLambdaMapper should respond the DEADLINE_EXCEEDED raised past the deadline of the request'
+        self.context.get_remaining_time_in_millis.return_value = 30000
+        self.authorizer.getThing.side_effect = NspError(NspError.DEADLINE_EXCEEDED, 'message')
+        self.sut.getThing('event', self.context)
+        error = self.apiGateway.createErrorResponse.call_args[0][0]
+        self.assertEqual(error.code, NspError.DEADLINE_EXCEEDED)
+
+
+class LambdaMapperValidators(unittest.TestCase):
+    def testNonNegativeInteger(self):
+        'validateNonNegativeInteger() should accept None and non-negative integers only'
+        validateNonNegativeInteger(None)
+        validateNonNegativeInteger('0')
+        validateNonNegativeInteger('12')
+        for value in ['-1', '1.5', 'a', '']:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    validateNonNegativeInteger(value)
+
+    def testSearchOperator(self):
+        'validateSearchOperator() should accept None, "and" and "or" only'
+        validateSearchOperator(None)
+        validateSearchOperator('and')
+        validateSearchOperator('or')
+        with self.assertRaises(ValueError):
+            validateSearchOperator('xor')
+
+    def testSort(self):
+        'validateSort() should accept None and the sort fields, optionally prefixed by "-"'
+        for value in [None, 'name', '-name', 'created', '-created', 'lastModified', '-lastModified']:
+            validateSort(value)
+        for value in ['owner', '+name', '--name']:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    validateSort(value)
+
+    def testDatetime(self):
+        'validateDatetime() should accept None and ISO 8601 datetimes with timezone only'
+        validateDatetime(None)
+        validateDatetime('2108-01-01T12:12:12.345Z')
+        validateDatetime('2108-01-01T12:12:12+02:00')
+        for value in [
+            '2108-01-01', '2108-01-01T12:12:12', 'yesterday', '2020-13-45T00:00:00.000Z', '2020-02-30T25:00:00+02:00'
+        ]:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    validateDatetime(value)
+
+    def testPositiveInteger(self):
+        'validatePositiveInteger() should accept None and positive integers only'
+        validatePositiveInteger(None)
+        validatePositiveInteger('1')
+        with self.assertRaises(ValueError):
+            validatePositiveInteger('0')
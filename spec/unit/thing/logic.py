@@ -3,12 +3,28 @@ import unittest
 from unittest.mock import MagicMock
 from src.commons.principal import Principal
 from src.commons.nsp_error import NspError
-from src.thing.logic import Logic
+from src.thing.logic import Logic, prepareCreate
 from spec.helper import mockLoggerFactory
 
 UUIDV4_REGEX = '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
 
 
+class PrepareCreate(unittest.TestCase):
+    def testExists(self):
+        'prepareCreate() should raise THING_ALREADY_EXISTS NspError if the thing exists'
+        with self.assertRaises(NspError) as cm:
+            prepareCreate(MagicMock(), {'uuid': 'uuid'}, True, datetime.now())
+        self.assertEqual(cm.exception.code, NspError.THING_ALREADY_EXISTS)
+
+    def testAssignedAttributes(self):
+        'prepareCreate() should generate the missing uuid and set created and lastModified'
+        now = datetime.now()
+        thing = prepareCreate(MagicMock(), {'name': 'name'}, False, now)
+        self.assertRegex(thing['uuid'], UUIDV4_REGEX)
+        self.assertEqual((thing['created'], thing['lastModified']), (now, now))
+        self.assertEqual(prepareCreate(MagicMock(), {'uuid': 'uuid'}, False, now)['uuid'], 'uuid')
+
+
 class LogicCreateThing(unittest.TestCase):
     def setUp(self):
         self.repository = MagicMock()
@@ -220,11 +236,11 @@ class LogicUpdateThing(unittest.TestCase):
         newThing = thing.copy()
         newThing['name'] = 'another name'
         self.repository.getThing.return_value = thing
-        self.repository.updateThing.side_effect = lambda x: x
+        self.repository.updateThing.side_effect = lambda x, expectedLastModified: x
         result = self.sut.updateThing(principal, uuid, newThing)
         self.assertEqual(result, newThing)
         self.repository.getThing.assert_called_once_with(uuid)
-        self.repository.updateThing.assert_called_once_with(newThing)
+        self.repository.updateThing.assert_called_once_with(newThing, expectedLastModified=thing['lastModified'])
 
     def testUpdatesLastModified(self):
         'ThingLogic.updateThing() should update lastModified'
@@ -243,7 +259,7 @@ class LogicUpdateThing(unittest.TestCase):
         newThing = thing.copy()
         newThing['name'] = 'another name'
         self.repository.getThing.return_value = thing
-        self.repository.updateThing.side_effect = lambda x: x
+        self.repository.updateThing.side_effect = lambda x, expectedLastModified: x
         result = self.sut.updateThing(principal, uuid, newThing)
         self.assertEqual(result['uuid'], newThing['uuid'])
         self.assertEqual(result['owner'], newThing['owner'])
@@ -251,6 +267,82 @@ class LogicUpdateThing(unittest.TestCase):
         self.assertEqual(result['name'], newThing['name'])
         self.assertGreater(result['lastModified'], thing['lastModified'])
 
+    def testSkipsUnchangedThing(self):
+        'ThingLogic.updateThing() should return the stored thing without a write if the update changes nothing'
+        metrics = MagicMock()
+        sut = Logic(mockLoggerFactory, self.repository, metrics)
+        principal = Principal({
+            'organizationId': '001',
+            'roles': []
+        })
+        thing = {
+            'uuid': 'uuid',
+            'owner': '001',
+            'created': datetime(2012, 12, 26),
+            'lastModified': datetime(2012, 12, 26),
+            'name': 'name'
+        }
+        self.repository.getThing.return_value = thing
+        result = sut.updateThing(principal, 'uuid', thing.copy())
+        self.assertIs(result, thing)
+        self.repository.updateThing.assert_not_called()
+        metrics.count.assert_called_once_with('SkippedWrites')
+
+
+class LogicPatchThing(unittest.TestCase):
+    def setUp(self):
+        self.repository = MagicMock()
+        self.repository.updateThing.side_effect = lambda x, expectedLastModified: x
+        self.sut = Logic(mockLoggerFactory, self.repository)
+        self.principal = Principal({
+            'organizationId': '001',
+            'roles': []
+        })
+        self.thing = {
+            'uuid': 'uuid',
+            'owner': '001',
+            'created': datetime(2012, 12, 26),
+            'lastModified': datetime(2012, 12, 26),
+            'name': 'name',
+            'description': 'description'
+        }
+        self.repository.getThing.return_value = self.thing
+
+    def testThingNotFound(self):
+        'ThingLogic.patchThing() should raise THING_NOT_FOUND NspError if repository.getThing() returns None'
+        self.repository.getThing.return_value = None
+        with self.assertRaises(NspError) as cm:
+            self.sut.patchThing(self.principal, 'uuid', {'name': 'another name'})
+        self.assertEqual(cm.exception.code, NspError.THING_NOT_FOUND)
+        self.repository.updateThing.assert_not_called()
+
+    def testPatchesThing(self):
+        'ThingLogic.patchThing() should update the thing merged with the patch, without modifying the stored one'
+        result = self.sut.patchThing(self.principal, 'uuid', {'name': 'another name'})
+        self.assertEqual(result['name'], 'another name')
+        self.assertEqual(result['description'], 'description')
+        self.assertEqual(result['created'], self.thing['created'])
+        self.assertGreater(result['lastModified'], self.thing['lastModified'])
+        self.assertEqual(self.thing['name'], 'name')
+        self.repository.updateThing.assert_called_once_with(result, expectedLastModified=self.thing['lastModified'])
+
+    def testReadOnlyAttributes(self):
+        'ThingLogic.patchThing() should raise THING_UNPROCESSABLE NspError if patching read-only properties'
+        with self.assertRaises(NspError) as cm:
+            self.sut.patchThing(self.principal, 'uuid', {'owner': '002', 'created': datetime(2013, 12, 26)})
+        self.assertEqual(cm.exception.code, NspError.THING_UNPROCESSABLE)
+        self.assertEqual(cm.exception.causes, [
+            'Cannot change read-only property "created" from "2012-12-26 00:00:00" to "2013-12-26 00:00:00"',
+            'Cannot change read-only property "owner" from "001" to "002"'
+        ])
+        self.repository.updateThing.assert_not_called()
+
+    def testSkipsEmptyPatch(self):
+        'ThingLogic.patchThing() should not write a patch that changes nothing'
+        result = self.sut.patchThing(self.principal, 'uuid', {'name': 'name'})
+        self.assertEqual(result, self.thing)
+        self.repository.updateThing.assert_not_called()
+
 
 class LogicDeleteThing(unittest.TestCase):
     def setUp(self):
@@ -311,3 +403,49 @@ class LogicListThings(unittest.TestCase):
         result = self.sut.listThings(None, 'owner')
         self.assertEqual(result, 'value')
         self.repository.listThings.assert_called_once_with('owner')
+
+    def testSearch(self):
+        'ThingLogic.searchThings() should return the result of repository.searchThings()'
+        self.repository.searchThings.return_value = 'value'
+        result = self.sut.searchThings(None, 'owner', 'query', limit=10)
+        self.assertEqual(result, 'value')
+        self.repository.searchThings.assert_called_once_with('owner', 'query', limit=10)
+
+    def testListChanges(self):
+        'ThingLogic.listChanges() should return the result of repository.listChanges()'
+        self.repository.listChanges.return_value = 'value'
+        result = self.sut.listChanges(None, 'owner', after=10)
+        self.assertEqual(result, 'value')
+        self.repository.listChanges.assert_called_once_with('owner', after=10)
+
+    def testExportThings(self):
+        'ThingLogic.exportThings() should return the iterator of repository.iterThings()'
+        self.repository.iterThings.return_value = 'iterator'
+        self.assertEqual(self.sut.exportThings(None, 'owner'), 'iterator')
+        self.repository.iterThings.assert_called_once_with('owner')
+
+
+class LogicImportThings(unittest.TestCase):
+    def setUp(self):
+        self.repository = MagicMock()
+        self.repository.getThing.side_effect = lambda uuid: {'uuid': uuid} if uuid == 'existing' else None
+        self.sut = Logic(mockLoggerFactory, self.repository)
+
+    def testImportThings(self):
+        'ThingLogic.importThings() should create the new things with a single repository write'
+        things = [{'name': 'a'}, {'uuid': 'new', 'name': 'b'}]
+        results = self.sut.importThings(None, things)
+        self.assertEqual(results, things)
+        self.assertIsNotNone(things[0]['uuid'])
+        self.assertEqual(things[1]['uuid'], 'new')
+        self.assertEqual(things[0]['created'], things[0]['lastModified'])
+        self.repository.createThings.assert_called_once_with(things)
+
+    def testAlreadyExists(self):
+        'ThingLogic.importThings() should return THING_ALREADY_EXISTS errors for existing and duplicate uuids'
+        things = [{'uuid': 'existing'}, {'uuid': 'new'}, {'uuid': 'new'}]
+        results = self.sut.importThings(None, things)
+        self.assertEqual(results[0].code, NspError.THING_ALREADY_EXISTS)
+        self.assertIs(results[1], things[1])
+        self.assertEqual(results[2].code, NspError.THING_ALREADY_EXISTS)
+        self.repository.createThings.assert_called_once_with([things[1]])
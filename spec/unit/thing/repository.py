@@ -1,6 +1,17 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
+from datetime import datetime
+from unittest.mock import patch
 
+from src.commons.deadline import Deadline, setDeadline
+from src.commons.nsp_error import NspError
 from src.thing.repository import Repository
+from src.thing.snapshot import writeSnapshot
+from src.thing.thing_record import ThingRecord
 from spec.helper import mockLoggerFactory
 
 
@@ -20,6 +31,13 @@ class RepositoryCreateThing(unittest.TestCase):
         result = self.sut.createThing(thing)
         self.assertIs(result, thing)
 
+    def testAlreadyExists(self):
+        'ThingRepository.createThing() should raise THING_ALREADY_EXISTS if the uuid is taken'
+        with self.assertRaises(NspError) as context:
+            self.sut.createThing({'uuid': '001', 'owner': 'ORG002', 'name': 'Other'})
+        self.assertEqual(context.exception.code, NspError.THING_ALREADY_EXISTS)
+        self.assertEqual(self.sut.getThing('001')['owner'], 'ORG001')
+
 
 class RepositoryGetThing(unittest.TestCase):
     def setUp(self):
@@ -52,6 +70,46 @@ class RepositoryUpdateThing(unittest.TestCase):
         result = self.sut.updateThing(thing)
         self.assertIs(result, thing)
 
+    def testExpectedLastModified(self):
+        'ThingRepository.updateThing() should update the thing if expectedLastModified is its lastModified'
+        thing = dict(self.sut.getThing('001'), name='Renamed', lastModified=datetime.now())
+        self.sut.updateThing(thing, expectedLastModified=self.sut.getThing('001')['lastModified'])
+        self.assertEqual(self.sut.getThing('001')['name'], 'Renamed')
+
+    def testConflict(self):
+        'ThingRepository.updateThing() should raise THING_CONFLICT if the thing was modified since expectedLastModified'
+        thing = dict(self.sut.getThing('001'), name='Renamed', lastModified=datetime.now())
+        with self.assertRaises(NspError) as context:
+            self.sut.updateThing(thing, expectedLastModified=datetime(2000, 1, 1))
+        self.assertEqual(context.exception.code, NspError.THING_CONFLICT)
+        self.assertEqual(self.sut.getThing('001')['name'], 'Thing1')
+
+    def testDeletedConcurrently(self):
+        'ThingRepository.updateThing() should raise THING_NOT_FOUND if the expected thing was deleted'
+        thing = self.sut.getThing('001')
+        self.sut.deleteThing('001')
+        with self.assertRaises(NspError) as context:
+            self.sut.updateThing(thing, expectedLastModified=thing['lastModified'])
+        self.assertEqual(context.exception.code, NspError.THING_NOT_FOUND)
+        self.assertIsNone(self.sut.getThing('001'))
+
+
+class RepositoryDeadline(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory)
+
+    def tearDown(self):
+        setDeadline(None)
+
+    def testExceeded(self):
+        'ThingRepository should raise DEADLINE_EXCEEDED without changes once the deadline of the request has passed'
+        setDeadline(Deadline(time.monotonic() - 1))
+        with self.assertRaises(NspError) as context:
+            self.sut.deleteThing('001')
+        self.assertEqual(context.exception.code, NspError.DEADLINE_EXCEEDED)
+        setDeadline(None)
+        self.assertIsNotNone(self.sut.getThing('001'))
+
 
 class RepositoryDeleteThing(unittest.TestCase):
     def setUp(self):
@@ -67,6 +125,12 @@ class RepositoryDeleteThing(unittest.TestCase):
         result = self.sut.deleteThing('001')
         self.assertIsNone(result)
 
+    def testNotFound(self):
+        'ThingRepository.deleteThing() should raise THING_NOT_FOUND if the thing does not exist'
+        with self.assertRaises(NspError) as context:
+            self.sut.deleteThing('999')
+        self.assertEqual(context.exception.code, NspError.THING_NOT_FOUND)
+
 
 class RepositoryListThings(unittest.TestCase):
     def setUp(self):
@@ -77,10 +141,555 @@ class RepositoryListThings(unittest.TestCase):
         owner = 'ORG001'
         result = self.sut.listThings(owner)
         self.assertIsInstance(result, list)
-        subset = [thing for thing in self.sut.data.values() if thing['owner'] == owner]
+        subset = sorted(
+            (thing for thing in self.sut.data.values() if thing['owner'] == owner), key=lambda thing: thing['created']
+        )
         self.assertEqual(result, subset)
 
     def testWithoutOwner(self):
         'ThingRepository.listThings() should return all the things'
         result = self.sut.listThings(None)
-        self.assertEqual(result, list(self.sut.data.values()))
+        self.assertEqual(result, sorted(self.sut.data.values(), key=lambda thing: thing['created']))
+
+    def testNamePrefix(self):
+        'ThingRepository.listThings() should return the things of the owner whose name starts with the prefix'
+        self.sut.createThing({'uuid': '004', 'owner': 'ORG001', 'name': 'thing10', 'description': ''})
+        self.sut.createThing({'uuid': '005', 'owner': 'ORG002', 'name': 'Thing11', 'description': ''})
+        self.sut.createThing({'uuid': '006', 'owner': 'ORG001', 'name': 'Other', 'description': ''})
+        result = self.sut.listThings('ORG001', namePrefix='thing1')
+        self.assertEqual([thing['uuid'] for thing in result], ['001', '004'])
+        result = self.sut.listThings(None, namePrefix='THING1')
+        self.assertEqual([thing['uuid'] for thing in result], ['001', '004', '005'])
+
+    def testNamePrefixPagination(self):
+        'ThingRepository.listThings() should return the requested page of the things matching the prefix'
+        result = self.sut.listThings(None, namePrefix='Thing', offset=1, limit=1)
+        self.assertEqual([thing['uuid'] for thing in result], ['002'])
+
+    def testNamePrefixAfterUpdateAndDelete(self):
+        'ThingRepository.listThings() should keep the name index up to date on update and delete'
+        self.sut.updateThing({'uuid': '001', 'owner': 'ORG001', 'name': 'Renamed', 'description': ''})
+        self.sut.deleteThing('003')
+        self.assertEqual(self.sut.listThings('ORG001', namePrefix='Thing'), [])
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings('ORG001', namePrefix='re')], ['001'])
+
+    def testPagination(self):
+        'ThingRepository.listThings() should return the requested page of the things'
+        result = self.sut.listThings(None, offset=1, limit=1)
+        self.assertEqual(result, [self.sut.data['002']])
+
+    def testSort(self):
+        'ThingRepository.listThings() should return the things sorted by the sort field'
+        self.sut.createThing({
+            'uuid': '004', 'owner': 'ORG001', 'name': 'Thing0', 'description': '',
+            'created': datetime(2000, 1, 1), 'lastModified': datetime(2200, 1, 1)
+        })
+        uuids = [thing['uuid'] for thing in self.sut.listThings('ORG001', sort='name')]
+        self.assertEqual(uuids, ['004', '001', '003'])
+        uuids = [thing['uuid'] for thing in self.sut.listThings('ORG001', sort='-created')]
+        self.assertEqual(uuids, ['003', '001', '004'])
+        uuids = [thing['uuid'] for thing in self.sut.listThings(None, sort='-lastModified', offset=1, limit=2)]
+        self.assertEqual(uuids, ['003', '002'])
+
+    def testSortAfterUpdate(self):
+        'ThingRepository.listThings() should keep the sort indexes up to date on update and delete'
+        thing = dict(self.sut.data['001'], lastModified=datetime(2200, 1, 1))
+        self.sut.updateThing(thing)
+        self.sut.deleteThing('002')
+        uuids = [thing['uuid'] for thing in self.sut.listThings(None, sort='-lastModified')]
+        self.assertEqual(uuids, ['001', '003'])
+
+    def testNamePrefixAndSort(self):
+        'ThingRepository.listThings() should sort the things matching the name prefix by the sort field'
+        uuids = [thing['uuid'] for thing in self.sut.listThings(None, namePrefix='thing', sort='-created')]
+        self.assertEqual(uuids, ['003', '002', '001'])
+        uuids = [thing['uuid'] for thing in self.sut.listThings(None, namePrefix='thing', sort='-name', limit=1)]
+        self.assertEqual(uuids, ['003'])
+
+    def testModifiedSince(self):
+        'ThingRepository.listThings() should return the things modified after modifiedSince, by lastModified'
+        since = self.sut.data['001']['lastModified']
+        result = self.sut.listThings(None, modifiedSince=since)
+        self.assertEqual(result, {'things': [self.sut.data['002'], self.sut.data['003']], 'tombstones': []})
+        result = self.sut.listThings('ORG001', modifiedSince=since)
+        self.assertEqual(result, {'things': [self.sut.data['003']], 'tombstones': []})
+
+    def testModifiedSinceTombstones(self):
+        'ThingRepository.listThings() should return the tombstones of the things deleted after modifiedSince'
+        since = datetime.now()
+        self.sut.deleteThing('001')
+        self.sut.deleteThing('002')
+        result = self.sut.listThings('ORG001', modifiedSince=since)
+        self.assertEqual(result['things'], [self.sut.data['003']])
+        self.assertEqual([tombstone['uuid'] for tombstone in result['tombstones']], ['001'])
+        self.assertEqual(result['tombstones'][0]['owner'], 'ORG001')
+        self.assertGreater(result['tombstones'][0]['deleted'], since)
+
+    def testModifiedSinceRecreated(self):
+        'ThingRepository.listThings() should drop the tombstone of a thing created again'
+        since = datetime.now()
+        thing = self.sut.data['001']
+        self.sut.deleteThing('001')
+        self.sut.createThing(dict(thing, lastModified=datetime.now()))
+        result = self.sut.listThings(None, modifiedSince=since)
+        self.assertEqual([thing['uuid'] for thing in result['things']], ['001', '002', '003'])
+        self.assertEqual(result['tombstones'], [])
+
+    def testModifiedSinceOwnerTransfer(self):
+        'ThingRepository.listThings() should return a tombstone to the old owner of a thing moved to another owner'
+        since = datetime.now()
+        self.sut.updateThing(dict(self.sut.data['001'], owner='ORG002', lastModified=datetime.now()))
+        result = self.sut.listThings('ORG001', modifiedSince=since)
+        self.assertEqual([thing['uuid'] for thing in result['things']], ['003'])
+        self.assertEqual([(tombstone['uuid'], tombstone['owner']) for tombstone in result['tombstones']],
+                         [('001', 'ORG001')])
+        result = self.sut.listThings('ORG002', modifiedSince=since)
+        self.assertEqual([thing['uuid'] for thing in result['things']], ['001', '002'])
+        self.assertEqual(result['tombstones'], [])
+        self.assertEqual(self.sut.listThings(None, modifiedSince=since)['tombstones'], [])
+        self.sut.updateThing(dict(self.sut.data['001'], owner='ORG001', lastModified=datetime.now()))
+        self.assertEqual(self.sut.listThings('ORG001', modifiedSince=since)['tombstones'], [])
+
+    def testModifiedSincePagination(self):
+        'ThingRepository.listThings() should page the changes in the order they happened'
+        self.sut.deleteThing('001')
+        result = self.sut.listThings(None, modifiedSince=datetime.min, offset=0, limit=2)
+        self.assertEqual([thing['uuid'] for thing in result['things']], ['002'])
+        self.assertEqual([tombstone['uuid'] for tombstone in result['tombstones']], ['001'])
+        result = self.sut.listThings(None, modifiedSince=datetime.min, offset=2, limit=2)
+        self.assertEqual(result, {'things': [self.sut.data['003']], 'tombstones': []})
+
+    def testModifiedSinceExpired(self):
+        'ThingRepository.listThings() should raise CHANGES_EXPIRED if a tombstone after modifiedSince was dropped'
+        sut = Repository(mockLoggerFactory, config={'tombstoneCapacity': 2})
+        since = datetime.now()
+        for uuid in ['001', '002', '003']:
+            sut.deleteThing(uuid)
+        with self.assertRaises(NspError) as cm:
+            sut.listThings(None, modifiedSince=since)
+        self.assertEqual(cm.exception.code, NspError.CHANGES_EXPIRED)
+        self.assertEqual(sut.listThings(None, modifiedSince=datetime.max), {'things': [], 'tombstones': []})
+
+
+class RepositorySearchThings(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory)
+
+    def testSearch(self):
+        'ThingRepository.searchThings() should return the things of the owner matching the query'
+        result = self.sut.searchThings('ORG001', 'thing 003')
+        self.assertEqual(result, [self.sut.data['003']])
+
+    def testIndexUpdates(self):
+        'ThingRepository.searchThings() should see the created, updated and deleted things'
+        self.sut.createThing({'uuid': '004', 'owner': 'ORG001', 'name': 'Lamp', 'description': 'A desk lamp'})
+        self.sut.updateThing({'uuid': '001', 'owner': 'ORG001', 'name': 'Lamp', 'description': 'A floor lamp'})
+        self.sut.deleteThing('004')
+        self.assertEqual(self.sut.searchThings(None, 'lamp'), [self.sut.data['001']])
+
+
+class RepositoryCreateThings(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory)
+
+    def testCreateThings(self):
+        'ThingRepository.createThings() should add all the things to the data and the indexes'
+        things = [
+            {'uuid': '004', 'owner': 'ORG001', 'name': 'Batch4'},
+            {'uuid': '005', 'owner': 'ORG001', 'name': 'Batch5'}
+        ]
+        self.assertEqual(self.sut.createThings(things), things)
+        self.assertIs(self.sut.data['005'], things[1])
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings('ORG001', namePrefix='batch')], ['004', '005'])
+
+    def testDuplicates(self):
+        'ThingRepository.createThings() should raise THING_ALREADY_EXISTS without writing if a uuid is not new'
+        for things in [
+            [{'uuid': '004', 'owner': 'ORG001'}, {'uuid': '001', 'owner': 'ORG001'}],
+            [{'uuid': '004', 'owner': 'ORG001'}, {'uuid': '004', 'owner': 'ORG001'}]
+        ]:
+            with self.subTest(things=things):
+                with self.assertRaises(NspError) as cm:
+                    self.sut.createThings(things)
+                self.assertEqual(cm.exception.code, NspError.THING_ALREADY_EXISTS)
+                self.assertIsNone(self.sut.getThing('004'))
+
+
+class RepositoryCompact(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory, config={'compact': True})
+
+    def testStore(self):
+        'ThingRepository should keep the things as ThingRecords if compact'
+        self.sut.createThing({'uuid': '004', 'owner': 'ORG001', 'name': 'Thing4'})
+        self.assertIsInstance(self.sut.data['001'], ThingRecord)
+        self.assertIsInstance(self.sut.data['004'], ThingRecord)
+
+    def testLoad(self):
+        'ThingRepository should return dicts if compact'
+        self.sut.updateThing(dict(self.sut.getThing('001'), name='Renamed'))
+        self.sut.deleteThing('002')
+        self.assertEqual(self.sut.getThing('001')['name'], 'Renamed')
+        for things in [
+            self.sut.listThings('ORG001'),
+            self.sut.listThings('ORG001', sort='name'),
+            self.sut.listThings('ORG001', namePrefix='renamed'),
+            self.sut.listThings('ORG001', namePrefix='t', sort='created'),
+            self.sut.listThings('ORG001', modifiedSince=datetime.min)['things'],
+            self.sut.searchThings('ORG001', 'thing'),
+            list(self.sut.iterThings('ORG001')),
+            [change['thing'] for change in self.sut.listChanges(None)['changes'] if 'thing' in change]
+        ]:
+            self.assertTrue(things)
+            for thing in things:
+                self.assertIsInstance(thing, dict)
+        self.assertEqual(self.sut.listChanges(None)['changes'][1]['type'], 'delete')
+
+
+class RepositorySnapshot(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as outfile:
+            writeSnapshot([
+                {'uuid': '101', 'owner': 'ORG001', 'name': 'Snap1', 'description': 'Snapshot 101'},
+                {'uuid': '102', 'owner': 'ORG002', 'name': 'Snap2', 'description': 'Snapshot 102'}
+            ], outfile)
+        self.sut = Repository(mockLoggerFactory, config={'snapshot': self.path})
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testLazyReads(self):
+        'ThingRepository should serve getThing() and listThings() from the snapshot without loading it'
+        self.assertEqual(self.sut.getThing('101')['name'], 'Snap1')
+        self.assertIsNone(self.sut.getThing('001'))
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings('ORG002')], ['102'])
+        self.assertEqual([thing['uuid'] for thing in self.sut.iterThings(None)], ['101', '102'])
+        self.assertEqual(len(self.sut.data), 0)
+
+    def testHydrateOnIndexedQuery(self):
+        'ThingRepository should load the snapshot when a query needs an index'
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings(None, sort='-name')], ['102', '101'])
+        self.assertEqual(set(self.sut.data), {'101', '102'})
+        self.assertEqual(sorted(thing['uuid'] for thing in self.sut.searchThings(None, 'snapshot')), ['101', '102'])
+
+    def testHydrateOnWrite(self):
+        'ThingRepository should load the snapshot before a write'
+        self.sut.deleteThing('101')
+        self.sut.createThing({'uuid': '103', 'owner': 'ORG001', 'name': 'Snap3'})
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings(None)], ['102', '103'])
+        self.assertIsNone(self.sut.getThing('101'))
+
+    def testPagesAcrossHydration(self):
+        'ThingRepository.listThings() should page the snapshot in the order of the hydrated repository'
+        (fd, path) = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as outfile:
+            writeSnapshot([
+                {'uuid': uuid, 'owner': 'ORG001', 'created': datetime(2000, 1, day)}
+                for (uuid, day) in [('201', 3), ('202', 1), ('203', 2), ('204', 1)]
+            ], outfile)
+        sut = Repository(mockLoggerFactory, config={'snapshot': path})
+        pages = [[thing['uuid'] for thing in sut.listThings('ORG001', offset=offset, limit=2)] for offset in [0, 2]]
+        sut.listThings(None, sort='name')
+        self.assertEqual(len(sut.data), 4)
+        self.assertEqual(
+            [[thing['uuid'] for thing in sut.listThings('ORG001', offset=offset, limit=2)] for offset in [0, 2]], pages
+        )
+        self.assertEqual(pages, [['202', '204'], ['203', '201']])
+        os.remove(path)
+
+    def testDeleteWhileIterating(self):
+        'ThingRepository.iterThings() should skip the things deleted while iterating the snapshot'
+        things = self.sut.iterThings(None)
+        next(things)
+        self.sut.deleteThing('102')
+        self.assertEqual(list(things), [])
+
+
+class RepositoryWriteAheadLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = {'wal': {'directory': self.directory, 'syncIntervalSeconds': 0, 'compactEveryRecords': 3}}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def createThing(self, sut, uuid, name):
+        sut.createThing({'uuid': uuid, 'owner': 'ORG001', 'name': name, 'created': datetime(2000, 1, 1)})
+
+    def testEmpty(self):
+        'ThingRepository should start empty without the sample things if the log is new'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.assertEqual(sut.listThings(None), [])
+        sut.close()
+
+    def testRecovery(self):
+        'ThingRepository should recover the writes from the write-ahead log'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '001', 'Thing1')
+        self.createThing(sut, '002', 'Thing2')
+        sut.close()
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.assertEqual(sut.getThing('001'), {
+            'uuid': '001', 'owner': 'ORG001', 'name': 'Thing1', 'created': datetime(2000, 1, 1)
+        })
+        self.assertEqual([thing['uuid'] for thing in sut.listThings(None, sort='name')], ['001', '002'])
+        sut.close()
+
+    def testCompaction(self):
+        'ThingRepository should compact the log into a snapshot every compactEveryRecords writes'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '001', 'Thing1')
+        self.createThing(sut, '002', 'Thing2')
+        sut.deleteThing('001')
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'things.snapshot')))
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, 'things.wal')), 0)
+        sut.updateThing({'uuid': '002', 'owner': 'ORG001', 'name': 'Renamed'})
+        sut.close()
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.assertEqual([thing['name'] for thing in sut.listThings(None)], ['Renamed'])
+        self.assertIsNone(sut.getThing('001'))
+        sut.close()
+
+    def testReplayIsIdempotent(self):
+        'ThingRepository should recover if the log was not emptied after the last compaction'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '001', 'Thing1')
+        sut.deleteThing('001')
+        self.createThing(sut, '002', 'Thing2')
+        sut.close()
+        with open(os.path.join(self.directory, 'things.wal'), 'w') as outfile:
+            outfile.write('{"operation": "delete", "uuid": "001"}\n')
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.assertEqual([thing['uuid'] for thing in sut.listThings(None)], ['002'])
+        sut.close()
+
+    def testTornTail(self):
+        'ThingRepository should keep the writes made after recovering from a torn log line across restarts'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '001', 'Thing1')
+        sut.close()
+        with open(os.path.join(self.directory, 'things.wal'), 'a') as outfile:
+            outfile.write('{"operation": "put", "thi')
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '002', 'Thing2')
+        sut.close()
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.assertEqual(sut.getThing('002')['name'], 'Thing2')
+        self.assertEqual([thing['uuid'] for thing in sut.listThings(None)], ['001', '002'])
+        sut.close()
+
+    def testChangesExpireOnRecovery(self):
+        'ThingRepository should expire the change cursors given out before a recovery from the write-ahead log'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '001', 'Thing1')
+        cursor = sut.listChanges(None)
+        sut.close()
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '002', 'Thing2')
+        with self.assertRaises(NspError) as cm:
+            sut.listChanges(None, after=cursor['next'], epoch=cursor['epoch'])
+        self.assertEqual(cm.exception.code, NspError.CHANGES_EXPIRED)
+        sut.close()
+
+    def testOwnerless(self):
+        'ThingRepository should raise THING_UNPROCESSABLE without logging a thing that has no owner'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        for write in [
+            lambda: sut.createThing({'uuid': '001', 'owner': None}),
+            lambda: sut.createThings([{'uuid': '001', 'owner': None}])
+        ]:
+            with self.assertRaises(NspError) as cm:
+                write()
+            self.assertEqual(cm.exception.code, NspError.THING_UNPROCESSABLE)
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, 'things.wal')), 0)
+        sut.close()
+
+    def testCompactionFailure(self):
+        'ThingRepository should keep a write whose compaction failed, retrying it after compactEveryRecords writes'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        with patch('src.thing.repository.writeSnapshot', side_effect=ValueError()) as writeSnapshot:
+            for uuid in ['001', '002', '003', '004', '005']:
+                self.createThing(sut, uuid, 'Thing')
+            self.assertEqual(writeSnapshot.call_count, 1)
+            self.createThing(sut, '006', 'Thing')
+            self.assertEqual(writeSnapshot.call_count, 2)
+        sut.close()
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.assertEqual(len(sut.listThings(None)), 6)
+        sut.close()
+
+    def testReplayedRecordsCounted(self):
+        'ThingRepository should count the records replayed from the log towards the compaction'
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '001', 'Thing1')
+        self.createThing(sut, '002', 'Thing2')
+        sut.close()
+        sut = Repository(mockLoggerFactory, config=self.config)
+        self.createThing(sut, '003', 'Thing3')
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'things.snapshot')))
+        sut.close()
+
+
+class BlockingLog:
+    'Write-ahead log whose appends block until released'
+
+    def __init__(self):
+        self.records = 0
+        self.appending = threading.Event()
+        self.released = threading.Event()
+
+    def put(self, things):
+        self.appending.set()
+        self.released.wait(5)
+
+    def close(self):
+        pass
+
+
+class RepositoryIndexLock(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testQueryWhileLogging(self):
+        'ThingRepository should serve the queries while a write is appended to the write-ahead log'
+        log = BlockingLog()
+        with patch('src.thing.repository.WriteAheadLog', return_value=log):
+            sut = Repository(mockLoggerFactory, config={'wal': {'directory': self.directory}})
+        writer = threading.Thread(target=sut.createThing, args=({'uuid': '001', 'owner': 'ORG001'},))
+        writer.start()
+        self.assertTrue(log.appending.wait(5))
+        self.assertEqual(sut.listThings(None), [])
+        self.assertTrue(writer.is_alive())
+        log.released.set()
+        writer.join()
+        self.assertEqual([thing['uuid'] for thing in sut.listThings(None)], ['001'])
+
+
+class RepositoryIterThings(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory)
+
+    def testIterThings(self):
+        'ThingRepository.iterThings() should lazily iterate over the things of the owner'
+        things = self.sut.iterThings('ORG001')
+        self.assertNotIsInstance(things, list)
+        self.assertEqual([thing['uuid'] for thing in things], ['001', '003'])
+        self.assertEqual(len(list(self.sut.iterThings(None))), 3)
+
+    def testDeleteWhileIterating(self):
+        'ThingRepository.iterThings() should skip the things deleted while iterating'
+        things = self.sut.iterThings(None)
+        self.assertEqual(next(things)['uuid'], '001')
+        self.sut.deleteThing('002')
+        self.assertEqual([thing['uuid'] for thing in things], ['003'])
+
+    def testChunks(self):
+        'ThingRepository.iterThings() should read the index in chunks, not skipping the things created at once'
+        created = datetime(2200, 1, 1)
+        self.sut.createThings([{'uuid': uuid, 'owner': 'ORG001', 'created': created} for uuid in ['006', '005', '004']])
+        with patch('src.thing.repository.ITER_CHUNK_SIZE', 2):
+            things = self.sut.iterThings(None)
+            self.assertEqual([next(things)['uuid'] for i in range(3)], ['001', '002', '003'])
+            self.sut.createThing({'uuid': '007', 'owner': 'ORG001', 'created': datetime.max})
+            self.assertEqual([thing['uuid'] for thing in things], ['004', '005', '006', '007'])
+
+
+class RepositoryListChanges(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory, config={'changeLogCapacity': 3})
+
+    def testChanges(self):
+        'ThingRepository.listChanges() should return the creations, updates and deletions in sequence order'
+        self.sut.createThing({'uuid': '004', 'owner': 'ORG001', 'name': 'Thing4'})
+        self.sut.updateThing(dict(self.sut.data['001'], name='Renamed'))
+        self.sut.deleteThing('002')
+        result = self.sut.listChanges(None)
+        self.assertEqual(
+            [(change['sequence'], change['type'], change['uuid']) for change in result['changes']],
+            [(1, 'create', '004'), (2, 'update', '001'), (3, 'delete', '002')]
+        )
+        self.assertEqual(result['changes'][1]['thing'], self.sut.data['001'])
+        self.assertNotIn('thing', result['changes'][2])
+        self.assertEqual(result['next'], 3)
+
+    def testOwner(self):
+        'ThingRepository.listChanges() should only return the changes of the owner'
+        self.sut.deleteThing('001')
+        self.sut.deleteThing('002')
+        result = self.sut.listChanges('ORG002')
+        self.assertEqual([change['uuid'] for change in result['changes']], ['002'])
+
+    def testOwnerTransfer(self):
+        'ThingRepository.listChanges() should show a thing moved to another owner as deleted to the old owner'
+        self.sut.updateThing(dict(self.sut.data['001'], owner='ORG002', name='Transferred'))
+        (change,) = self.sut.listChanges('ORG001')['changes']
+        self.assertEqual((change['type'], change['uuid']), ('delete', '001'))
+        self.assertNotIn('thing', change)
+        (change,) = self.sut.listChanges('ORG002')['changes']
+        self.assertEqual(change['thing']['name'], 'Transferred')
+
+    def testExpired(self):
+        'ThingRepository.listChanges() should raise CHANGES_EXPIRED if the changes after the sequence were dropped'
+        for uuid in ['001', '002', '003']:
+            self.sut.deleteThing(uuid)
+        self.sut.createThing({'uuid': '004', 'owner': 'ORG001', 'name': 'Thing4'})
+        self.assertEqual([change['sequence'] for change in self.sut.listChanges(None, after=1)['changes']], [2, 3, 4])
+        with self.assertRaises(NspError) as cm:
+            self.sut.listChanges(None, after=0)
+        self.assertEqual(cm.exception.code, NspError.CHANGES_EXPIRED)
+
+
+class RepositoryConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.sut = Repository(mockLoggerFactory, config={'shards': 4})
+
+    def testConcurrentWrites(self):
+        'ThingRepository should keep the data and the indexes consistent under concurrent writes'
+        errors = []
+        expectedCodes = {NspError.THING_ALREADY_EXISTS, NspError.THING_CONFLICT, NspError.THING_NOT_FOUND}
+
+        def write(i, uuid, owner):
+            thing = self.sut.getThing(uuid)
+            if thing is None:
+                self.sut.createThing({
+                    'uuid': uuid, 'owner': owner, 'name': 'Thing {0}'.format(i), 'description': '',
+                    'created': datetime.now(), 'lastModified': datetime.now()
+                })
+            elif i % 3 == 0:
+                self.sut.deleteThing(uuid)
+            else:
+                newThing = dict(thing, name='Thing {0}'.format(i), lastModified=datetime.now())
+                self.sut.updateThing(newThing, expectedLastModified=thing['lastModified'])
+
+        def worker(thread):
+            # two threads write the same uuids, so that some writes conflict
+            for i in range(200):
+                owner = 'ORG{0}'.format(i % 3)
+                try:
+                    write(i, '{0}-{1}'.format(thread % 4, i % 20), owner)
+                    self.sut.listThings(owner, sort='-lastModified', limit=5)
+                    self.sut.searchThings(owner, 'thing', limit=5)
+                except NspError as error:
+                    if error.code not in expectedCodes:
+                        errors.append(error)
+                except Exception as error:
+                    errors.append(error)
+        threads = [threading.Thread(target=worker, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        uuids = sorted(self.sut.data)
+        self.assertEqual(sorted(thing['uuid'] for thing in self.sut.listThings(None)), uuids)
+        self.assertEqual(sorted(thing['uuid'] for thing in self.sut.listThings(None, sort='name')), uuids)
+        self.assertEqual(sorted(thing['uuid'] for thing in self.sut.searchThings(None, 'thing')), uuids)
+        for owner in ('ORG0', 'ORG1', 'ORG2'):
+            self.assertEqual(
+                sorted(thing['uuid'] for thing in self.sut.listThings(owner, sort='lastModified')),
+                sorted(uuid for uuid in uuids if self.sut.data[uuid]['owner'] == owner)
+            )
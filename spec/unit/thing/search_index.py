@@ -0,0 +1,59 @@
+import unittest
+
+from src.thing.search_index import SearchIndex, tokenize
+
+
+class SearchIndexTokenize(unittest.TestCase):
+    def test(self):
+        'tokenize() should split the text in casefolded words'
+        self.assertEqual(tokenize('Hello, World! foo_bar 42'), ['hello', 'world', 'foo_bar', '42'])
+        self.assertEqual(tokenize(None), [])
+
+
+class SearchIndexSearch(unittest.TestCase):
+    def setUp(self):
+        self.sut = SearchIndex()
+        self.sut.add({'uuid': '1', 'owner': 'A', 'name': 'Red car', 'description': 'A fast red car'})
+        self.sut.add({'uuid': '2', 'owner': 'A', 'name': 'Blue car', 'description': 'A slow car'})
+        self.sut.add({'uuid': '3', 'owner': 'B', 'name': 'Red bike', 'description': 'A bike'})
+
+    def testAnd(self):
+        'SearchIndex.search() should return the things containing all the tokens with the AND operator'
+        self.assertEqual(self.sut.search(None, 'red car'), ['1'])
+        self.assertEqual(self.sut.search(None, 'red boat'), [])
+
+    def testOr(self):
+        'SearchIndex.search() should return the things containing any of the tokens with the OR operator'
+        self.assertEqual(set(self.sut.search(None, 'red car', 'or')), {'1', '2', '3'})
+
+    def testRanking(self):
+        'SearchIndex.search() should rank the more relevant things first'
+        self.assertEqual(self.sut.search(None, 'red car', 'or')[0], '1')
+        self.assertEqual(self.sut.search(None, 'red', 'or'), ['1', '3'])
+
+    def testOwner(self):
+        'SearchIndex.search() should only return the things of the owner'
+        self.assertEqual(self.sut.search('B', 'red'), ['3'])
+        self.assertEqual(self.sut.search('C', 'red'), [])
+
+    def testPagination(self):
+        'SearchIndex.search() should return the requested page of the ranked things'
+        self.assertEqual(self.sut.search(None, 'car', 'or', offset=1, limit=1), self.sut.search(None, 'car')[1:2])
+
+    def testEmptyQuery(self):
+        'SearchIndex.search() should return nothing for a query without tokens'
+        self.assertEqual(self.sut.search(None, '!!'), [])
+
+    def testUpdate(self):
+        'SearchIndex.add() should replace the tokens of a thing that is already indexed'
+        self.sut.add({'uuid': '1', 'owner': 'A', 'name': 'Green car', 'description': ''})
+        self.assertEqual(self.sut.search(None, 'red'), ['3'])
+        self.assertEqual(self.sut.search(None, 'green'), ['1'])
+
+    def testRemove(self):
+        'SearchIndex.remove() should remove the thing and the empty posting lists'
+        self.sut.remove('3')
+        self.sut.remove('unknown')
+        self.assertEqual(self.sut.search(None, 'bike'), [])
+        self.assertNotIn('bike', self.sut.all)
+        self.assertNotIn('B', self.sut.byOwner)
@@ -0,0 +1,62 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from src.thing.snapshot import Snapshot, writeSnapshot
+
+
+def createThings():
+    return [
+        {'uuid': uuid, 'owner': owner, 'name': 'Thing' + uuid, 'created': datetime(2000, 1, int(uuid))}
+        for (uuid, owner) in [('05', 'ORG2'), ('03', 'ORG1'), ('09', 'ORG2'), ('01', 'ORG1'), ('02', 'ORG3')]
+    ]
+
+
+class SnapshotSpec(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as outfile:
+            self.count = writeSnapshot(createThings(), outfile)
+        self.sut = Snapshot(self.path)
+
+    def tearDown(self):
+        self.sut.close()
+        os.remove(self.path)
+
+    def testCount(self):
+        'writeSnapshot() should return the number of things written'
+        self.assertEqual(self.count, 5)
+        self.assertEqual(len(self.sut), 5)
+
+    def testGetThing(self):
+        'Snapshot.getThing() should return the thing with the uuid, or None'
+        self.assertEqual(self.sut.getThing('09'), createThings()[2])
+        self.assertEqual(self.sut.getThing('01'), createThings()[3])
+        for uuid in ['00', '04', '10']:
+            self.assertIsNone(self.sut.getThing(uuid))
+
+    def testListThings(self):
+        'Snapshot.listThings() should return a page of the things of the owner, by created'
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings('ORG2')], ['05', '09'])
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings('ORG1')], ['01', '03'])
+        self.assertEqual([thing['uuid'] for thing in self.sut.listThings(None, 1, 2)], ['02', '03'])
+        self.assertEqual(self.sut.listThings('ORG4'), [])
+        self.assertEqual(self.sut.listThings('ORG0'), [])
+
+    def testIterThings(self):
+        'Snapshot.iterThings() should iterate over the things of the owner'
+        self.assertEqual(list(self.sut.iterThings('ORG1')), [createThings()[3], createThings()[1]])
+
+    def testInvalidFile(self):
+        'Snapshot() should raise ValueError if the file is not a snapshot'
+        with open(self.path, 'r+b') as outfile:
+            outfile.write(b'XXXX')
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+    def testMissingOwner(self):
+        'writeSnapshot() should raise ValueError if a thing has no owner'
+        with self.assertRaises(ValueError):
+            writeSnapshot([{'uuid': '01'}], io.BytesIO())
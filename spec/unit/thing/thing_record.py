@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+
+from src.thing.thing_record import ThingRecord
+
+
+class ThingRecordSpec(unittest.TestCase):
+    def setUp(self):
+        self.thing = {
+            'uuid': '001',
+            'owner': ''.join(['ORG', '001']),
+            'name': 'name',
+            'description': 'description',
+            'created': datetime(2000, 1, 1),
+            'lastModified': datetime(2000, 1, 2)
+        }
+        self.sut = ThingRecord.fromDict(self.thing)
+
+    def testToDict(self):
+        'ThingRecord.toDict() should return the dict the record was created from'
+        self.assertEqual(self.sut.toDict(), self.thing)
+
+    def testToDictMissingFields(self):
+        'ThingRecord.toDict() should omit the missing fields'
+        self.assertEqual(ThingRecord.fromDict({'uuid': '001'}).toDict(), {'uuid': '001'})
+
+    def testGet(self):
+        'ThingRecord.get() and [] should return the fields like a dict'
+        self.assertEqual(self.sut.get('name'), 'name')
+        self.assertEqual(self.sut['uuid'], '001')
+        self.assertEqual(ThingRecord.fromDict({}).get('name', 'default'), 'default')
+        self.assertIsNone(self.sut.get('unknown'))
+        with self.assertRaises(KeyError):
+            self.sut['unknown']
+        with self.assertRaises(KeyError):
+            ThingRecord.fromDict({})['name']
+
+    def testInternedOwner(self):
+        'ThingRecord should intern the owner strings'
+        other = ThingRecord.fromDict({'owner': ''.join(['ORG', '001'])})
+        self.assertIs(self.sut.owner, other.owner)
+
+    def testSlots(self):
+        'ThingRecord should not have a per-instance dict'
+        self.assertFalse(hasattr(self.sut, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.sut.unknown = 'value'
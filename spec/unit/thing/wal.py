@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from src.thing.wal import WriteAheadLog, readLog
+
+
+class WriteAheadLogSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'things.wal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testAppendAndRead(self):
+        'WriteAheadLog should append the puts and deletes that readLog() reads back'
+        sut = WriteAheadLog(self.path, syncIntervalSeconds=0)
+        sut.put([{'uuid': '001', 'created': datetime(2000, 1, 1)}, {'uuid': '002'}])
+        sut.delete('001')
+        self.assertEqual(sut.records, 3)
+        sut.close()
+        self.assertEqual(list(readLog(self.path)), [
+            {'operation': 'put', 'thing': {'uuid': '001', 'created': datetime(2000, 1, 1)}},
+            {'operation': 'put', 'thing': {'uuid': '002'}},
+            {'operation': 'delete', 'uuid': '001'}
+        ])
+
+    def testAppendToExisting(self):
+        'WriteAheadLog should append to an existing log'
+        for uuid in ['001', '002']:
+            sut = WriteAheadLog(self.path, syncIntervalSeconds=0)
+            sut.delete(uuid)
+            sut.close()
+        self.assertEqual([record['uuid'] for record in readLog(self.path)], ['001', '002'])
+
+    def testGroupCommit(self):
+        'WriteAheadLog should fsync the writes in the background if syncIntervalSeconds > 0'
+        sut = WriteAheadLog(self.path, syncIntervalSeconds=0.01)
+        sut.delete('001')
+        self.assertTrue(sut.dirty)
+        deadline = time.monotonic() + 1
+        while sut.dirty and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(sut.dirty)
+        sut.close()
+        self.assertFalse(sut.syncer.is_alive())
+
+    def testTruncate(self):
+        'WriteAheadLog.truncate() should empty the log'
+        sut = WriteAheadLog(self.path, syncIntervalSeconds=0)
+        sut.delete('001')
+        sut.truncate()
+        sut.delete('002')
+        sut.close()
+        self.assertEqual([record['uuid'] for record in readLog(self.path)], ['002'])
+        self.assertEqual(sut.records, 1)
+
+    def testTornWrite(self):
+        'readLog() should stop at a malformed last line, logging a warning'
+        with open(self.path, 'w') as outfile:
+            outfile.write('{"operation": "delete", "uuid": "001"}\n{"operation": "del')
+        logger = MagicMock()
+        self.assertEqual(len(list(readLog(self.path, logger))), 1)
+        logger.warn.assert_called_once()
+
+    def testRepairTornWrite(self):
+        'readLog() should truncate a torn last line with repair, so that the next records are readable'
+        with open(self.path, 'w') as outfile:
+            outfile.write('{"operation": "delete", "uuid": "001"}\n{"operation": "delete", "uuid": "002"}')
+        self.assertEqual(len(list(readLog(self.path, repair=True))), 1)
+        sut = WriteAheadLog(self.path, syncIntervalSeconds=0)
+        sut.delete('003')
+        sut.close()
+        self.assertEqual([record['uuid'] for record in readLog(self.path)], ['001', '003'])
+
+    def testMissing(self):
+        'readLog() should read nothing if the log does not exist'
+        self.assertEqual(list(readLog(self.path)), [])
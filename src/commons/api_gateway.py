@@ -6,14 +6,17 @@ import jsonschema
 import dateutil.parser
 
 import src.commons.jsonutils as jsonutils
+from src.commons.error_reporter import ErrorReporter
 from src.commons.http_error import HttpError
 from src.commons.nsp_error import NspError
 from src.commons.principal import Principal
+from src.commons.request_context import TRACE_HEADER, setRequestContext
 
 __all__ = ['APIGateway']
 
 API_GATEWAY_URL_MATCHER = re.compile('\\.execute-api\\..*\\.amazonaws\\.com$')
-APPLICATION_JSON_MATCHER = re.compile('^application/json')
+APPLICATION_JSON = 'application/json'
+APPLICATION_MERGE_PATCH_JSON = 'application/merge-patch+json'
 PRINCIPAL_SCHEMA_FILE_NAME = 'resources/json-schemas/principal.json'
 
 with open(PRINCIPAL_SCHEMA_FILE_NAME) as infile:
@@ -63,9 +66,13 @@ def getAndValidateJSON(string, name, schema, missingErrorFactory, malformedError
 
 class APIGateway:
 
-    def __init__(self, loggerFactory, event):
+    def __init__(self, loggerFactory, event, errorReporter=None):
         self.event = event
         self.logger = loggerFactory(__name__)
+        self.errorReporter = errorReporter or ErrorReporter(loggerFactory)
+        self.requestId = self.eventGet('requestContext.requestId')
+        self.traceId = self.eventGet(['headers', TRACE_HEADER])
+        setRequestContext(requestId=self.requestId, traceId=self.traceId)
 
     def eventGet(self, path, default=None):
         return jsonutils.getAtPath(self.event, path, default)
@@ -121,10 +128,13 @@ class APIGateway:
     def getHeader(self, name, required=False, validator=None):
         return self.getParameter('header', 'headers', name, required, validator)
 
-    def getAndValidateEntity(self, schema, name):
+    def getAndValidateEntity(self, schema, name, mediaTypes=(APPLICATION_JSON,)):
+        'Returns the JSON body, if its Content-Type, when given, is one of the mediaTypes and it is valid for schema'
         contentType = self.eventGet('headers.Content-Type')
-        if contentType and not APPLICATION_JSON_MATCHER.match(contentType):
-            raise HttpError(HttpError.UNSUPPORTED_MEDIA_TYPE, 'Expected application/json Content-Type')
+        if contentType and not contentType.startswith(mediaTypes):
+            raise HttpError(
+                HttpError.UNSUPPORTED_MEDIA_TYPE, 'Expected {0} Content-Type'.format(' or '.join(mediaTypes))
+            )
         entity = getAndValidateJSON(
             self.eventGet('body'),
             name,
@@ -163,11 +173,14 @@ class APIGateway:
         return {'Location': self.getHttpResource() + '/' + uuid}
 
     def createErrorResponse(self, error):
-        if not isinstance(error, HttpError):
-            error = HttpError.wrap(error)
+        error = self.errorReporter.report(error)
         error.method = self.getHttpMethod()
         error.resource = self.getHttpResource()
-        return createResponse(error.statusCode, {}, error.__dict__)
+        error.requestId = self.requestId
+        headers = {}
+        if getattr(error, 'retryAfter', None) is not None:
+            headers['Retry-After'] = str(error.retryAfter)
+        return createResponse(error.statusCode, headers, error.__dict__)
 
     def createResponse(self, statusCode=200, headers={}, body={}):
         return createResponse(statusCode, headers, body)
@@ -0,0 +1,100 @@
+import logging
+import time
+
+from src.commons.metrics import Metrics
+from src.commons.nsp_error import NspError
+from src.commons.request_context import ThreadLocalVar, contextvars
+
+currentDeadline = (contextvars.ContextVar if contextvars else ThreadLocalVar)('deadline', default=None)
+
+
+class Deadline:
+    'Point in time, on the time.monotonic() clock, by which the current request must be completed'
+
+    def __init__(self, expiresAt, onExceeded=None):
+        self.expiresAt = expiresAt
+        self.onExceeded = onExceeded
+
+    def fromContext(cls, context, safetyMarginMillis=0, onExceeded=None):
+        'Returns the deadline of a Lambda context, safetyMarginMillis before its timeout, or None without a context'
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return None
+        remainingMillis = context.get_remaining_time_in_millis() - safetyMarginMillis
+        return cls(time.monotonic() + remainingMillis / 1000, onExceeded)
+    fromContext = classmethod(fromContext)
+
+    def remaining(self):
+        'Returns the seconds left, negative once the deadline has passed'
+        return self.expiresAt - time.monotonic()
+
+    def timeout(self, timeout=None):
+        'Returns the timeout in seconds of a call, not exceeding the seconds left'
+        remaining = max(self.remaining(), 0)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def exceeded(self, operation):
+        'Returns the DEADLINE_EXCEEDED error of an operation, notifying onExceeded'
+        if self.onExceeded is not None:
+            self.onExceeded()
+        return NspError(NspError.DEADLINE_EXCEEDED, 'Deadline exceeded before completing the {0}'.format(operation))
+
+    def check(self, operation):
+        'Raises DEADLINE_EXCEEDED if the deadline has passed'
+        if self.remaining() <= 0:
+            raise self.exceeded(operation)
+
+
+def setDeadline(deadline):
+    currentDeadline.set(deadline)
+
+
+def getDeadline():
+    'Returns the deadline of the current request, or None if it has none'
+    return currentDeadline.get()
+
+
+def checkDeadline(operation):
+    'Raises DEADLINE_EXCEEDED if the current request has a deadline and it has passed'
+    deadline = currentDeadline.get()
+    if deadline is not None:
+        deadline.check(operation)
+
+
+def getTimeout(timeout=None):
+    'Returns the timeout of a call of the current request, limited by its deadline if any'
+    deadline = currentDeadline.get()
+    return timeout if deadline is None else deadline.timeout(timeout)
+
+
+def Deadlines(loggerFactory, config=None, metrics=None):
+    '''
+    Starts the deadline of each request from the remaining time of its Lambda context, "safetyMarginMillis" (200)
+    before the timeout so that there is time left to return the error response. A request with less than
+    "minimumMillis" (100) left is rejected at once with SERVICE_UNAVAILABLE; one passing its deadline fails with
+    DEADLINE_EXCEEDED and counts a DeadlineExceeded metric.
+    '''
+
+    config = config or {}
+    safetyMarginMillis = config.get('safetyMarginMillis', 200)
+    minimumMillis = config.get('minimumMillis', 100)
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+
+    def onExceeded():
+        metrics.count('DeadlineExceeded')
+
+    class Service:
+        def start(self, context):
+            deadline = Deadline.fromContext(context, safetyMarginMillis, onExceeded)
+            setDeadline(deadline)
+            if deadline is not None and deadline.remaining() * 1000 < minimumMillis:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('start(): %.0fms left, rejecting the request', deadline.remaining() * 1000)
+                metrics.count('DeadlineInsufficient')
+                raise NspError(NspError.SERVICE_UNAVAILABLE, 'Not enough time left to serve the request')
+            return deadline
+
+        def stop(self):
+            setDeadline(None)
+
+    return Service()
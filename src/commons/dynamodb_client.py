@@ -0,0 +1,55 @@
+import json
+import time
+
+
+class DynamoDBClient:
+    '''
+    Client of the shared stores (SharedTokenBucketStore, SharedIdempotencyStore) on a DynamoDB table whose hash key is
+    the string "key". An item keeps the value as json in "value", a "version" incremented by every write, and the epoch
+    seconds at which it expires in "expiresAt", to be enabled as the time to live attribute of the table; DynamoDB
+    deletes the expired items lazily, so they are ignored until then. boto3 is imported only when no table is given.
+    '''
+
+    def __init__(self, tableName, table=None, clock=time.time):
+        if table is None:
+            import boto3
+            table = boto3.resource('dynamodb').Table(tableName)
+        self.table = table
+        self.clock = clock
+
+    def get(self, key):
+        'Returns (value, version) of the key, the value being None for a missing or expired key'
+        item = self.table.get_item(Key={'key': key}, ConsistentRead=True).get('Item')
+        if item is None:
+            return (None, None)
+        version = int(item['version'])
+        if int(item['expiresAt']) <= self.clock():
+            return (None, version)
+        return (json.loads(item['value']), version)
+
+    def compareAndSet(self, key, value, version, ttlSeconds):
+        'Stores the value of the key if its version is still the given one (None if missing), returning whether it did'
+        item = {
+            'key': key,
+            'value': json.dumps(value),
+            'version': (version or 0) + 1,
+            'expiresAt': int(self.clock() + ttlSeconds)
+        }
+        if version is None:
+            condition = {
+                'ConditionExpression': 'attribute_not_exists(#key)',
+                'ExpressionAttributeNames': {'#key': 'key'}
+            }
+        else:
+            condition = {
+                'ConditionExpression': '#version = :version',
+                'ExpressionAttributeNames': {'#version': 'version'},
+                'ExpressionAttributeValues': {':version': version}
+            }
+        try:
+            self.table.put_item(Item=item, **condition)
+        except Exception as error:
+            if getattr(error, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
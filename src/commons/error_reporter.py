@@ -0,0 +1,54 @@
+import time
+
+from src.commons.http_error import HttpError
+from src.commons.metrics import Metrics
+from src.commons.nsp_error import NspError
+
+
+def ErrorReporter(loggerFactory, config=None, metrics=None, clock=time.monotonic):
+    '''
+    Converts the errors raised while serving a request to HttpErrors, counting them in the metrics. Unexpected errors
+    get a compact client-facing message unless the "detail" configuration is "full"; their tracebacks are only logged,
+    at most maxTracebacksPerInterval times every tracebackIntervalSeconds.
+    '''
+
+    config = config or {}
+    detail = config.get('detail', HttpError.COMPACT_DETAIL)
+    maxTracebacks = config.get('maxTracebacksPerInterval', 10)
+    interval = config.get('tracebackIntervalSeconds', 60)
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+
+    class Service:
+        def __init__(self):
+            self.windowStart = clock()
+            self.logged = 0
+            self.suppressed = 0
+
+        def logTraceback(self, error):
+            now = clock()
+            if now - self.windowStart >= interval:
+                if self.suppressed:
+                    logger.error('%d error tracebacks suppressed in the last %s seconds', self.suppressed, interval)
+                self.windowStart = now
+                self.logged = 0
+                self.suppressed = 0
+            if self.logged < maxTracebacks:
+                self.logged += 1
+                logger.error('Unexpected error: %r', error, exc_info=error)
+            else:
+                self.suppressed += 1
+
+        def report(self, error):
+            if isinstance(error, HttpError):
+                httpError = error
+            else:
+                if not isinstance(error, NspError):
+                    self.logTraceback(error)
+                httpError = HttpError.wrap(error, detail)
+            metrics.count('Errors')
+            if httpError.statusCode >= HttpError.INTERNAL_SERVER_ERROR:
+                metrics.count('ServerErrors')
+            return httpError
+
+    return Service()
@@ -9,8 +9,12 @@ class HttpError(Exception):
     BAD_REQUEST = 400
     CONFLICT = 409
     FORBIDDEN = 403
+    GATEWAY_TIMEOUT = 504
+    GONE = 410
     INTERNAL_SERVER_ERROR = 500
     NOT_FOUND = 404
+    TOO_MANY_REQUESTS = 429
+    SERVICE_UNAVAILABLE = 503
     UNAUTHORIZED = 401
     UNPROCESSABLE_ENTITY = 422
     UNSUPPORTED_MEDIA_TYPE = 415
@@ -19,8 +23,12 @@ class HttpError(Exception):
         BAD_REQUEST: 'Bad request',
         CONFLICT: 'Conflict',
         FORBIDDEN: 'Forbidden',
+        GATEWAY_TIMEOUT: 'Gateway timeout',
+        GONE: 'Gone',
         INTERNAL_SERVER_ERROR: 'Internal server error',
         NOT_FOUND: 'Not found',
+        TOO_MANY_REQUESTS: 'Too many requests',
+        SERVICE_UNAVAILABLE: 'Service unavailable',
         UNAUTHORIZED: 'Unauthorized',
         UNPROCESSABLE_ENTITY: 'Unprocessable entity',
         UNSUPPORTED_MEDIA_TYPE: 'Unsupported media type'
@@ -28,25 +36,38 @@ class HttpError(Exception):
 
     ERROR_CODES_TO_STATUS_CODES = {}
     ERROR_CODES_TO_STATUS_CODES[NspError.THING_ALREADY_EXISTS] = CONFLICT
+    ERROR_CODES_TO_STATUS_CODES[NspError.THING_CONFLICT] = CONFLICT
     ERROR_CODES_TO_STATUS_CODES[NspError.THING_NOT_FOUND] = NOT_FOUND
     ERROR_CODES_TO_STATUS_CODES[NspError.THING_UNPROCESSABLE] = UNPROCESSABLE_ENTITY
+    ERROR_CODES_TO_STATUS_CODES[NspError.CHANGES_EXPIRED] = GONE
     ERROR_CODES_TO_STATUS_CODES[NspError.FORBIDDEN] = FORBIDDEN
+    ERROR_CODES_TO_STATUS_CODES[NspError.SERVICE_UNAVAILABLE] = SERVICE_UNAVAILABLE
+    ERROR_CODES_TO_STATUS_CODES[NspError.DEADLINE_EXCEEDED] = GATEWAY_TIMEOUT
+    ERROR_CODES_TO_STATUS_CODES[NspError.TOO_MANY_REQUESTS] = TOO_MANY_REQUESTS
     ERROR_CODES_TO_STATUS_CODES[NspError.INTERNAL_SERVER_ERROR] = INTERNAL_SERVER_ERROR
 
-    def wrap(cls, error):
+    COMPACT_DETAIL = 'compact'
+    FULL_DETAIL = 'full'
+
+    def wrap(cls, error, detail=COMPACT_DETAIL):
         if isinstance(error, NspError):
             statusCode = cls.ERROR_CODES_TO_STATUS_CODES.get(error.code, cls.INTERNAL_SERVER_ERROR)
-            httpError = HttpError(statusCode, error.message, error.causes, error.timestamp)
-        else:
-            tb = sys.exc_info()[2]
+            httpError = HttpError(statusCode, error.message, error.causes, error.timestamp, error.retryAfter)
+        elif detail == cls.FULL_DETAIL:
+            tb = error.__traceback__ or sys.exc_info()[2]
             httpError = HttpError(cls.INTERNAL_SERVER_ERROR, repr(error) + ':\n' + ''.join(traceback.format_tb(tb)))
+        else:
+            httpError = HttpError(cls.INTERNAL_SERVER_ERROR, cls.STATUS_REASONS[cls.INTERNAL_SERVER_ERROR])
         return httpError
     wrap = classmethod(wrap)
 
-    def __init__(self, statusCode, message, causes=[], timestamp=None):
+    def __init__(self, statusCode, message, causes=[], timestamp=None, retryAfter=None):
         Exception.__init__(self, message)
         self.statusCode = statusCode
         self.statusReason = self.STATUS_REASONS[statusCode]
         self.message = message
         self.causes = causes
         self.timestamp = timestamp or datetime.now()
+        # only set when given, since the attributes are the body of the error responses
+        if retryAfter is not None:
+            self.retryAfter = retryAfter
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from src.commons.dynamodb_client import DynamoDBClient
+from src.commons.nsp_error import NspError
+
+
+class IdempotencyEntry:
+    'The fingerprint of the request with an idempotency key, and its response once completed'
+
+    __slots__ = ('fingerprint', 'expiresAt', 'response')
+
+    def __init__(self, fingerprint, expiresAt):
+        self.fingerprint = fingerprint
+        self.expiresAt = expiresAt
+        self.response = None
+
+
+class IdempotencyStore:
+    '''
+    Responses of the requests with an idempotency key, kept in the memory of the process for ttlSeconds, so that the
+    retries of a request get its response instead of repeating it. A key is reserved while its first request is in
+    flight; past maxEntries keys the oldest ones are dropped. The retries reaching another instance of a multi-instance
+    deployment need a SharedIdempotencyStore instead.
+    '''
+
+    def __init__(self, maxEntries=10000, ttlSeconds=86400, clock=time.monotonic):
+        self.maxEntries = maxEntries
+        self.ttlSeconds = ttlSeconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key: IdempotencyEntry, in order of expiration
+        self.entries = OrderedDict()
+
+    def evict(self, now):
+        while self.entries:
+            entry = next(iter(self.entries.values()))
+            if entry.expiresAt > now and len(self.entries) <= self.maxEntries:
+                return
+            self.entries.popitem(last=False)
+
+    def reserve(self, key, fingerprint):
+        '''
+        Reserves the key for a request with the fingerprint, returning None, or the IdempotencyEntry of the earlier
+        request with the key if there is one, whose response is None while it is in flight
+        '''
+        with self.lock:
+            now = self.clock()
+            self.evict(now)
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry
+            self.entries[key] = IdempotencyEntry(fingerprint, now + self.ttlSeconds)
+            self.evict(now)
+            return None
+
+    def complete(self, key, response):
+        'Stores the response of the request that reserved the key'
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.response = response
+
+    def release(self, key):
+        'Drops the reservation of a request that failed, so that it can be retried'
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class SharedIdempotencyStore:
+    '''
+    Idempotency entries kept in a store shared by the instances of a multi-instance deployment, so that the retry of a
+    request reaching another instance finds its entry, through a client with the get(key) and compareAndSet(key, value,
+    version, ttlSeconds) operations described in SharedTokenBucketStore. A reservation expires after inFlightSeconds,
+    longer than a request can take, so that the key of a request whose instance died can be used again; a response
+    after ttlSeconds. The keys must be json serializable.
+    '''
+
+    def __init__(self, client, keyPrefix='idempotency:', ttlSeconds=86400, inFlightSeconds=60, maxAttempts=5):
+        self.client = client
+        self.keyPrefix = keyPrefix
+        self.ttlSeconds = ttlSeconds
+        self.inFlightSeconds = inFlightSeconds
+        self.maxAttempts = maxAttempts
+
+    def storeKey(self, key):
+        return self.keyPrefix + json.dumps(key)
+
+    def reserve(self, key, fingerprint):
+        '''
+        Reserves the key for a request with the fingerprint, returning None, or the IdempotencyEntry of the earlier
+        request with the key if there is one, whose response is None while it is in flight
+        '''
+        key = self.storeKey(key)
+        for attempt in range(self.maxAttempts):
+            (value, version) = self.client.get(key)
+            if value is not None:
+                entry = IdempotencyEntry(value['fingerprint'], None)
+                entry.response = value['response']
+                return entry
+            value = {'fingerprint': fingerprint, 'response': None}
+            if self.client.compareAndSet(key, value, version, self.inFlightSeconds):
+                return None
+        raise NspError(NspError.SERVICE_UNAVAILABLE, 'Too much contention on the idempotency key')
+
+    def complete(self, key, response):
+        'Stores the response of the request that reserved the key'
+        key = self.storeKey(key)
+        (value, version) = self.client.get(key)
+        if value is not None and value['response'] is None:
+            self.client.compareAndSet(key, dict(value, response=response), version, self.ttlSeconds)
+
+    def release(self, key):
+        'Drops the reservation of a request that failed, so that it can be retried'
+        key = self.storeKey(key)
+        (value, version) = self.client.get(key)
+        if value is not None and value['response'] is None:
+            self.client.compareAndSet(key, None, version, self.inFlightSeconds)
+
+
+def createIdempotencyStore(config=None, client=None):
+    '''
+    Returns the idempotency store of the configuration: an IdempotencyStore for the "memory" backend (the default), or
+    a SharedIdempotencyStore for the "dynamodb" backend, on the client or else on the DynamoDB table "tableName", so
+    that the retries reaching another instance of a multi-instance deployment find the entry of their request
+    '''
+
+    config = config or {}
+    backend = config.get('backend', 'memory')
+    ttlSeconds = config.get('ttlSeconds', 86400)
+    if backend == 'memory':
+        return IdempotencyStore(config.get('maxEntries', 10000), ttlSeconds)
+    if client is None:
+        if not config.get('tableName'):
+            raise ValueError('The "dynamodb" idempotency backend needs a "tableName"')
+        client = DynamoDBClient(config['tableName'])
+    return SharedIdempotencyStore(
+        client, config.get('keyPrefix', 'idempotency:'), ttlSeconds, config.get('inFlightSeconds', 60)
+    )
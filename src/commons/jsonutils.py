@@ -3,6 +3,8 @@ from datetime import datetime, timezone
 import dateutil.parser
 
 ISO_DATETIME_MATCHER = re.compile('^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[-+]\d{2}:\d{2})$')
+# the Z datetimes written by datetime2json, parsed without dateutil
+UTC_DATETIME_MATCHER = re.compile('^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z$')
 
 
 def transformDictionary(obj, select, convert):
@@ -35,6 +37,12 @@ def datetime2json(d):
 
 def json2datetime(s):
     'Parses json datetime strings to naive utc datetimes'
+    match = UTC_DATETIME_MATCHER.match(s)
+    if match:
+        (year, month, day, hour, minute, second, fraction) = match.groups()
+        return datetime(
+            int(year), int(month), int(day), int(hour), int(minute), int(second), int((fraction or '').ljust(6, '0'))
+        )
     return normalizeDatetime(dateutil.parser.parse(s))
 
 
@@ -71,3 +79,20 @@ def getAtPath(obj, path, default=None):
         else:
             obj = None
     return obj if obj is not None else default
+
+
+def mergePatch(target, patch):
+    '''
+    Returns the result of applying a JSON merge patch (RFC 7386) to target, without modifying either: the members of
+    an object patch replace the ones of target recursively, null members remove them, and any other patch replaces
+    target as a whole
+    '''
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for (key, value) in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = mergePatch(result.get(key), value)
+    return result
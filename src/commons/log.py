@@ -0,0 +1,103 @@
+import copy
+import json
+import logging
+import logging.config
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import src.commons.jsonutils as jsonutils
+from src.commons.request_context import RequestContextFilter
+
+STANDARD_RECORD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', None, None).__dict__.keys()) | {'message'}
+
+currentPipeline = None
+
+
+class JsonFormatter(logging.Formatter):
+    'Formats each log record as a single line JSON object, including the attributes passed with `extra`'
+
+    def format(self, record):
+        entry = {
+            'timestamp': jsonutils.datetime2json(datetime.fromtimestamp(record.created, timezone.utc)),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for (key, value) in record.__dict__.items():
+            if key not in STANDARD_RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    '''
+    QueueHandler that keeps the exception of the records, rendered in exc_text, apart from the message, where the stock
+    prepare() folds it into the message and drops exc_info, so that the JsonFormatter still finds it
+    '''
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    '''
+    Moves the handlers of the root logger behind a QueueHandler, so that the calling thread only renders the message
+    and enqueues the record, while a QueueListener thread formats and writes it
+    '''
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.handlers = logger.handlers[:]
+        self.queue = queue.Queue(-1)
+        self.queueHandler = RecordQueueHandler(self.queue)
+        self.queueHandler.setLevel(min((handler.level for handler in self.handlers), default=logging.NOTSET))
+        self.queueHandler.addFilter(RequestContextFilter())
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+
+    def start(self):
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+        self.logger.addHandler(self.queueHandler)
+        self.listener.start()
+
+    def flush(self):
+        'Waits until all the enqueued records have been written'
+        self.queue.join()
+
+    def stop(self):
+        self.listener.stop()
+        self.logger.removeHandler(self.queueHandler)
+        for handler in self.handlers:
+            self.logger.addHandler(handler)
+
+
+def configureLogging(loggingConfig, queueConfig=None):
+    '''
+    Configures logging with dictConfig(), attaches the request context to the records of the root handlers and, unless
+    disabled, starts a non-blocking LogPipeline for the root logger
+    '''
+    global currentPipeline
+    if currentPipeline is not None:
+        currentPipeline.stop()
+        currentPipeline = None
+    logging.config.dictConfig(loggingConfig)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestContextFilter())
+    if (queueConfig or {}).get('enabled', True):
+        currentPipeline = LogPipeline(logging.getLogger())
+        currentPipeline.start()
+    return currentPipeline
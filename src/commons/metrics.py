@@ -0,0 +1,142 @@
+import json
+import sys
+import time
+
+from src.commons.request_context import ThreadLocalVar, contextvars, getRequestContext
+
+DEFAULT_NAMESPACE = 'StarterServerlessPython'
+
+coldStart = True
+
+
+def emitToStdout(line):
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+
+class NullStage:
+    'Stage returned when metrics are disabled: entering and exiting it costs a couple of attribute lookups'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *pargs):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class RequestMetrics:
+    'Stage timings, counters, properties and open stages collected for the current request'
+
+    def __init__(self):
+        self.timings = {}
+        self.counts = {}
+        self.properties = {}
+        self.stack = []
+
+
+def Metrics(loggerFactory, config=None, emit=emitToStdout):
+    '''
+    Collects per-request stage timings and counters and flushes them as a CloudWatch Embedded Metric Format log line.
+    Stages nest, and each stage only records its own (exclusive) time, so the stage timings of a request add up to
+    the time spent inside the outermost stages. The values are kept in a context variable, so concurrent requests
+    (threads, or asyncio tasks from Python 3.7) each collect and flush their own.
+    '''
+
+    config = config or {}
+    enabled = config.get('enabled', False)
+    namespace = config.get('namespace', DEFAULT_NAMESPACE)
+    logger = loggerFactory(__name__)
+    currentMetrics = (contextvars.ContextVar if contextvars else ThreadLocalVar)('metrics', default=None)
+
+    class Stage:
+        def __init__(self, service, name):
+            self.service = service
+            self.name = name
+            self.childrenTime = 0.0
+
+        def __enter__(self):
+            self.stack = self.service.current().stack
+            self.stack.append(self)
+            self.start = time.perf_counter()
+            return self
+
+        def __exit__(self, *pargs):
+            elapsed = (time.perf_counter() - self.start) * 1000
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1].childrenTime += elapsed
+            self.service.record(self.name, elapsed - self.childrenTime)
+            return False
+
+    class Service:
+        def __init__(self):
+            self.enabled = enabled
+
+        def current(self):
+            'Returns the metrics of the current request, starting them on first use'
+            requestMetrics = currentMetrics.get()
+            if requestMetrics is None:
+                requestMetrics = RequestMetrics()
+                currentMetrics.set(requestMetrics)
+            return requestMetrics
+
+        def reset(self):
+            currentMetrics.set(RequestMetrics())
+
+        timings = property(lambda self: self.current().timings)
+        counts = property(lambda self: self.current().counts)
+        properties = property(lambda self: self.current().properties)
+        stack = property(lambda self: self.current().stack)
+
+        def stage(self, name):
+            if not enabled:
+                return NULL_STAGE
+            return Stage(self, name)
+
+        def record(self, name, milliseconds):
+            if enabled:
+                self.timings[name] = self.timings.get(name, 0.0) + milliseconds
+
+        def count(self, name, value=1):
+            if enabled:
+                self.counts[name] = self.counts.get(name, 0) + value
+
+        def setProperty(self, name, value):
+            if enabled:
+                self.properties[name] = value
+
+        def flush(self, operation):
+            global coldStart
+            if not enabled:
+                return
+            requestMetrics = self.current()
+            metrics = [{'Name': name, 'Unit': 'Milliseconds'} for name in requestMetrics.timings]
+            metrics.extend({'Name': name, 'Unit': 'Count'} for name in requestMetrics.counts)
+            metrics.append({'Name': 'ColdStart', 'Unit': 'Count'})
+            line = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': namespace,
+                        'Dimensions': [['Operation']],
+                        'Metrics': metrics
+                    }]
+                },
+                'Operation': operation,
+                'ColdStart': 1 if coldStart else 0
+            }
+            line.update(getRequestContext())
+            line.update(requestMetrics.properties)
+            line.update(requestMetrics.timings)
+            line.update(requestMetrics.counts)
+            coldStart = False
+            self.reset()
+            try:
+                emit(json.dumps(line))
+            except Exception as error:
+                logger.warn('flush(): cannot emit metrics: %s', error)
+
+    return Service()
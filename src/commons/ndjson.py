@@ -0,0 +1,55 @@
+import json
+
+import src.commons.jsonutils as jsonutils
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+encoder = json.JSONEncoder(default=jsonutils.dumpdefault, separators=(',', ':'))
+
+
+def dumps(record):
+    'Serializes a record to a newline terminated json line'
+    return encoder.encode(record) + '\n'
+
+
+def dumpChunks(records, chunkSize=DEFAULT_CHUNK_SIZE):
+    '''
+    Serializes an iterable of records to newline delimited json, yielding chunks of whole lines of about chunkSize
+    characters, so that only one chunk at a time is kept in memory
+    '''
+    lines = []
+    size = 0
+    for record in records:
+        line = dumps(record)
+        lines.append(line)
+        size += len(line)
+        if size >= chunkSize:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines)
+
+
+def dump(records, outfile, chunkSize=DEFAULT_CHUNK_SIZE):
+    'Writes an iterable of records to a file as newline delimited json, returning the number of records'
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    for chunk in dumpChunks(counted(), chunkSize):
+        outfile.write(chunk)
+    return count
+
+
+def load(infile):
+    'Iterates over the records of a newline delimited json file, converting the json datetimes, skipping blank lines'
+    for line in infile:
+        if line.strip():
+            record = json.loads(line)
+            jsonutils.convertDatetimeValues(record)
+            yield record
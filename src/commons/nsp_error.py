@@ -4,13 +4,19 @@ from datetime import datetime
 class NspError(Exception):
     THING_NOT_FOUND = 'THING_NOT_FOUND'
     THING_ALREADY_EXISTS = 'THING_ALREADY_EXISTS'
+    THING_CONFLICT = 'THING_CONFLICT'
     THING_UNPROCESSABLE = 'THING_UNPROCESSABLE'
+    CHANGES_EXPIRED = 'CHANGES_EXPIRED'
     FORBIDDEN = 'FORBIDDEN'
+    SERVICE_UNAVAILABLE = 'SERVICE_UNAVAILABLE'
+    DEADLINE_EXCEEDED = 'DEADLINE_EXCEEDED'
+    TOO_MANY_REQUESTS = 'TOO_MANY_REQUESTS'
     INTERNAL_SERVER_ERROR = 'INTERNAL_SERVER_ERROR'
 
-    def __init__(self, code, message, causes=[]):
+    def __init__(self, code, message, causes=[], retryAfter=None):
         Exception.__init__(self, message)
         self.code = code
         self.message = message
         self.causes = causes
+        self.retryAfter = retryAfter
         self.timestamp = datetime.now()
@@ -0,0 +1,68 @@
+import logging
+
+from src.commons.principal import raiseForbiddenError
+
+ALL_ACTIONS = '*'
+MAX_CACHED_ROLE_SETS = 1024
+
+
+def Policy(loggerFactory, actions, config=None, defaultRoles=None):
+    '''
+    Authorization policy compiled from the "roles" of the config, a map of each role to the list of the actions it
+    permits, "*" permitting all of them; defaultRoles when the config has none. Each of the actions, a map of the
+    action names to their descriptions in the FORBIDDEN messages, gets a bit, each role the bitmask of its actions, and
+    each set of roles the union of their bitmasks, computed on its first check, so that checking an action is a lookup
+    and a bitwise and.
+    '''
+
+    config = config or {}
+    logger = loggerFactory(__name__)
+    bits = {action: 1 << i for (i, action) in enumerate(sorted(actions))}
+    allBits = (1 << len(bits)) - 1
+
+    def compileRole(role, roleActions):
+        unknown = set(roleActions) - set(bits) - {ALL_ACTIONS}
+        if unknown:
+            raise ValueError('Unknown actions of role {0}: {1}'.format(role, ', '.join(sorted(unknown))))
+        if ALL_ACTIONS in roleActions:
+            return allBits
+        mask = 0
+        for action in roleActions:
+            mask |= bits[action]
+        return mask
+
+    roleMasks = {
+        role: compileRole(role, roleActions)
+        for (role, roleActions) in config.get('roles', defaultRoles or {}).items()
+    }
+    # permissions of the role sets seen, kept apart from the principals, whose attributes come from the request
+    permissionsByRoles = {}
+
+    def getPermissions(roles):
+        mask = 0
+        for role in roles:
+            mask |= roleMasks.get(role, 0)
+        return mask
+
+    class Service:
+        def getPermissions(self, principal):
+            'Returns the bitmask of the actions permitted to the roles of the principal, cached by role set'
+            roles = frozenset(principal.roles)
+            permissions = permissionsByRoles.get(roles)
+            if permissions is None:
+                if len(permissionsByRoles) >= MAX_CACHED_ROLE_SETS:
+                    permissionsByRoles.clear()
+                permissions = permissionsByRoles[roles] = getPermissions(roles)
+            return permissions
+
+        def isAllowed(self, principal, action):
+            return bool(self.getPermissions(principal) & bits[action])
+
+        def check(self, principal, action):
+            'Raises FORBIDDEN unless one of the roles of the principal permits the action'
+            if not self.isAllowed(principal, action):
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('check(): principal=%s is not allowed to %s', principal, action)
+                raiseForbiddenError(actions[action])
+
+    return Service()
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.commons.deadline import getDeadline
+from src.commons.metrics import Metrics
+from src.commons.nsp_error import NspError
+
+
+def Pool(loggerFactory, name, create, close=None, check=None, config=None, metrics=None):
+    '''
+    Pool of reusable backend resources, like connections, created by create(). It keeps between "minSize" and
+    "maxSize" resources; acquire() waits up to "acquireTimeoutSeconds" for one to be released when all of them are in
+    use, then raises SERVICE_UNAVAILABLE. An idle resource is checked with check(resource) before being reused if it
+    was idle for more than "healthCheckSeconds", and the ones idle for more than "idleSeconds" beyond minSize are
+    closed with close(resource). Within a request with a deadline, acquire() does not wait past it and raises
+    DEADLINE_EXCEEDED instead. There is no background thread, since the execution environment may be frozen
+    between the requests: the idle resources are evicted when the pool is used.
+    '''
+
+    config = config or {}
+    minSize = config.get('minSize', 0)
+    maxSize = config.get('maxSize', 10)
+    idleSeconds = config.get('idleSeconds', 300)
+    healthCheckSeconds = config.get('healthCheckSeconds', 30)
+    acquireTimeoutSeconds = config.get('acquireTimeoutSeconds', 5)
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    condition = threading.Condition()
+    # (resource, time it was released) of the idle resources, the most recently released on the right
+    idle = deque()
+    counters = {'created': 0, 'closed': 0, 'inUse': 0, 'waits': 0, 'timeouts': 0, 'failedChecks': 0}
+    closed = False
+
+    def size():
+        return len(idle) + counters['inUse']
+
+    def destroy(resource):
+        counters['closed'] += 1
+        if close is not None:
+            try:
+                close(resource)
+            except Exception as error:
+                logger.warn('Cannot close a resource of pool "%s": %s', name, error)
+
+    def isHealthy(resource):
+        if check is None:
+            return True
+        try:
+            return check(resource)
+        except Exception as error:
+            logger.warn('Health check of a resource of pool "%s" failed: %s', name, error)
+            return False
+
+    def evictIdleLocked(now):
+        while len(idle) > 0 and size() > minSize and now - idle[0][1] > idleSeconds:
+            destroy(idle.popleft()[0])
+
+    def takeIdleLocked(now):
+        'Returns a healthy idle resource, or None'
+        while idle:
+            (resource, released) = idle.pop()
+            if now - released <= healthCheckSeconds or isHealthy(resource):
+                return resource
+            counters['failedChecks'] += 1
+            metrics.count('PoolFailedChecks')
+            destroy(resource)
+        return None
+
+    class Service:
+        def __init__(self):
+            self.name = name
+
+        def acquire(self):
+            'Returns an idle resource, or a new one if the pool is not full, waiting for one to be released otherwise'
+            requestDeadline = getDeadline()
+            timeout = acquireTimeoutSeconds
+            if requestDeadline is not None:
+                timeout = requestDeadline.timeout(acquireTimeoutSeconds)
+            deadline = time.monotonic() + timeout
+            with condition:
+                waited = False
+                while True:
+                    if closed:
+                        raise NspError(NspError.SERVICE_UNAVAILABLE, 'Pool "{0}" is closed'.format(name))
+                    now = time.monotonic()
+                    resource = takeIdleLocked(now)
+                    if resource is not None:
+                        counters['inUse'] += 1
+                        return resource
+                    if size() < maxSize:
+                        counters['inUse'] += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        counters['timeouts'] += 1
+                        metrics.count('PoolTimeouts')
+                        if timeout < acquireTimeoutSeconds:
+                            raise requestDeadline.exceeded('acquisition of a resource of pool "{0}"'.format(name))
+                        raise NspError(
+                            NspError.SERVICE_UNAVAILABLE,
+                            'No resource of pool "{0}" available within {1}s'.format(name, acquireTimeoutSeconds)
+                        )
+                    if not waited:
+                        waited = True
+                        counters['waits'] += 1
+                        metrics.count('PoolWaits')
+                    condition.wait(remaining)
+            # creates the resource out of the lock, having reserved its place in the pool
+            try:
+                resource = create()
+            except Exception:
+                with condition:
+                    counters['inUse'] -= 1
+                    condition.notify()
+                raise
+            with condition:
+                counters['created'] += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('acquire(): created a resource of pool "%s"', name)
+            return resource
+
+        def release(self, resource, broken=False):
+            'Returns the resource to the pool, closing it instead if broken'
+            with condition:
+                counters['inUse'] -= 1
+                now = time.monotonic()
+                if broken or closed:
+                    destroy(resource)
+                else:
+                    idle.append((resource, now))
+                    evictIdleLocked(now)
+                condition.notify()
+
+        @contextmanager
+        def resource(self):
+            'Context manager acquiring a resource and releasing it, as broken if the block raises'
+            resource = self.acquire()
+            try:
+                yield resource
+            except Exception:
+                self.release(resource, broken=True)
+                raise
+            self.release(resource)
+
+        def fill(self):
+            'Creates the resources missing to minSize'
+            resources = [self.acquire() for i in range(max(0, minSize - self.stats()['size']))]
+            for resource in resources:
+                self.release(resource)
+
+        def evictIdle(self):
+            'Closes the resources idle for more than idleSeconds, keeping at least minSize'
+            with condition:
+                evictIdleLocked(time.monotonic())
+
+        def stats(self):
+            with condition:
+                return dict(counters, size=size(), idle=len(idle), minSize=minSize, maxSize=maxSize)
+
+        def close(self):
+            'Closes the idle resources, and the ones in use as soon as they are released'
+            nonlocal closed
+            with condition:
+                closed = True
+                while idle:
+                    destroy(idle.popleft()[0])
+                condition.notify_all()
+
+    return Service()
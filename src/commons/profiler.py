@@ -0,0 +1,119 @@
+import cProfile
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+import src.commons.jsonutils as jsonutils
+
+PROFILE_HEADER = 'X-Debug-Profile'
+PSTATS_FORMAT = 'pstats'
+COLLAPSED_FORMAT = 'collapsed'
+
+
+def signProfileRequest(secret, expiresAt):
+    'Returns the value of the X-Debug-Profile header that requests profiling until the expiresAt epoch seconds'
+    digest = hmac.new(secret.encode(), str(expiresAt).encode(), hashlib.sha256).hexdigest()
+    return '{0}:{1}'.format(expiresAt, digest)
+
+
+def frameName(frame):
+    code = frame.f_code
+    return '{0}:{1}'.format(os.path.basename(code.co_filename), code.co_name).replace(' ', '_')
+
+
+class StackSampler:
+    'Samples the stack of a thread at a fixed interval and aggregates the samples as collapsed stacks'
+
+    def __init__(self, threadId, interval):
+        self.threadId = threadId
+        self.interval = interval
+        self.stacks = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            names = []
+            while frame is not None:
+                names.append(frameName(frame))
+                frame = frame.f_back
+            if names:
+                stack = ';'.join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def enable(self):
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump_stats(self, fileName):
+        with open(fileName, 'w') as outfile:
+            for (stack, count) in sorted(self.stacks.items()):
+                outfile.write('{0} {1}\n'.format(stack, count))
+
+
+def Profiler(loggerFactory, config=None, environ=os.environ):
+    '''
+    Profiles a sampled fraction of the requests, plus every request carrying a valid signed X-Debug-Profile header.
+    Profiling is configured in the "profiling" section of the configuration; the PROFILING_ENABLED,
+    PROFILING_SAMPLE_RATE, PROFILING_OUTPUT_DIRECTORY and PROFILING_SECRET environment variables override it.
+    '''
+
+    config = config or {}
+    enabled = environ.get('PROFILING_ENABLED', str(config.get('enabled', False))).lower() == 'true'
+    sampleRate = float(environ.get('PROFILING_SAMPLE_RATE', config.get('sampleRate', 0.0)))
+    outputDirectory = environ.get('PROFILING_OUTPUT_DIRECTORY', config.get('outputDirectory', '/tmp/profiles'))
+    secret = environ.get('PROFILING_SECRET', config.get('secret'))
+    outputFormat = config.get('format', PSTATS_FORMAT)
+    samplingInterval = config.get('samplingIntervalMs', 5) / 1000
+    logger = loggerFactory(__name__)
+
+    def isSignedRequest(event):
+        if not secret:
+            return False
+        header = jsonutils.getAtPath(event, ['headers', PROFILE_HEADER])
+        if header is None:
+            return False
+        try:
+            expiresAt = int(header.split(':', 1)[0])
+        except ValueError:
+            return False
+        return expiresAt >= time.time() and hmac.compare_digest(header, signProfileRequest(secret, expiresAt))
+
+    def createProfiler():
+        if outputFormat == COLLAPSED_FORMAT:
+            return StackSampler(threading.get_ident(), samplingInterval)
+        return cProfile.Profile()
+
+    class Service:
+        def shouldProfile(self, event):
+            return (enabled and random.random() < sampleRate) or isSignedRequest(event)
+
+        def profile(self, operation, event, function):
+            if not self.shouldProfile(event):
+                return function(event)
+            profiler = createProfiler()
+            profiler.enable()
+            try:
+                return function(event)
+            finally:
+                profiler.disable()
+                fileName = os.path.join(outputDirectory, '{0}-{1}-{2}.{3}'.format(
+                    operation, int(time.time() * 1000), uuid.uuid4().hex[:8], outputFormat
+                ))
+                try:
+                    os.makedirs(outputDirectory, exist_ok=True)
+                    profiler.dump_stats(fileName)
+                    logger.info('profile(): profile written to %s', fileName)
+                except Exception as error:
+                    logger.warn('profile(): cannot write profile %s: %s', fileName, error)
+
+    return Service()
@@ -0,0 +1,137 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from src.commons.metrics import Metrics
+from src.commons.nsp_error import NspError
+
+
+def refill(tokens, updated, now, rate, burst):
+    'Returns the tokens of a bucket last updated at updated, refilled at rate tokens per second up to burst'
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def retryAfter(tokens, cost, rate):
+    'Returns the whole seconds to wait until the bucket has cost tokens'
+    return max(1, int(math.ceil((cost - tokens) / rate)))
+
+
+class LocalTokenBucketStore:
+    '''
+    Token buckets kept in the memory of the process, for a single instance deployment, in least recently used order.
+    The least recently used buckets that have refilled completely, and so are equivalent to a missing one, are dropped,
+    judged by the rate and burst each bucket was last taken with; above maxKeys buckets the least recently used ones
+    are dropped anyway.
+    '''
+
+    def __init__(self, maxKeys=10000, clock=time.monotonic):
+        self.maxKeys = maxKeys
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key: (tokens, time of the last update, rate, burst), least recently used first
+        self.buckets = OrderedDict()
+
+    def take(self, key, rate, burst, cost=1):
+        'Takes cost tokens from the bucket of the key if it has them, returning (allowed, retryAfterSeconds)'
+        with self.lock:
+            now = self.clock()
+            (tokens, updated) = self.buckets.pop(key, (burst, now))[:2]
+            tokens = refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.evict(now)
+            self.buckets[key] = (tokens, now, rate, burst)
+            return (allowed, None if allowed else retryAfter(tokens, cost, rate))
+
+    def evict(self, now):
+        while self.buckets:
+            (tokens, updated, rate, burst) = next(iter(self.buckets.values()))
+            if refill(tokens, updated, now, rate, burst) < burst and len(self.buckets) < self.maxKeys:
+                return
+            self.buckets.popitem(last=False)
+
+
+class SharedTokenBucketStore:
+    '''
+    Token buckets kept in a store shared by the instances of a multi-instance deployment, like Redis or DynamoDB,
+    through a client with two operations: get(key), returning (value, version) or (None, None) for a missing key, and
+    compareAndSet(key, value, version, ttlSeconds), storing the value only if the version of the key is still the
+    given one (None for a missing key) and returning whether it did. Concurrent updates of a bucket are retried.
+    '''
+
+    def __init__(self, client, keyPrefix='rate-limit:', maxAttempts=5, clock=time.time):
+        self.client = client
+        self.keyPrefix = keyPrefix
+        self.maxAttempts = maxAttempts
+        self.clock = clock
+
+    def take(self, key, rate, burst, cost=1):
+        'Takes cost tokens from the bucket of the key if it has them, returning (allowed, retryAfterSeconds)'
+        key = self.keyPrefix + key
+        # an idle bucket is full again after burst / rate seconds, so it can expire then
+        ttlSeconds = int(math.ceil(burst / rate)) + 1
+        for attempt in range(self.maxAttempts):
+            now = self.clock()
+            (value, version) = self.client.get(key)
+            (tokens, updated) = (burst, now) if value is None else (value['tokens'], value['updated'])
+            tokens = refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if self.client.compareAndSet(key, {'tokens': tokens, 'updated': now}, version, ttlSeconds):
+                return (allowed, None if allowed else retryAfter(tokens, cost, rate))
+        # too much contention on the bucket: shed the request
+        return (False, 1)
+
+
+def RateLimiter(loggerFactory, config=None, metrics=None, store=None):
+    '''
+    Limits the rate of the requests of each organization with a token bucket, so that a tenant cannot starve the
+    others. The "rate" (tokens per second) and "burst" (bucket size) of an organization come from the "limits" of the
+    roles of the principal, the highest rate winning, or from the "default" limit; the principals with one of the
+    "exemptRoles" (ROLE_ADMIN by default) are not limited. A request over the limit raises TOO_MANY_REQUESTS with the
+    seconds to wait in retryAfter. Disabled unless "enabled" is true.
+    '''
+
+    config = config or {}
+    enabled = config.get('enabled', False)
+    limits = config.get('limits') or {}
+    defaultLimit = config.get('default')
+    exemptRoles = set(config.get('exemptRoles', ['ROLE_ADMIN']))
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    store = store or LocalTokenBucketStore()
+
+    def getLimit(roles):
+        roleLimits = [limits[role] for role in roles if role in limits]
+        if roleLimits:
+            return max(roleLimits, key=lambda limit: limit['rate'])
+        return defaultLimit
+
+    class Service:
+        def check(self, principal, cost=1):
+            'Takes cost tokens from the bucket of the organization of the principal, raising TOO_MANY_REQUESTS if empty'
+            if not enabled:
+                return
+            roles = getattr(principal, 'roles', ())
+            if exemptRoles.intersection(roles):
+                return
+            limit = getLimit(roles)
+            if limit is None:
+                return
+            organizationId = principal.organizationId
+            (allowed, retryAfterSeconds) = store.take(organizationId, limit['rate'], limit['burst'], cost)
+            if not allowed:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('check(): organization %s is over its rate limit', organizationId)
+                metrics.count('RateLimited')
+                raise NspError(
+                    NspError.TOO_MANY_REQUESTS,
+                    'Too many requests of organization "{0}"'.format(organizationId),
+                    retryAfter=retryAfterSeconds
+                )
+
+    return Service()
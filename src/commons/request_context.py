@@ -0,0 +1,54 @@
+import logging
+import threading
+
+try:
+    import contextvars
+except ImportError:  # Python < 3.7
+    contextvars = None
+
+TRACE_HEADER = 'X-Amzn-Trace-Id'
+
+
+class ThreadLocalVar:
+    '''
+    Minimal stand-in for contextvars.ContextVar on interpreters that lack it (Python < 3.7). Its values are per thread,
+    so the asyncio tasks of a thread share them: the request context, deadline and metrics of concurrent tasks are
+    only kept apart from Python 3.7.
+    '''
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+        self.local = threading.local()
+
+    def get(self):
+        return getattr(self.local, 'value', self.default)
+
+    def set(self, value):
+        self.local.value = value
+
+
+currentRequestContext = (contextvars.ContextVar if contextvars else ThreadLocalVar)('requestContext', default={})
+
+
+def setRequestContext(**values):
+    'Starts a new request context, dropping the None values'
+    currentRequestContext.set({key: value for (key, value) in values.items() if value is not None})
+
+
+def getRequestContext():
+    return currentRequestContext.get()
+
+
+def clearRequestContext():
+    currentRequestContext.set({})
+
+
+class RequestContextFilter(logging.Filter):
+    'Attaches the values of the current request context (requestId, traceId, ...) to the log records'
+
+    def filter(self, record):
+        for (key, value) in currentRequestContext.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
@@ -0,0 +1,49 @@
+import logging
+
+from src.commons.metrics import Metrics
+from src.commons.pool import Pool
+
+
+def ResourceManager(loggerFactory, config=None, metrics=None):
+    '''
+    Owns the resources of an execution environment, shared by the requests it serves: the pools, configured by name
+    under "pools", and the close functions of any other resource. close() closes them all, the most recent first,
+    when the environment shuts down.
+    '''
+
+    config = config or {}
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    pools = {}
+    closeables = []
+
+    class Service:
+        def pool(self, name, create, close=None, check=None):
+            'Returns the pool with the given name, creating and filling it to its minSize on the first call'
+            if name not in pools:
+                pool = Pool(loggerFactory, name, create, close, check, (config.get('pools') or {}).get(name), metrics)
+                pool.fill()
+                pools[name] = pool
+                closeables.append(pool.close)
+            return pools[name]
+
+        def register(self, close):
+            'Registers the function closing a resource, to be called by close()'
+            closeables.append(close)
+
+        def stats(self):
+            'Returns the stats of each pool by name'
+            return {name: pool.stats() for (name, pool) in pools.items()}
+
+        def close(self):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('close(): pools=%s', self.stats())
+            while closeables:
+                close = closeables.pop()
+                try:
+                    close()
+                except Exception as error:
+                    logger.warn('close(): cannot close a resource: %s', error)
+            pools.clear()
+
+    return Service()
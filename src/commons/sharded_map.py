@@ -0,0 +1,69 @@
+import threading
+from contextlib import ExitStack
+
+
+class ShardedMap:
+    '''
+    Dict split in shards by the hash of the keys, each with its own lock, so that threads reading and writing different
+    keys rarely contend. The single key operations are atomic; lock(key) returns the lock of the shard of a key, to make
+    a sequence of operations on it atomic. Iterations see a point in time copy of the keys or values of each shard.
+    '''
+
+    def __init__(self, shards=16, items=()):
+        self.shards = [{} for i in range(shards)]
+        self.locks = [threading.RLock() for i in range(shards)]
+        for (key, value) in items:
+            self[key] = value
+
+    def shard(self, key):
+        return hash(key) % len(self.shards)
+
+    def lock(self, key):
+        return self.locks[self.shard(key)]
+
+    def lockAll(self):
+        'Returns a context manager holding the locks of all the shards, taken in order so that it cannot deadlock'
+        stack = ExitStack()
+        for lock in self.locks:
+            stack.enter_context(lock)
+        return stack
+
+    def get(self, key, default=None):
+        return self.shards[self.shard(key)].get(key, default)
+
+    def __getitem__(self, key):
+        return self.shards[self.shard(key)][key]
+
+    def __setitem__(self, key, value):
+        i = self.shard(key)
+        with self.locks[i]:
+            self.shards[i][key] = value
+
+    def pop(self, key, *default):
+        i = self.shard(key)
+        with self.locks[i]:
+            return self.shards[i].pop(key, *default)
+
+    def __contains__(self, key):
+        return key in self.shards[self.shard(key)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __iter__(self):
+        for (lock, shard) in zip(self.locks, self.shards):
+            with lock:
+                keys = list(shard)
+            yield from keys
+
+    def values(self):
+        for (lock, shard) in zip(self.locks, self.shards):
+            with lock:
+                values = list(shard.values())
+            yield from values
+
+    def items(self):
+        for (lock, shard) in zip(self.locks, self.shards):
+            with lock:
+                items = list(shard.items())
+            yield from items
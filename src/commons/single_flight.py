@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from collections import Counter
+
+from src.commons.deadline import getDeadline
+
+
+class Call:
+    'In-flight call of a SingleFlight, with the result or the error it ended with once done'
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightStats:
+    '''
+    Counters of the calls of a single flight and of the calls that shared the result of another one in flight, also
+    per key for the maxKeys busiest keys seen since the last overflow
+    '''
+
+    def __init__(self, maxKeys=1000):
+        self.maxKeys = maxKeys
+        self.calls = 0
+        self.shared = 0
+        self.sharedByKey = Counter()
+
+    def record(self, key, shared):
+        self.calls += 1
+        if shared:
+            self.shared += 1
+            if key not in self.sharedByKey and len(self.sharedByKey) >= self.maxKeys:
+                self.sharedByKey.clear()
+            self.sharedByKey[key] += 1
+
+    def stats(self, hotKeys=10):
+        return {'calls': self.calls, 'shared': self.shared, 'hotKeys': self.sharedByKey.most_common(hotKeys)}
+
+
+class SingleFlight:
+    '''
+    Runs at most one call of a function per key at a time across threads: the threads calling do() with the key of a
+    call in flight wait for it and share its result, or its error, instead of calling the function again.
+    '''
+
+    def __init__(self, maxKeys=1000):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.counters = SingleFlightStats(maxKeys)
+
+    def do(self, key, function):
+        'Returns (result of function(), whether it was shared with another call in flight)'
+        with self.lock:
+            call = self.calls.get(key)
+            shared = call is not None
+            if not shared:
+                call = self.calls[key] = Call()
+            self.counters.record(key, shared)
+        if shared:
+            deadline = getDeadline()
+            if not call.done.wait(None if deadline is None else deadline.timeout()):
+                raise deadline.exceeded('shared call')
+            if call.error is not None:
+                raise call.error
+            return (call.result, True)
+        try:
+            call.result = function()
+            return (call.result, False)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self, hotKeys=10):
+        with self.lock:
+            return self.counters.stats(hotKeys)
+
+
+class AsyncSingleFlight:
+    '''
+    Runs at most one call of a coroutine function per key at a time on an event loop: the coroutines calling do() with
+    the key of a call in flight await it and share its result. The shared call is not cancelled with its callers.
+    '''
+
+    def __init__(self, maxKeys=1000):
+        self.calls = {}
+        self.counters = SingleFlightStats(maxKeys)
+
+    async def do(self, key, function):
+        'Returns (result of await function(), whether it was shared with another call in flight)'
+        future = self.calls.get(key)
+        shared = future is not None
+        self.counters.record(key, shared)
+        if not shared:
+            future = self.calls[key] = asyncio.ensure_future(function())
+            future.add_done_callback(lambda future: self.calls.pop(key, None))
+        return (await asyncio.shield(future), shared)
+
+    def stats(self, hotKeys=10):
+        return self.counters.stats(hotKeys)
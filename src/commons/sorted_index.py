@@ -0,0 +1,74 @@
+import bisect
+from itertools import islice
+
+MAX_CHARACTER = '\U0010ffff'
+
+
+class SortedIndex:
+    '''
+    Keeps the (key, uuid) entries of a set of entities sorted by key, both for all the entities and per owner, so that
+    ranges and pages can be found with a binary search
+    '''
+
+    def __init__(self, keyFunction):
+        self.keyFunction = keyFunction
+        self.all = []
+        self.byOwner = {}
+
+    def entries(self, owner):
+        'Returns the sorted entries of the owner, or of all the entities if owner is None'
+        return self.all if owner is None else self.byOwner.get(owner, [])
+
+    def add(self, entity):
+        entry = (self.keyFunction(entity), entity['uuid'])
+        bisect.insort(self.all, entry)
+        bisect.insort(self.byOwner.setdefault(entity.get('owner'), []), entry)
+
+    def addAll(self, entities):
+        'Adds many entities at once, sorting the entries once instead of inserting them one by one'
+        for entity in entities:
+            entry = (self.keyFunction(entity), entity['uuid'])
+            self.all.append(entry)
+            self.byOwner.setdefault(entity.get('owner'), []).append(entry)
+        self.all.sort()
+        for entries in self.byOwner.values():
+            entries.sort()
+
+    def remove(self, entity):
+        entry = (self.keyFunction(entity), entity['uuid'])
+        for entries in (self.all, self.byOwner.get(entity.get('owner'), [])):
+            i = bisect.bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+        if not self.byOwner.get(entity.get('owner'), True):
+            del self.byOwner[entity.get('owner')]
+
+    def range(self, owner, low=None, high=None):
+        'Returns the positions of the first entry with key >= low and of the first entry with key >= high'
+        entries = self.entries(owner)
+        start = 0 if low is None else bisect.bisect_left(entries, (low,))
+        stop = len(entries) if high is None else bisect.bisect_left(entries, (high,))
+        return (start, stop)
+
+    def entriesAfter(self, owner, low, uuid=MAX_CHARACTER):
+        '''
+        Iterates over the entries of the owner (of all the entities if None) with key > low, or with key == low and a
+        uuid > the given one, to resume after an entry
+        '''
+        entries = self.entries(owner)
+        return islice(entries, bisect.bisect_right(entries, (low, uuid)), None)
+
+    def prefixRange(self, owner, prefix):
+        'Returns the positions delimiting the entries whose string key starts with prefix'
+        return self.range(owner, prefix, prefix + MAX_CHARACTER)
+
+    def page(self, owner, start, stop, offset=0, limit=None, descending=False):
+        'Returns the uuids of a page of the entries between the start and stop positions, in either order'
+        entries = self.entries(owner)
+        if descending:
+            stop -= offset
+            start = start if limit is None else max(start, stop - limit)
+            return [uuid for (key, uuid) in reversed(entries[start:max(start, stop)])]
+        start += offset
+        stop = stop if limit is None else min(stop, start + limit)
+        return [uuid for (key, uuid) in entries[start:stop]]
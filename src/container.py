@@ -1,5 +1,6 @@
+import atexit
 import logging
-import logging.config
+import time
 
 import dependency_injector.containers as containers
 import dependency_injector.providers as providers
@@ -7,26 +8,113 @@ import dependency_injector.providers as providers
 from src.commons.api_gateway import APIGateway
 
 from src.commons.config import loadConfig
+from src.commons.deadline import Deadlines
+from src.commons.error_reporter import ErrorReporter
+from src.commons.idempotency_store import createIdempotencyStore
+from src.commons.log import configureLogging
+from src.commons.metrics import Metrics
+from src.commons.policy import Policy
+from src.commons.profiler import Profiler
+from src.commons.rate_limiter import LocalTokenBucketStore, RateLimiter
+from src.commons.resource_manager import ResourceManager
+from src.thing.async_authorizer import AsyncAuthorizer as AsyncThingAuthorizer
+from src.thing.async_lambda_mapper import AsyncLambdaMapper as AsyncThingLambdaMapper
+from src.thing.async_logic import AsyncLogic as AsyncThingLogic
+from src.thing.async_repository import AsyncRepository as AsyncThingRepository
 from src.thing.lambda_mapper import LambdaMapper as ThingLambdaMapper
+from src.thing.authorizer import ACTIONS as THING_ACTIONS
+from src.thing.authorizer import DEFAULT_ROLES as THING_DEFAULT_ROLES
 from src.thing.authorizer import Authorizer as ThingAuthorizer
+from src.thing.coalescing_repository import AsyncCoalescingRepository as AsyncCoalescingThingRepository
+from src.thing.coalescing_repository import CoalescingRepository as CoalescingThingRepository
 from src.thing.logic import Logic as ThingLogic
 from src.thing.repository import Repository as ThingRepository
 
 
+currentContainer = None
+
+
+def managed(resourceManager, resource):
+    'Registers resource.close() with the resource manager, returning the resource'
+    resourceManager.register(resource.close)
+    return resource
+
+
 def Container():
+    start = time.perf_counter()
+
     class Cont(containers.DeclarativeContainer):
         config = providers.Configuration('config')
+        logPipeline = None
         loggerFactory = providers.DelegatedFactory(logging.getLogger)
-        apiGatewayFactory = providers.DelegatedFactory(APIGateway, loggerFactory)
-        thingRepository = providers.Singleton(ThingRepository, loggerFactory)
-        thingLogic = providers.Singleton(ThingLogic, loggerFactory, thingRepository)
-        thingAuthorizer = providers.Singleton(ThingAuthorizer, loggerFactory, thingLogic)
-        thingLambdaMapper = providers.Singleton(ThingLambdaMapper, loggerFactory, apiGatewayFactory, thingAuthorizer)
+        metrics = providers.Singleton(Metrics, loggerFactory, config.metrics)
+        profiler = providers.Singleton(Profiler, loggerFactory, config.profiling)
+        errorReporter = providers.Singleton(ErrorReporter, loggerFactory, config.errors, metrics)
+        deadlines = providers.Singleton(Deadlines, loggerFactory, config.deadline, metrics)
+        rateLimitStore = providers.Singleton(LocalTokenBucketStore)
+        rateLimiter = providers.Singleton(RateLimiter, loggerFactory, config.rateLimit, metrics, rateLimitStore)
+        idempotencyStore = providers.Singleton(createIdempotencyStore, config.idempotency)
+        apiGatewayFactory = providers.DelegatedFactory(APIGateway, loggerFactory, errorReporter=errorReporter)
+        resourceManager = providers.Singleton(ResourceManager, loggerFactory, config.resources, metrics)
+        thingRepository = providers.Singleton(
+            managed, resourceManager, providers.Factory(ThingRepository, loggerFactory, metrics, config.repository)
+        )
+        coalescingThingRepository = providers.Singleton(
+            CoalescingThingRepository, loggerFactory, thingRepository, config.coalescing, metrics
+        )
+        thingLogic = providers.Singleton(ThingLogic, loggerFactory, coalescingThingRepository, metrics)
+        thingPolicy = providers.Singleton(
+            Policy, loggerFactory, THING_ACTIONS, config.authorization, THING_DEFAULT_ROLES
+        )
+        thingAuthorizer = providers.Singleton(
+            ThingAuthorizer, loggerFactory, thingLogic, metrics, rateLimiter, thingPolicy
+        )
+        thingLambdaMapper = providers.Singleton(
+            ThingLambdaMapper, loggerFactory, apiGatewayFactory, thingAuthorizer, metrics, deadlines, idempotencyStore
+        )
+        asyncThingRepository = providers.Singleton(
+            AsyncThingRepository, loggerFactory, thingRepository, metrics=metrics
+        )
+        asyncCoalescingThingRepository = providers.Singleton(
+            AsyncCoalescingThingRepository, loggerFactory, asyncThingRepository, config.coalescing, metrics
+        )
+        asyncThingLogic = providers.Singleton(AsyncThingLogic, loggerFactory, asyncCoalescingThingRepository, metrics)
+        asyncThingAuthorizer = providers.Singleton(
+            AsyncThingAuthorizer, loggerFactory, asyncThingLogic, metrics, rateLimiter, thingPolicy
+        )
+        asyncThingLambdaMapper = providers.Singleton(
+            AsyncThingLambdaMapper, loggerFactory, apiGatewayFactory, asyncThingAuthorizer, metrics, deadlines,
+            idempotencyStore
+        )
+
+        def flush():
+            'Completes the work of a request: makes its writes durable and its logs written'
+            Cont.thingRepository().flush()
+            if Cont.logPipeline is not None:
+                Cont.logPipeline.flush()
 
         def shutdown():
-            pass
+            'Closes the resources of the execution environment'
+            Cont.flush()
+            Cont.resourceManager().close()
+            if Cont.logPipeline is not None:
+                Cont.logPipeline.stop()
+                Cont.logPipeline = None
 
     configDict = loadConfig()
     Cont.config.update(configDict)
-    logging.config.dictConfig(Cont.config.logging())
+    Cont.logPipeline = configureLogging(Cont.config.logging(), Cont.config.loggingQueue())
+    Cont.metrics().record('container', (time.perf_counter() - start) * 1000)
     return Cont
+
+
+def getContainer():
+    '''
+    Returns the container of the execution environment, creating it on the first call, so that the warm invocations
+    reuse its services and resources; it is shut down when the process exits
+    '''
+    global currentContainer
+    if currentContainer is None:
+        currentContainer = Container()
+        atexit.register(currentContainer.shutdown)
+    return currentContainer
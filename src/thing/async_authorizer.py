@@ -0,0 +1,97 @@
+import logging
+
+from src.commons.metrics import Metrics
+from src.commons.policy import Policy
+from src.commons.rate_limiter import RateLimiter
+from src.thing.authorizer import ACTIONS, DEFAULT_ROLES
+
+
+def AsyncAuthorizer(loggerFactory, logic, metrics=None, rateLimiter=None, policy=None):
+    '''
+    Asynchronous counterpart of Authorizer over an AsyncLogic, with the same authorization policy, ownership and
+    rate limiting rules
+    '''
+
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    rateLimiter = rateLimiter or RateLimiter(loggerFactory, metrics=metrics)
+    policy = policy or Policy(loggerFactory, ACTIONS, defaultRoles=DEFAULT_ROLES)
+
+    class Service:
+        def authorizeCreateThing(self, principal):
+            'Checks that the principal may create things, for the requests answered without calling createThing()'
+            with metrics.stage('authorization'):
+                policy.check(principal, 'createThing')
+                rateLimiter.check(principal)
+
+        async def createThing(self, principal, thing):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): principal=%s, thing=%s', principal, thing)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'createThing')
+                rateLimiter.check(principal)
+                thing['owner'] = principal.getOwner(thing.get('owner'))
+            return await logic.createThing(principal, thing)
+
+        async def getThing(self, principal, uuid):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): principal=%s, uuid=%s', principal, uuid)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'getThing')
+                rateLimiter.check(principal)
+            return await logic.getThing(principal, uuid)
+
+        async def updateThing(self, principal, uuid, thing):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): principal=%s, uuid=%s, thing=%s', principal, uuid, thing)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'updateThing')
+                rateLimiter.check(principal)
+            return await logic.updateThing(principal, uuid, thing)
+
+        async def patchThing(self, principal, uuid, patch):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('patchThing(): principal=%s, uuid=%s, patch=%s', principal, uuid, patch)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'updateThing')
+                rateLimiter.check(principal)
+            return await logic.patchThing(principal, uuid, patch)
+
+        async def deleteThing(self, principal, uuid):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): principal=%s, uuid=%s', principal, uuid)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'deleteThing')
+                rateLimiter.check(principal)
+            return await logic.deleteThing(principal, uuid)
+
+        async def listThings(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'listThings')
+                rateLimiter.check(principal)
+                owner = principal.getOwnerFilter(owner)
+            return await logic.listThings(principal, owner, **options)
+
+        async def searchThings(self, principal, owner, query, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'searchThings(): principal=%s, owner=%s, query=%s, options=%s', principal, owner, query, options
+                )
+            with metrics.stage('authorization'):
+                policy.check(principal, 'searchThings')
+                rateLimiter.check(principal)
+                owner = principal.getOwnerFilter(owner)
+            return await logic.searchThings(principal, owner, query, **options)
+
+        async def listChanges(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'listChanges')
+                rateLimiter.check(principal)
+                owner = principal.getOwnerFilter(owner)
+            return await logic.listChanges(principal, owner, **options)
+
+    return Service()
@@ -0,0 +1,205 @@
+import logging
+
+from src.commons.deadline import Deadlines
+from src.commons.idempotency_store import IdempotencyStore
+from src.commons.metrics import Metrics
+from src.thing.lambda_mapper import (
+    PATCH_MEDIA_TYPES, getListChangesParameters, getListThingsParameters, getSearchThingsParameters, loadSchemas,
+    startIdempotentRequest
+)
+
+
+def AsyncLambdaMapper(
+    loggerFactory, apiGatewayFactory, authorizer, metrics=None, deadlines=None, idempotencyStore=None
+):
+    '''
+    Asynchronous counterpart of LambdaMapper over an AsyncAuthorizer, with the same validation and responses, so that
+    a long-lived server can multiplex many in-flight requests on one event loop. Each request run as its own task
+    collects and flushes its own metrics, and has its own deadline and request context, from Python 3.7 only: before,
+    the context variables fall back to thread locals shared by the tasks of the loop.
+    '''
+
+    (thingCreateSchema, thingUpdateSchema, thingPatchSchema) = loadSchemas()
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    deadlines = deadlines or Deadlines(loggerFactory, metrics=metrics)
+    idempotencyStore = idempotencyStore or IdempotencyStore()
+
+    class Service:
+        async def createThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            idempotencyKey = None
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                (idempotencyKey, replay) = startIdempotentRequest(
+                    apiGateway, idempotencyStore, principal, authorizer.authorizeCreateThing
+                )
+                if replay is not None:
+                    metrics.count('IdempotentReplays')
+                    return replay
+                with metrics.stage('validation'):
+                    thing = apiGateway.getAndValidateEntity(thingCreateSchema, 'thing')
+                result = await authorizer.createThing(principal, thing)
+                with metrics.stage('serialization'):
+                    response = apiGateway.createResponse(
+                        statusCode=201,
+                        headers=apiGateway.createLocationHeader(result['uuid']),
+                        body=result
+                    )
+                if idempotencyKey is not None:
+                    idempotencyStore.complete(idempotencyKey, response)
+                return response
+            except Exception as error:
+                if idempotencyKey is not None:
+                    idempotencyStore.release(idempotencyKey)
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('createThing')
+
+        async def getThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
+                result = await authorizer.getThing(principal, uuid)
+                with metrics.stage('serialization'):
+                    if apiGateway.wasModifiedSince(result):
+                        return apiGateway.createResponse(
+                            body=result,
+                            headers=apiGateway.createLastModifiedHeader(result)
+                        )
+                    else:
+                        return apiGateway.createResponse(statusCode=304)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('getThing')
+
+        async def updateThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
+                    thing = apiGateway.getAndValidateEntity(thingUpdateSchema, 'thing')
+                result = await authorizer.updateThing(principal, uuid, thing)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('updateThing')
+
+        async def patchThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('patchThing(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
+                    patch = apiGateway.getAndValidateEntity(thingPatchSchema, 'thing patch', PATCH_MEDIA_TYPES)
+                result = await authorizer.patchThing(principal, uuid, patch)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('patchThing')
+
+        async def deleteThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
+                await authorizer.deleteThing(principal, uuid)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(statusCode=204)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('deleteThing')
+
+        async def listThings(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    (owner, options) = getListThingsParameters(apiGateway)
+                result = await authorizer.listThings(principal, owner, **options)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('listThings')
+
+        async def searchThings(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('searchThings(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    (owner, query, options) = getSearchThingsParameters(apiGateway)
+                result = await authorizer.searchThings(principal, owner, query, **options)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('searchThings')
+
+        async def listChanges(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    (owner, options) = getListChangesParameters(apiGateway)
+                result = await authorizer.listChanges(principal, owner, **options)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('listChanges')
+
+    return Service()
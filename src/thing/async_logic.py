@@ -0,0 +1,83 @@
+import logging
+from datetime import datetime
+
+import src.commons.jsonutils as jsonutils
+from src.commons.metrics import Metrics
+from src.thing.logic import checkDelete, checkThing, checkUpdate, isUnchanged, prepareCreate
+
+
+def AsyncLogic(loggerFactory, repository, metrics=None):
+    '''
+    Asynchronous counterpart of Logic over an AsyncRepository, with the same rules. The "logic" stage only times the
+    code between the awaits, since the time spent waiting belongs to the other requests multiplexed on the loop.
+    '''
+
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+
+    async def getAndCheckThing(principal, uuid):
+        thing = await repository.getThing(uuid)
+        with metrics.stage('logic'):
+            return checkThing(principal, uuid, thing)
+
+    async def writeUpdate(principal, thing, newThing):
+        with metrics.stage('logic'):
+            checkUpdate(principal, thing, newThing)
+            if isUnchanged(thing, newThing):
+                metrics.count('SkippedWrites')
+                return thing
+            newThing['lastModified'] = datetime.now()
+        return await repository.updateThing(newThing, expectedLastModified=thing['lastModified'])
+
+    class Service:
+        async def createThing(self, principal, thing):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): principal=%s, thing=%s', principal, thing)
+            exists = thing.get('uuid') is not None and await repository.getThing(thing['uuid']) is not None
+            with metrics.stage('logic'):
+                prepareCreate(principal, thing, exists, datetime.now())
+            return await repository.createThing(thing)
+
+        async def getThing(self, principal, uuid):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): principal=%s, uuid=%s', principal, uuid)
+            return await getAndCheckThing(principal, uuid)
+
+        async def updateThing(self, principal, uuid, newThing):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): principal=%s, uuid=%s, thing=%s', principal, uuid, newThing)
+            thing = await getAndCheckThing(principal, uuid)
+            return await writeUpdate(principal, thing, newThing)
+
+        async def patchThing(self, principal, uuid, patch):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('patchThing(): principal=%s, uuid=%s, patch=%s', principal, uuid, patch)
+            thing = await getAndCheckThing(principal, uuid)
+            return await writeUpdate(principal, thing, jsonutils.mergePatch(thing, patch))
+
+        async def deleteThing(self, principal, uuid):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): principal=%s, uuid=%s', principal, uuid)
+            thing = await getAndCheckThing(principal, uuid)
+            with metrics.stage('logic'):
+                checkDelete(principal, thing)
+            return await repository.deleteThing(uuid)
+
+        async def listThings(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            return await repository.listThings(owner, **options)
+
+        async def searchThings(self, principal, owner, query, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'searchThings(): principal=%s, owner=%s, query=%s, options=%s', principal, owner, query, options
+                )
+            return await repository.searchThings(owner, query, **options)
+
+        async def listChanges(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            return await repository.listChanges(owner, **options)
+
+    return Service()
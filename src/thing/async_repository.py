@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from functools import partial
+
+from src.commons.deadline import getDeadline
+from src.commons.metrics import Metrics
+
+
+def AsyncRepository(loggerFactory, repository, executor=None, metrics=None):
+    '''
+    Asynchronous interface of a thing repository, for the asyncio request path. The calls of the wrapped synchronous
+    repository run inline, which suits the in-memory repository since it never waits; with an executor they run in
+    it instead, so that a repository blocking on I/O does not block the event loop, and the wait is limited by the
+    deadline of the request. A natively asynchronous backend implements the same coroutines directly.
+    '''
+
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+
+    async def call(method, *pargs, **kwargs):
+        if executor is None:
+            return method(*pargs, **kwargs)
+        future = asyncio.get_event_loop().run_in_executor(executor, partial(method, *pargs, **kwargs))
+        deadline = getDeadline()
+        if deadline is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, deadline.timeout())
+        except asyncio.TimeoutError:
+            raise deadline.exceeded('repository call')
+
+    class Service:
+        async def createThing(self, thing):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): thing=%s', thing)
+            return await call(repository.createThing, thing)
+
+        async def getThing(self, uuid):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): uuid=%s', uuid)
+            return await call(repository.getThing, uuid)
+
+        async def updateThing(self, thing, expectedLastModified=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): thing=%s, expectedLastModified=%s', thing, expectedLastModified)
+            return await call(repository.updateThing, thing, expectedLastModified=expectedLastModified)
+
+        async def deleteThing(self, uuid):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): uuid=%s', uuid)
+            return await call(repository.deleteThing, uuid)
+
+        async def listThings(self, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): owner=%s, options=%s', owner, options)
+            return await call(repository.listThings, owner, **options)
+
+        async def searchThings(self, owner, query, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('searchThings(): owner=%s, query=%s, options=%s', owner, query, options)
+            return await call(repository.searchThings, owner, query, **options)
+
+        async def listChanges(self, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): owner=%s, options=%s', owner, options)
+            return await call(repository.listChanges, owner, **options)
+
+    return Service()
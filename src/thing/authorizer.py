@@ -1,38 +1,151 @@
 import logging
 
+from src.commons.metrics import Metrics
 from src.commons.nsp_error import NspError
+from src.commons.policy import Policy
+from src.commons.rate_limiter import RateLimiter
 
+# The actions of the authorization policy of things, with their descriptions in the FORBIDDEN messages
+ACTIONS = {
+    'createThing': 'create things',
+    'getThing': 'get things',
+    'updateThing': 'update things',
+    'deleteThing': 'delete things',
+    'listThings': 'list things',
+    'searchThings': 'search things',
+    'listChanges': 'list changes',
+    'exportThings': 'export things'
+}
+# The roles of the policy when the config declares none
+DEFAULT_ROLES = {
+    'ROLE_ADMIN': ['*'],
+    'ROLE_THING_USER': [
+        'createThing', 'getThing', 'updateThing', 'deleteThing', 'listThings', 'searchThings', 'listChanges'
+    ]
+}
 
-def Authorizer(loggerFactory, logic):
+
+def Authorizer(loggerFactory, logic, metrics=None, rateLimiter=None, policy=None):
+    '''
+    Checks that the principal is permitted the action by the policy and within its rate limit, and applies the
+    ownership rules, before calling the logic. Importing things is the createThing action.
+    '''
 
     logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    rateLimiter = rateLimiter or RateLimiter(loggerFactory, metrics=metrics)
+    policy = policy or Policy(loggerFactory, ACTIONS, defaultRoles=DEFAULT_ROLES)
 
     class Service:
+        def authorizeCreateThing(self, principal):
+            'Checks that the principal may create things, for the requests answered without calling createThing()'
+            with metrics.stage('authorization'):
+                policy.check(principal, 'createThing')
+                rateLimiter.check(principal)
+
         def createThing(self, principal, thing):
-            logger.debug('createThing(): principal=%s, thing=%s', principal, thing)
-            principal.checkAuthorization({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'create things')
-            thing['owner'] = principal.getOwner(thing.get('owner'))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): principal=%s, thing=%s', principal, thing)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'createThing')
+                rateLimiter.check(principal)
+                thing['owner'] = principal.getOwner(thing.get('owner'))
             return logic.createThing(principal, thing)
 
         def getThing(self, principal, uuid):
-            logger.debug('getThing(): principal=%s, uuid=%s', principal, uuid)
-            principal.checkAuthorization({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'get things')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): principal=%s, uuid=%s', principal, uuid)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'getThing')
+                rateLimiter.check(principal)
             return logic.getThing(principal, uuid)
 
         def updateThing(self, principal, uuid, thing):
-            logger.debug('updateThing(): principal=%s, uuid=%s, thing=%s', principal, uuid, thing)
-            principal.checkAuthorization({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'update things')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): principal=%s, uuid=%s, thing=%s', principal, uuid, thing)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'updateThing')
+                rateLimiter.check(principal)
             return logic.updateThing(principal, uuid, thing)
 
+        def patchThing(self, principal, uuid, patch):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('patchThing(): principal=%s, uuid=%s, patch=%s', principal, uuid, patch)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'updateThing')
+                rateLimiter.check(principal)
+            return logic.patchThing(principal, uuid, patch)
+
         def deleteThing(self, principal, uuid):
-            logger.debug('deleteThing(): principal=%s, uuid=%s', principal, uuid)
-            principal.checkAuthorization({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'delete things')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): principal=%s, uuid=%s', principal, uuid)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'deleteThing')
+                rateLimiter.check(principal)
             return logic.deleteThing(principal, uuid)
 
-        def listThings(self, principal, owner):
-            logger.debug('listThings(): principal=%s, owner=%s', principal, owner)
-            principal.checkAuthorization({'ROLE_ADMIN', 'ROLE_THING_USER'}, 'list things')
-            owner = principal.getOwnerFilter(owner)
-            return logic.listThings(principal, owner)
+        def listThings(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'listThings')
+                rateLimiter.check(principal)
+                owner = principal.getOwnerFilter(owner)
+            return logic.listThings(principal, owner, **options)
+
+        def searchThings(self, principal, owner, query, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'searchThings(): principal=%s, owner=%s, query=%s, options=%s', principal, owner, query, options
+                )
+            with metrics.stage('authorization'):
+                policy.check(principal, 'searchThings')
+                rateLimiter.check(principal)
+                owner = principal.getOwnerFilter(owner)
+            return logic.searchThings(principal, owner, query, **options)
+
+        def listChanges(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'listChanges')
+                rateLimiter.check(principal)
+                owner = principal.getOwnerFilter(owner)
+            return logic.listChanges(principal, owner, **options)
+
+        def importThings(self, principal, things):
+            '''
+            Returns a list with the created thing or the NspError of each thing, applying the ownership rules of
+            createThing to each. A thing without owner imported by a principal without organization, like an admin,
+            gets THING_UNPROCESSABLE, since no one but the admins could see it.
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('importThings(): principal=%s, things=%d', principal, len(things))
+            results = [None] * len(things)
+            accepted = []
+            with metrics.stage('authorization'):
+                policy.check(principal, 'createThing')
+                rateLimiter.check(principal)
+                for (i, thing) in enumerate(things):
+                    try:
+                        thing['owner'] = principal.getOwner(thing.get('owner'))
+                    except NspError as error:
+                        results[i] = error
+                        continue
+                    if thing['owner'] is None:
+                        results[i] = NspError(NspError.THING_UNPROCESSABLE, 'Thing has no owner')
+                        continue
+                    accepted.append(i)
+            for (i, result) in zip(accepted, logic.importThings(principal, [things[i] for i in accepted])):
+                results[i] = result
+            return results
+
+        def exportThings(self, principal, owner):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('exportThings(): principal=%s, owner=%s', principal, owner)
+            with metrics.stage('authorization'):
+                policy.check(principal, 'exportThings')
+                rateLimiter.check(principal)
+            return logic.exportThings(principal, owner)
 
     return Service()
@@ -0,0 +1,81 @@
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from uuid import uuid4
+
+from src.commons.nsp_error import NspError
+
+CREATE_CHANGE = 'create'
+UPDATE_CHANGE = 'update'
+DELETE_CHANGE = 'delete'
+
+
+class ChangeLog:
+    '''
+    Append-only log of the last capacity changes of the things. Every change gets the next of a monotonically increasing
+    sequence number, so that consumers can tail the log by asking for the changes after the last sequence they have
+    seen; the sequence numbers in the log are contiguous, so the first change after a sequence is found by position.
+    The log is not durable: each instance starts it over at sequence 0 with a new epoch, so that the consumers passing
+    the epoch along with their sequence learn that the changes they have not seen are lost.
+    '''
+
+    def __init__(self, capacity=10000, clock=datetime.now, epoch=None):
+        self.entries = deque(maxlen=capacity)
+        self.sequence = 0
+        self.clock = clock
+        self.epoch = epoch or uuid4().hex
+
+    def firstSequence(self):
+        'Returns the sequence number of the oldest change still in the log'
+        return self.sequence - len(self.entries) + 1
+
+    def append(self, changeType, thing, oldOwner=None):
+        '''
+        Records a change of the thing, visible to its owner, returning its sequence. If the change moved the thing away
+        from oldOwner, the old owner sees it as a delete, without the new body of the thing.
+        '''
+        self.sequence += 1
+        owner = thing.get('owner')
+        change = {
+            'sequence': self.sequence,
+            'type': changeType,
+            'uuid': thing['uuid'],
+            'owner': owner,
+            'timestamp': self.clock()
+        }
+        transfer = None
+        if oldOwner is not None and oldOwner != owner and changeType != DELETE_CHANGE:
+            transfer = dict(change, type=DELETE_CHANGE, owner=oldOwner)
+        if changeType != DELETE_CHANGE:
+            change['thing'] = thing
+        self.entries.append((owner, change, transfer))
+        return self.sequence
+
+    def after(self, owner, after=0, limit=None, epoch=None):
+        '''
+        Returns {"changes": [...], "next": sequence, "epoch": epoch} with up to limit changes visible to the owner (to
+        all the owners if None) after the given sequence, and the sequence to ask for the next ones after. Raises
+        CHANGES_EXPIRED if the changes right after the sequence are no longer in the log, if the sequence is ahead of
+        the log or if the epoch is not the one of the log, as after a restart.
+        '''
+        if (epoch is not None and epoch != self.epoch) or after > self.sequence:
+            raise NspError(
+                NspError.CHANGES_EXPIRED,
+                'Changes after sequence {0} are no longer available, the change log restarted'.format(after)
+            )
+        first = self.firstSequence()
+        if after < first - 1:
+            raise NspError(
+                NspError.CHANGES_EXPIRED,
+                'Changes after sequence {0} are no longer available, the oldest is {1}'.format(after, first)
+            )
+        changes = []
+        for (changeOwner, change, transfer) in islice(self.entries, max(0, after - first + 1), None):
+            if owner is not None and owner != changeOwner:
+                if transfer is None or owner != transfer['owner']:
+                    continue
+                change = transfer
+            if limit is not None and len(changes) == limit:
+                return {'changes': changes, 'next': changes[-1]['sequence'], 'epoch': self.epoch}
+            changes.append(change)
+        return {'changes': changes, 'next': self.sequence, 'epoch': self.epoch}
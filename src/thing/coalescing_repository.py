@@ -0,0 +1,86 @@
+import logging
+
+from src.commons.metrics import Metrics
+from src.commons.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def readKey(operation, *pargs, **options):
+    'Returns the key identifying the identical reads'
+    return (operation,) + pargs + tuple(sorted(options.items()))
+
+
+def CoalescingRepository(loggerFactory, repository, config=None, metrics=None):
+    '''
+    Wraps a thing repository so that concurrent identical getThing() and listThings() calls share one call of the
+    repository and its result, counting the shared ones in the CoalescedReads metric; the other methods are the ones
+    of the repository. Returns the repository itself unless "enabled" is true, since a single-threaded deployment has
+    nothing to coalesce.
+    '''
+
+    config = config or {}
+    if not config.get('enabled', False):
+        return repository
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    singleFlight = SingleFlight(config.get('maxKeys', 1000))
+
+    def coalesce(key, function):
+        (result, shared) = singleFlight.do(key, function)
+        if shared:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('coalesce(): shared the result of %s', key)
+            metrics.count('CoalescedReads')
+        return result
+
+    class Service:
+        def getThing(self, uuid):
+            return coalesce(readKey('getThing', uuid), lambda: repository.getThing(uuid))
+
+        def listThings(self, owner, **options):
+            return coalesce(readKey('listThings', owner, **options), lambda: repository.listThings(owner, **options))
+
+        def stats(self, hotKeys=10):
+            'Returns the counts of the reads and of the shared ones, and the keys most shared'
+            return singleFlight.stats(hotKeys)
+
+        def __getattr__(self, name):
+            return getattr(repository, name)
+
+    return Service()
+
+
+def AsyncCoalescingRepository(loggerFactory, repository, config=None, metrics=None):
+    'Asynchronous counterpart of CoalescingRepository, wrapping an AsyncRepository'
+
+    config = config or {}
+    if not config.get('enabled', False):
+        return repository
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    singleFlight = AsyncSingleFlight(config.get('maxKeys', 1000))
+
+    async def coalesce(key, function):
+        (result, shared) = await singleFlight.do(key, function)
+        if shared:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('coalesce(): shared the result of %s', key)
+            metrics.count('CoalescedReads')
+        return result
+
+    class Service:
+        async def getThing(self, uuid):
+            return await coalesce(readKey('getThing', uuid), lambda: repository.getThing(uuid))
+
+        async def listThings(self, owner, **options):
+            return await coalesce(
+                readKey('listThings', owner, **options), lambda: repository.listThings(owner, **options)
+            )
+
+        def stats(self, hotKeys=10):
+            'Returns the counts of the reads and of the shared ones, and the keys most shared'
+            return singleFlight.stats(hotKeys)
+
+        def __getattr__(self, name):
+            return getattr(repository, name)
+
+    return Service()
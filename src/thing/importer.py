@@ -0,0 +1,149 @@
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import jsonschema
+
+import src.commons.jsonutils as jsonutils
+from src.commons.metrics import Metrics
+from src.commons.nsp_error import NspError
+
+CREATE_SCHEMA_FILE_NAME = 'resources/json-schemas/thing-create.json'
+
+validator = None
+
+
+def getValidator():
+    'Returns the thing-create.json validator of the process, compiling it on the first call'
+    global validator
+    if validator is None:
+        with open(CREATE_SCHEMA_FILE_NAME) as infile:
+            schema = json.load(infile)
+        jsonschema.Draft4Validator.check_schema(schema)
+        validator = jsonschema.Draft4Validator(schema, format_checker=jsonschema.FormatChecker())
+    return validator
+
+
+def validateLines(lines):
+    '''
+    Parses and validates a batch of (lineNumber, text) NDJSON lines against thing-create.json, returning a list of
+    (lineNumber, thing, message, causes) with either the thing or the error message and causes. Runs in the worker
+    processes of the import.
+    '''
+    results = []
+    for (lineNumber, text) in lines:
+        try:
+            thing = json.loads(text)
+        except Exception as error:
+            results.append((lineNumber, None, 'Malformed thing JSON', [str(error)]))
+            continue
+        errors = [error.message for error in getValidator().iter_errors(thing)]
+        if errors:
+            results.append((lineNumber, None, 'Invalid thing', errors))
+        else:
+            jsonutils.convertDatetimeValues(thing)
+            results.append((lineNumber, thing, None, None))
+    return results
+
+
+def readBatches(lines, batchSize):
+    'Groups the non-blank lines of a file in lists of (lineNumber, text) of batchSize lines'
+    numbered = ((lineNumber, text) for (lineNumber, text) in enumerate(lines, 1) if text.strip())
+    while True:
+        batch = list(islice(numbered, batchSize))
+        if not batch:
+            return
+        yield batch
+
+
+class InProcessExecutor:
+    'Stand-in for a process pool that validates the batches in the calling process'
+
+    def submit(self, function, *args):
+        return CompletedFuture(function(*args))
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class CompletedFuture:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def Importer(loggerFactory, authorizer, metrics=None):
+    '''
+    Imports things from NDJSON lines. Batches of lines are parsed and validated in a process pool, at most
+    maxPendingBatches at a time, so that reading the input waits for the validation and the writes to keep up;
+    the valid things go through authorizer.importThings(), with the same ownership and creation rules as createThing.
+    '''
+
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+
+    class Service:
+        def importThings(self, principal, lines, batchSize=1000, workers=None, maxPendingBatches=4, onError=None):
+            '''
+            Imports the things of the lines, calling onError(lineNumber, message, causes) for each line that cannot be
+            imported, including the lines of a batch that authorizer.importThings() rejected as a whole. Returns
+            {"imported", "failed", "seconds", "thingsPerSecond"}. With workers=0 the lines are validated in the calling
+            process.
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'importThings(): principal=%s, batchSize=%s, workers=%s, maxPendingBatches=%s',
+                    principal, batchSize, workers, maxPendingBatches
+                )
+            report = {'imported': 0, 'failed': 0}
+            start = time.perf_counter()
+
+            def fail(lineNumber, message, causes):
+                report['failed'] += 1
+                if onError is not None:
+                    onError(lineNumber, message, causes)
+
+            def write(results):
+                valid = []
+                for (lineNumber, thing, message, causes) in results:
+                    if thing is None:
+                        fail(lineNumber, message, causes)
+                    else:
+                        valid.append((lineNumber, thing))
+                if not valid:
+                    return
+                with metrics.stage('import'):
+                    try:
+                        created = authorizer.importThings(principal, [thing for (lineNumber, thing) in valid])
+                    except NspError as error:
+                        # the whole batch failed, like on TOO_MANY_REQUESTS: the earlier batches stay imported
+                        created = [error] * len(valid)
+                for ((lineNumber, thing), result) in zip(valid, created):
+                    if isinstance(result, Exception):
+                        fail(lineNumber, str(result), getattr(result, 'causes', []))
+                    else:
+                        report['imported'] += 1
+
+            executor = InProcessExecutor() if workers == 0 else ProcessPoolExecutor(workers)
+            try:
+                pending = deque()
+                for batch in readBatches(lines, batchSize):
+                    pending.append(executor.submit(validateLines, batch))
+                    if len(pending) >= maxPendingBatches:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+            finally:
+                executor.shutdown()
+            report['seconds'] = time.perf_counter() - start
+            report['thingsPerSecond'] = report['imported'] / report['seconds'] if report['seconds'] else 0
+            metrics.count('ImportedThings', report['imported'])
+            metrics.count('FailedThings', report['failed'])
+            return report
+
+    return Service()
@@ -1,83 +1,344 @@
+import hashlib
 import json
 import logging
+import re
 
+from src.commons.api_gateway import APPLICATION_JSON, APPLICATION_MERGE_PATCH_JSON
+from src.commons.http_error import HttpError
+from src.commons.jsonutils import ISO_DATETIME_MATCHER, json2datetime
+from src.commons.deadline import Deadlines
+from src.commons.idempotency_store import IdempotencyStore
+from src.commons.metrics import Metrics
+from src.thing.repository import SORT_FIELDS, parseSort
+from src.thing.search_index import AND_OPERATOR, OR_OPERATOR
 
-def LambdaMapper(loggerFactory, apiGatewayFactory, authorizer):
+NON_NEGATIVE_INTEGER_MATCHER = re.compile('^[0-9]+$')
+CREATE_SCHEMA_FILE_NAME = 'resources/json-schemas/thing-create.json'
+UPDATE_SCHEMA_FILE_NAME = 'resources/json-schemas/thing-update.json'
+PATCH_SCHEMA_FILE_NAME = 'resources/json-schemas/thing-patch.json'
+# merge patches are also accepted as plain JSON, for the clients that cannot set their media type
+PATCH_MEDIA_TYPES = (APPLICATION_MERGE_PATCH_JSON, APPLICATION_JSON)
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENT_REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
 
-    CREATE_SCHEMA_FILE_NAME = 'resources/json-schemas/thing-create.json'
-    UPDATE_SCHEMA_FILE_NAME = 'resources/json-schemas/thing-update.json'
 
+def validateNonNegativeInteger(value):
+    if value is not None and not NON_NEGATIVE_INTEGER_MATCHER.match(value):
+        raise ValueError('"{0}" is not a non-negative integer'.format(value))
+
+
+def validatePositiveInteger(value):
+    validateNonNegativeInteger(value)
+    if value is not None and int(value) == 0:
+        raise ValueError('"{0}" is not a positive integer'.format(value))
+
+
+def validateSearchOperator(value):
+    if value is not None and value not in (AND_OPERATOR, OR_OPERATOR):
+        raise ValueError('"{0}" is not one of "{1}", "{2}"'.format(value, AND_OPERATOR, OR_OPERATOR))
+
+
+def validateSort(value):
+    if value is not None and parseSort(value)[0] not in SORT_FIELDS:
+        raise ValueError('"{0}" is not one of {1}, optionally prefixed by "-"'.format(
+            value, ', '.join('"{0}"'.format(field) for field in SORT_FIELDS)
+        ))
+
+
+def validateDatetime(value):
+    if value is None:
+        return
+    if ISO_DATETIME_MATCHER.match(value):
+        try:
+            json2datetime(value)
+            return
+        except (ValueError, OverflowError):
+            pass
+    raise ValueError('"{0}" is not an ISO 8601 datetime with timezone'.format(value))
+
+
+def validateIdempotencyKey(value):
+    if value is not None and not 0 < len(value) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError('"{0}" is not a string of 1 to {1} characters'.format(value, MAX_IDEMPOTENCY_KEY_LENGTH))
+
+
+def startIdempotentRequest(apiGateway, idempotencyStore, principal, authorize):
+    '''
+    Returns the key of the request in the idempotency store, scoped by the organization of the principal, and the
+    response to replay if the request was already served; (None, None) without an Idempotency-Key header. Raises 422
+    if the key was used with another body, and 409 while the request with the key is in flight. The requests answered
+    from the store are authorized with authorize(principal) first, since they do not reach the authorizer.
+    '''
+    idempotencyKey = apiGateway.getHeader(IDEMPOTENCY_KEY_HEADER, validator=validateIdempotencyKey)
+    if idempotencyKey is None:
+        return (None, None)
+    key = (principal.organizationId, idempotencyKey)
+    fingerprint = hashlib.sha256((apiGateway.eventGet('body') or '').encode()).hexdigest()
+    entry = idempotencyStore.reserve(key, fingerprint)
+    if entry is None:
+        return (key, None)
+    authorize(principal)
+    if entry.fingerprint != fingerprint:
+        raise HttpError(
+            HttpError.UNPROCESSABLE_ENTITY,
+            'Idempotency-Key "{0}" was already used with another request'.format(idempotencyKey)
+        )
+    if entry.response is None:
+        raise HttpError(
+            HttpError.CONFLICT, 'The request with Idempotency-Key "{0}" is in progress'.format(idempotencyKey)
+        )
+    response = entry.response
+    return (None, dict(response, headers=dict(response['headers'], **{IDEMPOTENT_REPLAYED_HEADER: 'true'})))
+
+
+def loadSchemas():
+    'Returns the thing-create.json, thing-update.json and thing-patch.json schemas'
     with open(CREATE_SCHEMA_FILE_NAME) as infile:
         thingCreateSchema = json.load(infile)
     with open(UPDATE_SCHEMA_FILE_NAME) as infile:
         thingUpdateSchema = json.load(infile)
+    with open(PATCH_SCHEMA_FILE_NAME) as infile:
+        thingPatchSchema = json.load(infile)
+    return (thingCreateSchema, thingUpdateSchema, thingPatchSchema)
+
+
+def toInteger(value, default=None):
+    return default if value is None else int(value)
+
+
+def toDatetime(value):
+    return None if value is None else json2datetime(value)
+
+
+def getListThingsParameters(apiGateway):
+    'Returns the owner and the listThings() options of the query string'
+    owner = apiGateway.getQueryStringParameter('owner', required=False)
+    namePrefix = apiGateway.getQueryStringParameter('namePrefix', required=False)
+    offset = apiGateway.getQueryStringParameter('offset', required=False, validator=validateNonNegativeInteger)
+    limit = apiGateway.getQueryStringParameter('limit', required=False, validator=validatePositiveInteger)
+    sort = apiGateway.getQueryStringParameter('sort', required=False, validator=validateSort)
+    modifiedSince = apiGateway.getQueryStringParameter('modifiedSince', required=False, validator=validateDatetime)
+    if modifiedSince is not None and (sort is not None or namePrefix is not None):
+        raise HttpError(
+            HttpError.BAD_REQUEST,
+            'Query string parameter "modifiedSince" cannot be combined with "sort" or "namePrefix"'
+        )
+    return (owner, {
+        'namePrefix': namePrefix,
+        'offset': toInteger(offset, 0),
+        'limit': toInteger(limit),
+        'sort': sort,
+        'modifiedSince': toDatetime(modifiedSince)
+    })
+
+
+def getListChangesParameters(apiGateway):
+    'Returns the owner and the listChanges() options of the query string'
+    owner = apiGateway.getQueryStringParameter('owner', required=False)
+    after = apiGateway.getQueryStringParameter('after', required=False, validator=validateNonNegativeInteger)
+    limit = apiGateway.getQueryStringParameter('limit', required=False, validator=validatePositiveInteger)
+    epoch = apiGateway.getQueryStringParameter('epoch', required=False)
+    return (owner, {'after': toInteger(after, 0), 'limit': toInteger(limit), 'epoch': epoch})
+
+
+def getSearchThingsParameters(apiGateway):
+    'Returns the owner, the query and the searchThings() options of the query string'
+    query = apiGateway.getQueryStringParameter('q', required=True)
+    owner = apiGateway.getQueryStringParameter('owner', required=False)
+    operator = apiGateway.getQueryStringParameter('operator', required=False, validator=validateSearchOperator)
+    offset = apiGateway.getQueryStringParameter('offset', required=False, validator=validateNonNegativeInteger)
+    limit = apiGateway.getQueryStringParameter('limit', required=False, validator=validatePositiveInteger)
+    return (owner, query, {
+        'operator': operator or AND_OPERATOR,
+        'offset': toInteger(offset, 0),
+        'limit': toInteger(limit)
+    })
+
+
+def LambdaMapper(loggerFactory, apiGatewayFactory, authorizer, metrics=None, deadlines=None, idempotencyStore=None):
+
+    (thingCreateSchema, thingUpdateSchema, thingPatchSchema) = loadSchemas()
     logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
+    deadlines = deadlines or Deadlines(loggerFactory, metrics=metrics)
+    idempotencyStore = idempotencyStore or IdempotencyStore()
 
     class Service:
-        def createThing(self, event):
-            logger.debug('createThing(): event=%s', event)
+        def createThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): event=%s', event)
             apiGateway = apiGatewayFactory(event)
+            idempotencyKey = None
             try:
-                principal = apiGateway.getAndValidatePrincipal()
-                thing = apiGateway.getAndValidateEntity(thingCreateSchema, 'thing')
-                result = authorizer.createThing(principal, thing)
-                return apiGateway.createResponse(
-                    statusCode=201,
-                    headers=apiGateway.createLocationHeader(result['uuid']),
-                    body=result
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                (idempotencyKey, replay) = startIdempotentRequest(
+                    apiGateway, idempotencyStore, principal, authorizer.authorizeCreateThing
                 )
+                if replay is not None:
+                    metrics.count('IdempotentReplays')
+                    return replay
+                with metrics.stage('validation'):
+                    thing = apiGateway.getAndValidateEntity(thingCreateSchema, 'thing')
+                result = authorizer.createThing(principal, thing)
+                with metrics.stage('serialization'):
+                    response = apiGateway.createResponse(
+                        statusCode=201,
+                        headers=apiGateway.createLocationHeader(result['uuid']),
+                        body=result
+                    )
+                if idempotencyKey is not None:
+                    idempotencyStore.complete(idempotencyKey, response)
+                return response
             except Exception as error:
+                if idempotencyKey is not None:
+                    idempotencyStore.release(idempotencyKey)
                 return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('createThing')
 
-        def getThing(self, event):
-            logger.debug('getThing(): event=%s', event)
+        def getThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): event=%s', event)
             apiGateway = apiGatewayFactory(event)
             try:
-                principal = apiGateway.getAndValidatePrincipal()
-                uuid = apiGateway.getPathParameter('uuid', required=True)
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
                 result = authorizer.getThing(principal, uuid)
-                if apiGateway.wasModifiedSince(result):
-                    return apiGateway.createResponse(
-                        body=result,
-                        headers=apiGateway.createLastModifiedHeader(result)
-                    )
-                else:
-                    return apiGateway.createResponse(statusCode=304)
+                with metrics.stage('serialization'):
+                    if apiGateway.wasModifiedSince(result):
+                        return apiGateway.createResponse(
+                            body=result,
+                            headers=apiGateway.createLastModifiedHeader(result)
+                        )
+                    else:
+                        return apiGateway.createResponse(statusCode=304)
             except Exception as error:
                 return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('getThing')
 
-        def updateThing(self, event):
-            logger.debug('updateThing(): event=%s', event)
+        def updateThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): event=%s', event)
             apiGateway = apiGatewayFactory(event)
             try:
-                principal = apiGateway.getAndValidatePrincipal()
-                uuid = apiGateway.getPathParameter('uuid', required=True)
-                thing = apiGateway.getAndValidateEntity(thingUpdateSchema, 'thing')
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
+                    thing = apiGateway.getAndValidateEntity(thingUpdateSchema, 'thing')
                 result = authorizer.updateThing(principal, uuid, thing)
-                return apiGateway.createResponse(body=result)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
             except Exception as error:
                 return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('updateThing')
 
-        def deleteThing(self, event):
-            logger.debug('deleteThing(): event=%s', event)
+        def patchThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('patchThing(): event=%s', event)
             apiGateway = apiGatewayFactory(event)
             try:
-                principal = apiGateway.getAndValidatePrincipal()
-                uuid = apiGateway.getPathParameter('uuid', required=True)
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
+                    patch = apiGateway.getAndValidateEntity(thingPatchSchema, 'thing patch', PATCH_MEDIA_TYPES)
+                result = authorizer.patchThing(principal, uuid, patch)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('patchThing')
+
+        def deleteThing(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    uuid = apiGateway.getPathParameter('uuid', required=True)
                 result = authorizer.deleteThing(principal, uuid)
-                return apiGateway.createResponse(statusCode=204)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(statusCode=204)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('deleteThing')
+
+        def listThings(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    (owner, options) = getListThingsParameters(apiGateway)
+                result = authorizer.listThings(principal, owner, **options)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
+            except Exception as error:
+                return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('listThings')
+
+        def searchThings(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('searchThings(): event=%s', event)
+            apiGateway = apiGatewayFactory(event)
+            try:
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    (owner, query, options) = getSearchThingsParameters(apiGateway)
+                result = authorizer.searchThings(principal, owner, query, **options)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
             except Exception as error:
                 return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('searchThings')
 
-        def listThings(self, event):
-            logger.debug('listThings(): event=%s', event)
+        def listChanges(self, event, context=None):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): event=%s', event)
             apiGateway = apiGatewayFactory(event)
             try:
-                principal = apiGateway.getAndValidatePrincipal()
-                owner = apiGateway.getQueryStringParameter('owner', required=False)
-                result = authorizer.listThings(principal, owner)
-                return apiGateway.createResponse(body=result)
+                deadlines.start(context)
+                with metrics.stage('principal'):
+                    principal = apiGateway.getAndValidatePrincipal()
+                with metrics.stage('validation'):
+                    (owner, options) = getListChangesParameters(apiGateway)
+                result = authorizer.listChanges(principal, owner, **options)
+                with metrics.stage('serialization'):
+                    return apiGateway.createResponse(body=result)
             except Exception as error:
                 return apiGateway.createErrorResponse(error)
+            finally:
+                deadlines.stop()
+                metrics.flush('listChanges')
 
     return Service()
@@ -1,10 +1,13 @@
-from src.container import Container
+from functools import partial
+
+from src.container import getContainer
 
 
 def handler(event, context, container=None):
     try:
-        container = container or Container()
-        return container.thingLambdaMapper().getThing(event)
+        container = container or getContainer()
+        mapper = container.thingLambdaMapper()
+        return container.profiler().profile('getThing', event, partial(mapper.getThing, context=context))
     finally:
         if container:
-            container.shutdown()
+            container.flush()
@@ -0,0 +1,13 @@
+from functools import partial
+
+from src.container import getContainer
+
+
+def handler(event, context, container=None):
+    try:
+        container = container or getContainer()
+        mapper = container.thingLambdaMapper()
+        return container.profiler().profile('listChanges', event, partial(mapper.listChanges, context=context))
+    finally:
+        if container:
+            container.flush()
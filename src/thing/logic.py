@@ -2,68 +2,161 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 
+import src.commons.jsonutils as jsonutils
+from src.commons.metrics import Metrics
 from src.commons.nsp_error import NspError
 
 
-def Logic(loggerFactory, repository):
+def checkCreate(principal, thing):
+    pass
+
+
+def prepareCreate(principal, thing, exists, now):
+    '''
+    Applies the rules of a creation to the thing, raising THING_ALREADY_EXISTS if its uuid exists, generating the uuid
+    if missing and setting created and lastModified to now, and returns it
+    '''
+    if exists:
+        raise NspError(NspError.THING_ALREADY_EXISTS, 'Thing "{0}" already exists'.format(thing['uuid']))
+    if thing.get('uuid') is None:
+        thing['uuid'] = str(uuid4())
+    thing['created'] = now
+    thing['lastModified'] = now
+    checkCreate(principal, thing)
+    return thing
+
+
+def checkUpdate(principal, oldThing, newThing):
+    principal.checkReadOnlyProperties(
+        oldThing,
+        newThing,
+        ['uuid', 'created', 'lastModified'],
+        NspError.THING_UNPROCESSABLE
+    )
+
+
+def isUnchanged(thing, newThing):
+    'Returns whether an update leaves all the properties of the thing but lastModified as they are'
+    return all(
+        thing.get(field) == newThing.get(field) for field in set(thing).union(newThing) if field != 'lastModified'
+    )
+
+
+def checkDelete(principal, thing):
+    pass
 
-    logger = loggerFactory(__name__)
 
-    def checkCreate(principal, thing):
-        pass
+def checkThing(principal, uuid, thing):
+    'Returns the thing read by uuid, raising THING_NOT_FOUND if it does not exist or the principal cannot see it'
+    if thing is None:
+        raise NspError(NspError.THING_NOT_FOUND, 'Thing "{0}" not found'.format(uuid))
+    principal.checkVisibility(thing, 'Thing', NspError.THING_NOT_FOUND)
+    return thing
 
-    def checkUpdate(principal, oldThing, newThing):
-        principal.checkReadOnlyProperties(
-            oldThing,
-            newThing,
-            ['uuid', 'created', 'lastModified'],
-            NspError.THING_UNPROCESSABLE
-        )
 
-    def checkDelete(principal, thing):
-        pass
+def Logic(loggerFactory, repository, metrics=None):
+
+    logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
 
     def getAndCheckThing(principal, uuid):
-        thing = repository.getThing(uuid)
-        if thing is None:
-            raise NspError(NspError.THING_NOT_FOUND, 'Thing "{0}" not found'.format(uuid))
-        else:
-            principal.checkVisibility(thing, 'Thing', NspError.THING_NOT_FOUND)
+        return checkThing(principal, uuid, repository.getThing(uuid))
+
+    def writeUpdate(principal, thing, newThing):
+        'Writes the update, unless it would not change the thing, returning the thing as it is then'
+        checkUpdate(principal, thing, newThing)
+        if isUnchanged(thing, newThing):
+            metrics.count('SkippedWrites')
             return thing
+        newThing['lastModified'] = datetime.now()
+        return repository.updateThing(newThing, expectedLastModified=thing['lastModified'])
 
     class Service:
         def createThing(self, principal, thing):
-            logger.debug('createThing(): principal=%s, thing=%s', principal, thing)
-            if thing.get('uuid') is not None:
-                existing = repository.getThing(thing['uuid'])
-                if existing is not None:
-                    raise NspError(NspError.THING_ALREADY_EXISTS, 'Thing "{0}" already exists'.format(thing['uuid']))
-            else:
-                thing['uuid'] = str(uuid4())
-            thing['created'] = datetime.now()
-            thing['lastModified'] = thing['created']
-            checkCreate(principal, thing)
-            return repository.createThing(thing)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): principal=%s, thing=%s', principal, thing)
+            with metrics.stage('logic'):
+                exists = thing.get('uuid') is not None and repository.getThing(thing['uuid']) is not None
+                return repository.createThing(prepareCreate(principal, thing, exists, datetime.now()))
+
+        def importThings(self, principal, things):
+            '''
+            Creates the things with a single repository write, returning a list with the created thing or the NspError
+            of each thing
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('importThings(): principal=%s, things=%d', principal, len(things))
+            with metrics.stage('logic'):
+                results = []
+                created = []
+                uuids = set()
+                now = datetime.now()
+                for thing in things:
+                    uuid = thing.get('uuid')
+                    exists = uuid is not None and (uuid in uuids or repository.getThing(uuid) is not None)
+                    try:
+                        prepareCreate(principal, thing, exists, now)
+                    except NspError as error:
+                        results.append(error)
+                        continue
+                    uuids.add(thing['uuid'])
+                    created.append(thing)
+                    results.append(thing)
+                repository.createThings(created)
+                return results
 
         def getThing(self, principal, uuid):
-            logger.debug('getThing(): principal=%s, uuid=%s', principal, uuid)
-            return getAndCheckThing(principal, uuid)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): principal=%s, uuid=%s', principal, uuid)
+            with metrics.stage('logic'):
+                return getAndCheckThing(principal, uuid)
 
         def updateThing(self, principal, uuid, newThing):
-            logger.debug('updateThing(): principal=%s, uuid=%s, thing=%s', principal, uuid, newThing)
-            thing = getAndCheckThing(principal, uuid)
-            checkUpdate(principal, thing, newThing)
-            newThing['lastModified'] = datetime.now()
-            return repository.updateThing(newThing)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): principal=%s, uuid=%s, thing=%s', principal, uuid, newThing)
+            with metrics.stage('logic'):
+                thing = getAndCheckThing(principal, uuid)
+                return writeUpdate(principal, thing, newThing)
+
+        def patchThing(self, principal, uuid, patch):
+            'Updates the thing with a JSON merge patch of its properties, with the same rules as updateThing'
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('patchThing(): principal=%s, uuid=%s, patch=%s', principal, uuid, patch)
+            with metrics.stage('logic'):
+                thing = getAndCheckThing(principal, uuid)
+                return writeUpdate(principal, thing, jsonutils.mergePatch(thing, patch))
 
         def deleteThing(self, principal, uuid):
-            logger.debug('deleteThing(): principal=%s, uuid=%s', principal, uuid)
-            thing = getAndCheckThing(principal, uuid)
-            checkDelete(principal, thing)
-            return repository.deleteThing(uuid)
-
-        def listThings(self, principal, owner):
-            logger.debug('listThings(): principal=%s, owner=%s', principal, owner)
-            return repository.listThings(owner)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): principal=%s, uuid=%s', principal, uuid)
+            with metrics.stage('logic'):
+                thing = getAndCheckThing(principal, uuid)
+                checkDelete(principal, thing)
+                return repository.deleteThing(uuid)
+
+        def listThings(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listThings(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            with metrics.stage('logic'):
+                return repository.listThings(owner, **options)
+
+        def searchThings(self, principal, owner, query, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'searchThings(): principal=%s, owner=%s, query=%s, options=%s', principal, owner, query, options
+                )
+            with metrics.stage('logic'):
+                return repository.searchThings(owner, query, **options)
+
+        def listChanges(self, principal, owner, **options):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): principal=%s, owner=%s, options=%s', principal, owner, options)
+            with metrics.stage('logic'):
+                return repository.listChanges(owner, **options)
+
+        def exportThings(self, principal, owner):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('exportThings(): principal=%s, owner=%s', principal, owner)
+            return repository.iterThings(owner)
 
     return Service()
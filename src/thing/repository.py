@@ -1,10 +1,63 @@
+import heapq
 import logging
+import os
+import threading
 from datetime import datetime, timedelta
+from itertools import islice
 
+from src.commons.deadline import checkDeadline
+from src.commons.metrics import Metrics
+from src.commons.nsp_error import NspError
+from src.commons.sharded_map import ShardedMap
+from src.commons.sorted_index import SortedIndex
+from src.thing.change_log import ChangeLog, CREATE_CHANGE, UPDATE_CHANGE, DELETE_CHANGE
+from src.thing.search_index import SearchIndex, AND_OPERATOR
+from src.thing.snapshot import Snapshot, writeSnapshot
+from src.thing.thing_record import ThingRecord
+from src.thing.wal import WriteAheadLog, readLog, syncDirectory, PUT_OPERATION, DELETE_OPERATION
 
-def Repository(loggerFactory):
+NAME_SORT = 'name'
+CREATED_SORT = 'created'
+LAST_MODIFIED_SORT = 'lastModified'
+SORT_FIELDS = (NAME_SORT, CREATED_SORT, LAST_MODIFIED_SORT)
+DESCENDING_PREFIX = '-'
+ITER_CHUNK_SIZE = 1000
+SNAPSHOT_FILE_NAME = 'things.snapshot'
+LOG_FILE_NAME = 'things.wal'
 
+
+def parseSort(sort):
+    'Splits a sort specification like "-created" in the sort field and the descending flag'
+    if sort.startswith(DESCENDING_PREFIX):
+        return (sort[len(DESCENDING_PREFIX):], True)
+    return (sort, False)
+
+
+def identity(value):
+    return value
+
+
+def Repository(loggerFactory, metrics=None, config=None):
+    '''
+    In-memory thing repository. If the "compact" configuration is true the things are kept as ThingRecords, converted
+    to dicts only when they are returned. If a "snapshot" file is configured, the repository starts with its things
+    instead of the sample ones, serving getThing() and the unsorted listThings() straight from the memory mapped file
+    until a write or a query needing an index loads it all in memory.
+    The repository is thread-safe: the things are kept in a ShardedMap with a lock per shard, the writes lock the shard
+    of the thing (all the shards for the bulk ones) to check and log the write, and then the indexes only to apply it,
+    so that the map and the indexes change atomically, and the queries of the indexes lock the indexes. As every change
+    of the map holds the index lock, the map can be read without the shard locks while holding it. A compaction locks
+    all the shards, so that no write is logged but not yet applied. updateThing() can compare and set on lastModified.
+    The calls serving a request raise DEADLINE_EXCEEDED once the deadline of the request has passed.
+    If a "wal" directory is configured, the repository is durable: it starts from the snapshot and the write-ahead log
+    in the directory, appends every write to the log before applying it, and every compactEveryRecords writes replaces
+    the snapshot with one of all the things and empties the log. The change log is not recovered: it starts over with
+    a new epoch, so that listChanges() raises CHANGES_EXPIRED for the cursors given out before the restart.
+    '''
+
+    config = config or {}
     logger = loggerFactory(__name__)
+    metrics = metrics or Metrics(loggerFactory)
 
     created = datetime(year=2103, month=1, day=31, hour=3, minute=45, second=1, microsecond=234000)
     lastModified = datetime(year=2108, month=1, day=1, hour=12, minute=12, second=12, microsecond=345000)
@@ -35,30 +88,419 @@ def Repository(loggerFactory):
         },
     }
 
+    if config.get('compact', False):
+        store = ThingRecord.fromDict
+        load = ThingRecord.toDict
+
+        def loadChange(change):
+            return dict(change, thing=change['thing'].toDict()) if 'thing' in change else change
+    else:
+        store = load = loadChange = identity
+    snapshot = None
+    walConfig = config.get('wal')
+    if walConfig is not None:
+        directory = walConfig['directory']
+        os.makedirs(directory, exist_ok=True)
+        snapshotPath = os.path.join(directory, SNAPSHOT_FILE_NAME)
+        logPath = os.path.join(directory, LOG_FILE_NAME)
+        compactEveryRecords = walConfig.get('compactEveryRecords', 100000)
+        compactAtRecords = compactEveryRecords
+        if os.path.exists(snapshotPath):
+            snapshot = Snapshot(snapshotPath)
+        data = {}
+    elif config.get('snapshot') is not None:
+        snapshot = Snapshot(config['snapshot'])
+        data = {}
+    data = ShardedMap(config.get('shards', 16), ((uuid, store(thing)) for (uuid, thing) in data.items()))
+    indexLock = threading.RLock()
+
+    def nameKey(thing):
+        return (thing.get('name') or '').casefold()
+
+    def datetimeKey(field):
+        return lambda thing: thing.get(field) or datetime.min
+
+    sortIndexes = {
+        NAME_SORT: SortedIndex(nameKey),
+        CREATED_SORT: SortedIndex(datetimeKey(CREATED_SORT)),
+        LAST_MODIFIED_SORT: SortedIndex(datetimeKey(LAST_MODIFIED_SORT))
+    }
+    nameIndex = sortIndexes[NAME_SORT]
+    searchIndex = SearchIndex()
+    changeLog = ChangeLog(config.get('changeLogCapacity', 10000))
+    tombstones = {}
+    tombstoneIndex = SortedIndex(lambda tombstone: tombstone['deleted'])
+    tombstoneCapacity = config.get('tombstoneCapacity', 10000)
+    # deletion time of the last tombstone dropped, the changes before it are no longer complete
+    tombstonesExpired = None
+
+    def index(thing):
+        for sortIndex in sortIndexes.values():
+            sortIndex.add(thing)
+        searchIndex.add(thing)
+
+    def unindex(thing):
+        for sortIndex in sortIndexes.values():
+            sortIndex.remove(thing)
+        searchIndex.remove(thing['uuid'])
+
+    def indexAll(things):
+        for sortIndex in sortIndexes.values():
+            sortIndex.addAll(things)
+        for thing in things:
+            searchIndex.add(thing)
+
+    indexAll(list(data.values()))
+
+    def hydrate():
+        'Loads and indexes the things of the snapshot, if not done yet'
+        nonlocal snapshot
+        if snapshot is None:
+            return
+        with data.lockAll(), indexLock, metrics.stage('hydration'):
+            if snapshot is None:
+                return
+            things = [store(thing) for thing in snapshot.iterThings(None)]
+            for thing in things:
+                data[thing['uuid']] = thing
+            indexAll(things)
+            snapshot = None
+
+    def unbury(uuid):
+        tombstone = tombstones.pop(uuid, None)
+        if tombstone is not None:
+            tombstoneIndex.remove(tombstone)
+
+    def bury(uuid, owner):
+        'Leaves a tombstone of the thing for the owner, dropping the oldest one if there are more than the capacity'
+        nonlocal tombstonesExpired
+        unbury(uuid)
+        tombstone = {'uuid': uuid, 'owner': owner, 'deleted': datetime.now()}
+        tombstones[uuid] = tombstone
+        tombstoneIndex.add(tombstone)
+        if len(tombstones) > tombstoneCapacity:
+            oldest = tombstones.pop(next(iter(tombstones)))
+            tombstoneIndex.remove(oldest)
+            tombstonesExpired = oldest['deleted']
+
+    def put(thing):
+        '''
+        Stores and indexes the thing, returning the stored thing and the one it replaced, if any. A thing moved to
+        another owner leaves a tombstone for its old owner.
+        '''
+        thing = store(thing)
+        old = data.get(thing['uuid'])
+        if old is not None:
+            unindex(old)
+        data[thing['uuid']] = thing
+        index(thing)
+        if old is not None and old.get('owner') != thing.get('owner'):
+            bury(thing['uuid'], old.get('owner'))
+        else:
+            unbury(thing['uuid'])
+        return (thing, old)
+
+    def remove(uuid):
+        'Removes the thing from the data and the indexes, leaving a tombstone, and returns it'
+        thing = data.pop(uuid)
+        unindex(thing)
+        bury(thing['uuid'], thing.get('owner'))
+        return thing
+
+    def write(thing):
+        (thing, old) = put(thing)
+        if old is None:
+            changeLog.append(CREATE_CHANGE, thing)
+        else:
+            changeLog.append(UPDATE_CHANGE, thing, old.get('owner'))
+
+    wal = None
+    if walConfig is not None:
+        replayed = 0
+        for record in readLog(logPath, logger, repair=True):
+            hydrate()
+            if record['operation'] == PUT_OPERATION:
+                put(record['thing'])
+            elif record['operation'] == DELETE_OPERATION and record['uuid'] in data:
+                remove(record['uuid'])
+            replayed += 1
+        if replayed:
+            logger.info('Replayed %d write-ahead log records of %s', replayed, logPath)
+        wal = WriteAheadLog(logPath, walConfig.get('syncIntervalSeconds', 0.05), replayed)
+
+    def compact():
+        'Replaces the snapshot with one of all the things and empties the write-ahead log'
+        with metrics.stage('compaction'):
+            temporaryPath = snapshotPath + '.tmp'
+            with open(temporaryPath, 'wb') as outfile:
+                uuids = sortIndexes[CREATED_SORT].entries(None)
+                writeSnapshot((load(data[uuid]) for (key, uuid) in uuids), outfile)
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            os.replace(temporaryPath, snapshotPath)
+            syncDirectory(directory)
+            wal.truncate()
+
+    def logPut(things):
+        if wal is not None:
+            wal.put(things)
+
+    def logDelete(uuid):
+        if wal is not None:
+            wal.delete(uuid)
+
+    def maybeCompact():
+        '''
+        Compacts once the log has compactEveryRecords records; the caller must not hold any shard lock. The write is
+        already durable in the log, so a failed compaction is only logged, and retried after compactEveryRecords more.
+        '''
+        nonlocal compactAtRecords
+        if wal is not None and wal.records >= compactAtRecords:
+            with data.lockAll(), indexLock:
+                if wal.records < compactAtRecords:
+                    return
+                try:
+                    compact()
+                    compactAtRecords = compactEveryRecords
+                except Exception as error:
+                    compactAtRecords = wal.records + compactEveryRecords
+                    logger.error('maybeCompact(): cannot compact %s: %s', logPath, error)
+
+    def checkOwners(things):
+        'Raises THING_UNPROCESSABLE if a thing to log has no owner, as it could not be written to a snapshot'
+        if wal is None:
+            return
+        for thing in things:
+            if thing.get('owner') is None:
+                raise NspError(NspError.THING_UNPROCESSABLE, 'Thing "{0}" has no owner'.format(thing['uuid']))
+
+    def page(things, offset, limit):
+        return list(islice(things, offset, None if limit is None else offset + limit))
+
+    def listChanges(owner, modifiedSince, offset, limit):
+        if tombstonesExpired is not None and modifiedSince < tombstonesExpired:
+            raise NspError(
+                NspError.CHANGES_EXPIRED,
+                'Deletions before {0} are no longer available'.format(tombstonesExpired.isoformat())
+            )
+        changes = heapq.merge(
+            ((key, uuid, data) for (key, uuid) in sortIndexes[LAST_MODIFIED_SORT].entriesAfter(owner, modifiedSince)),
+            # without owner, the tombstone of a thing moved to another owner is not a change
+            (
+                (key, uuid, tombstones) for (key, uuid) in tombstoneIndex.entriesAfter(owner, modifiedSince)
+                if owner is not None or uuid not in data
+            ),
+            key=lambda change: change[:2]
+        )
+        result = {'things': [], 'tombstones': []}
+        for (key, uuid, source) in page(changes, offset, limit):
+            if source is data:
+                result['things'].append(load(data[uuid]))
+            else:
+                result['tombstones'].append(tombstones[uuid])
+        return result
+
+    def listIndexedThings(owner, namePrefix, offset, limit, sort, modifiedSince):
+        if modifiedSince is not None:
+            return listChanges(owner, modifiedSince, offset, limit)
+        (field, descending) = parseSort(sort or NAME_SORT)
+        if namePrefix is not None:
+            (start, stop) = nameIndex.prefixRange(owner, namePrefix.casefold())
+            if field == NAME_SORT:
+                return [load(data[uuid]) for uuid in nameIndex.page(owner, start, stop, offset, limit, descending)]
+            things = sorted(
+                (data[uuid] for uuid in nameIndex.page(owner, start, stop)),
+                key=lambda thing: (sortIndexes[field].keyFunction(thing), thing['uuid']),
+                reverse=descending
+            )
+            return [load(thing) for thing in page(things, offset, limit)]
+        sortIndex = sortIndexes[CREATED_SORT if sort is None else field]
+        (start, stop) = sortIndex.range(owner)
+        return [load(data[uuid]) for uuid in sortIndex.page(owner, start, stop, offset, limit, descending)]
+
     class Service:
         def __init__(self, data):
             self.data = data
 
         def createThing(self, thing):
-            logger.debug('createThing(): thing=%s', thing)
-            data[thing['uuid']] = thing
-            return thing
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThing(): thing=%s', thing)
+            checkDeadline('repository call')
+            checkOwners([thing])
+            hydrate()
+            with metrics.stage('repository'):
+                with data.lock(thing['uuid']):
+                    if thing['uuid'] in data:
+                        raise NspError(
+                            NspError.THING_ALREADY_EXISTS, 'Thing "{0}" already exists'.format(thing['uuid'])
+                        )
+                    logPut([thing])
+                    with indexLock:
+                        write(thing)
+                maybeCompact()
+                return thing
+
+        def createThings(self, things):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('createThings(): things=%d', len(things))
+            checkDeadline('repository call')
+            checkOwners(things)
+            hydrate()
+            with metrics.stage('repository'):
+                with data.lockAll():
+                    uuids = set()
+                    for thing in things:
+                        if thing['uuid'] in data or thing['uuid'] in uuids:
+                            raise NspError(
+                                NspError.THING_ALREADY_EXISTS, 'Thing "{0}" already exists'.format(thing['uuid'])
+                            )
+                        uuids.add(thing['uuid'])
+                    logPut(things)
+                    with indexLock:
+                        for thing in things:
+                            write(thing)
+                maybeCompact()
+                return things
 
         def getThing(self, uuid):
-            logger.debug('getThing(): uuid=%s', uuid)
-            return data.get(uuid)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('getThing(): uuid=%s', uuid)
+            checkDeadline('repository call')
+            with metrics.stage('repository'):
+                # read once, as a concurrent hydrate() can drop the snapshot at any time
+                current = snapshot
+                if current is not None:
+                    return current.getThing(uuid)
+                thing = data.get(uuid)
+                return None if thing is None else load(thing)
 
-        def updateThing(self, thing):
-            logger.debug('updateThing(): thing=%s', thing)
-            data[thing['uuid']] = thing
-            return thing
+        def updateThing(self, thing, expectedLastModified=None):
+            '''
+            Replaces the thing. If expectedLastModified is given, raises THING_CONFLICT unless it is still the
+            lastModified of the stored thing, so that concurrent read-modify-writes cannot overwrite each other.
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('updateThing(): thing=%s, expectedLastModified=%s', thing, expectedLastModified)
+            checkDeadline('repository call')
+            checkOwners([thing])
+            hydrate()
+            with metrics.stage('repository'):
+                with data.lock(thing['uuid']):
+                    old = data.get(thing['uuid'])
+                    if expectedLastModified is not None and old is None:
+                        raise NspError(NspError.THING_NOT_FOUND, 'Thing "{0}" not found'.format(thing['uuid']))
+                    if expectedLastModified is not None and old.get('lastModified') != expectedLastModified:
+                        raise NspError(
+                            NspError.THING_CONFLICT, 'Thing "{0}" was modified concurrently'.format(thing['uuid'])
+                        )
+                    logPut([thing])
+                    with indexLock:
+                        write(thing)
+                maybeCompact()
+                return thing
 
         def deleteThing(self, uuid):
-            logger.debug('deleteThing(): uuid=%s', uuid)
-            del data[uuid]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('deleteThing(): uuid=%s', uuid)
+            checkDeadline('repository call')
+            hydrate()
+            with metrics.stage('repository'):
+                with data.lock(uuid):
+                    if uuid not in data:
+                        raise NspError(NspError.THING_NOT_FOUND, 'Thing "{0}" not found'.format(uuid))
+                    logDelete(uuid)
+                    with indexLock:
+                        thing = remove(uuid)
+                        changeLog.append(DELETE_CHANGE, thing)
+                maybeCompact()
+
+        def listThings(self, owner, namePrefix=None, offset=0, limit=None, sort=None, modifiedSince=None):
+            '''
+            Returns a page of the things of the owner (of all the owners if None). If namePrefix is given, only the
+            things whose name starts with it (case insensitively) are returned, by default sorted by name. The sort
+            parameter is one of SORT_FIELDS, optionally prefixed by "-" for the descending order; the pages are sliced
+            from the maintained sort indexes, only the things matching a namePrefix are sorted on each request when
+            the sort field is not the name. Without namePrefix and sort the things are sorted by created.
+            If modifiedSince is given, returns instead a page of the changes after it, in the order they happened, as
+            {"things": [modified things], "tombstones": [{"uuid", "owner", "deleted"} of the deleted things]}; it
+            cannot be combined with namePrefix or sort. Only the last tombstoneCapacity tombstones are kept, so it
+            raises CHANGES_EXPIRED if modifiedSince is before the deletion of the last tombstone dropped.
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'listThings(): owner=%s, namePrefix=%s, offset=%s, limit=%s, sort=%s, modifiedSince=%s',
+                    owner, namePrefix, offset, limit, sort, modifiedSince
+                )
+            checkDeadline('repository call')
+            with metrics.stage('repository'):
+                current = snapshot
+                if current is not None and namePrefix is None and sort is None and modifiedSince is None:
+                    return current.listThings(owner, offset, limit)
+                hydrate()
+                with indexLock:
+                    return listIndexedThings(owner, namePrefix, offset, limit, sort, modifiedSince)
+
+        def searchThings(self, owner, query, operator=AND_OPERATOR, offset=0, limit=None):
+            'Returns a page of the things of the owner (of all the owners if None) matching the query, by relevance'
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'searchThings(): owner=%s, query=%s, operator=%s, offset=%s, limit=%s',
+                    owner, query, operator, offset, limit
+                )
+            checkDeadline('repository call')
+            with metrics.stage('repository'):
+                hydrate()
+                with indexLock:
+                    return [load(data[uuid]) for uuid in searchIndex.search(owner, query, operator, offset, limit)]
+
+        def iterThings(self, owner):
+            '''
+            Iterates over the things of the owner (of all the owners if None) without materializing them in a list,
+            reading the index ITER_CHUNK_SIZE entries at a time so that the writes wait for a chunk only. The things
+            created while iterating may be skipped, the things deleted while iterating are.
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('iterThings(): owner=%s', owner)
+            current = snapshot
+            if current is not None:
+                for thing in current.iterThings(owner):
+                    if snapshot is not None:
+                        yield thing
+                    elif thing['uuid'] in data:
+                        yield load(data[thing['uuid']])
+                return
+            createdIndex = sortIndexes[CREATED_SORT]
+            entries = None
+            while entries is None or len(entries) == ITER_CHUNK_SIZE:
+                with indexLock:
+                    after = createdIndex.entries(owner) if entries is None else createdIndex.entriesAfter(
+                        owner, *entries[-1]
+                    )
+                    entries = list(islice(after, ITER_CHUNK_SIZE))
+                for (key, uuid) in entries:
+                    thing = data.get(uuid)
+                    if thing is not None and (owner is None or thing.get('owner') == owner):
+                        yield load(thing)
+
+        def listChanges(self, owner, after=0, limit=None, epoch=None):
+            '''
+            Returns a page of the changes of the things of the owner (of all the owners if None) after a sequence of
+            the change log epoch
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('listChanges(): owner=%s, after=%s, limit=%s, epoch=%s', owner, after, limit, epoch)
+            checkDeadline('repository call')
+            with metrics.stage('repository'), indexLock:
+                result = changeLog.after(owner, after, limit, epoch)
+                return dict(result, changes=[loadChange(change) for change in result['changes']])
+
+        def flush(self):
+            'Makes the writes durable, if the repository has a write-ahead log'
+            if wal is not None:
+                wal.sync()
 
-        def listThings(self, owner):
-            logger.debug('listThings(): owner=%s', owner)
-            return [thing for thing in data.values() if owner is None or thing['owner'] == owner]
+        def close(self):
+            if wal is not None:
+                wal.close()
 
     return Service(data)
@@ -0,0 +1,92 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+TOKEN_MATCHER = re.compile('\\w+')
+AND_OPERATOR = 'and'
+OR_OPERATOR = 'or'
+FIELD_WEIGHTS = {'name': 2, 'description': 1}
+
+
+def tokenize(text):
+    'Splits a text in casefolded word tokens'
+    return [token.casefold() for token in TOKEN_MATCHER.findall(text or '')]
+
+
+class SearchIndex:
+    '''
+    Inverted index over the name and description of the things. Posting lists map each token to the term frequency of
+    each thing containing it, and are kept both for all the things and per owner, so that the queries of a non-admin
+    principal only touch the postings of its organization.
+    '''
+
+    def __init__(self):
+        self.all = {}
+        self.byOwner = {}
+        self.documents = {}
+
+    def postings(self, owner):
+        'Returns the posting lists of the owner, or of all the things if owner is None'
+        return self.all if owner is None else self.byOwner.get(owner, {})
+
+    def add(self, thing):
+        if thing['uuid'] in self.documents:
+            self.remove(thing['uuid'])
+        frequencies = Counter()
+        for (field, weight) in FIELD_WEIGHTS.items():
+            for token in tokenize(thing.get(field)):
+                frequencies[token] += weight
+        owner = thing.get('owner')
+        self.documents[thing['uuid']] = (owner, frequencies)
+        ownerPostings = self.byOwner.setdefault(owner, {})
+        for (token, frequency) in frequencies.items():
+            self.all.setdefault(token, {})[thing['uuid']] = frequency
+            ownerPostings.setdefault(token, {})[thing['uuid']] = frequency
+
+    def remove(self, uuid):
+        document = self.documents.pop(uuid, None)
+        if document is None:
+            return
+        (owner, frequencies) = document
+        ownerPostings = self.byOwner[owner]
+        for token in frequencies:
+            for postings in (self.all, ownerPostings):
+                del postings[token][uuid]
+                if not postings[token]:
+                    del postings[token]
+        if not ownerPostings:
+            del self.byOwner[owner]
+
+    def search(self, owner, query, operator=AND_OPERATOR, offset=0, limit=None):
+        '''
+        Returns a page of the uuids of the things of the owner (of all the owners if None) matching all (AND) or any
+        (OR) of the query tokens, ranked by TF-IDF relevance
+        '''
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        postings = self.postings(owner)
+        lists = sorted((postings.get(token, {}) for token in tokens), key=len)
+        if operator == AND_OPERATOR:
+            candidates = set(lists[0])
+            for postingList in lists[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(postingList)
+        else:
+            candidates = set().union(*lists)
+        total = len(self.documents)
+        weights = [(postingList, math.log(1 + total / len(postingList))) for postingList in lists if postingList]
+
+        def score(uuid):
+            return sum(postingList.get(uuid, 0) * idf for (postingList, idf) in weights)
+
+        def rankKey(uuid):
+            return (score(uuid), uuid)
+
+        if limit is None:
+            ranked = sorted(candidates, key=rankKey, reverse=True)
+        else:
+            ranked = heapq.nlargest(offset + limit, candidates, key=rankKey)
+        return ranked[offset:]
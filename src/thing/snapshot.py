@@ -0,0 +1,190 @@
+import bisect
+import json
+import mmap
+import struct
+from datetime import datetime
+
+import src.commons.jsonutils as jsonutils
+import src.commons.ndjson as ndjson
+
+MAGIC = b'THSN'
+VERSION = 2
+# magic, version, things, owners, record table offset, uuid index offset, owner table offset, created index offset
+HEADER = struct.Struct('<4sHIIQQQQ')
+# record offset, record length, uuid offset, uuid length
+RECORD_ENTRY = struct.Struct('<QIQH')
+# owner offset, owner length, record list offset, record list length
+OWNER_ENTRY = struct.Struct('<QHQI')
+RECORD_NUMBER = struct.Struct('<I')
+
+
+def writeSnapshot(things, outfile):
+    '''
+    Writes the things to a binary snapshot file opened for writing in binary mode, returning the number of things. The
+    file has a fixed size header, followed by the uuid, owner and json record strings of the things, by a table with
+    the offsets of the strings of each thing, an index of the thing numbers sorted by uuid, a table of the owners sorted
+    by owner, the lists of the thing numbers of each owner and an index of all the thing numbers. The lists and the
+    index are sorted by created and uuid, the order of the repository listings, so that the pages served from the
+    snapshot stay the same once the repository is hydrated. Only the offsets and sort keys are kept in memory while
+    writing.
+    '''
+    outfile.write(bytes(HEADER.size))
+    position = HEADER.size
+    entries = []
+    uuids = []
+    createdKeys = []
+    owners = {}
+    ownerStrings = {}
+
+    def writeString(string):
+        nonlocal position
+        offset = position
+        position += outfile.write(string)
+        return offset
+
+    for thing in things:
+        if thing.get('uuid') is None or thing.get('owner') is None:
+            raise ValueError('Thing without uuid or owner: {0}'.format(thing))
+        number = len(entries)
+        uuid = thing['uuid'].encode()
+        record = ndjson.dumps(thing).encode()
+        entries.append((writeString(record), len(record), writeString(uuid), len(uuid)))
+        uuids.append(uuid)
+        createdKeys.append((thing.get('created') or datetime.min, thing['uuid']))
+        owner = thing['owner'].encode()
+        if owner not in ownerStrings:
+            ownerStrings[owner] = writeString(owner)
+        owners.setdefault(owner, []).append(number)
+    recordTableOffset = position
+    for entry in entries:
+        position += outfile.write(RECORD_ENTRY.pack(*entry))
+    uuidIndexOffset = position
+    for number in sorted(range(len(uuids)), key=uuids.__getitem__):
+        position += outfile.write(RECORD_NUMBER.pack(number))
+    ownerTableOffset = position
+    listOffset = ownerTableOffset + OWNER_ENTRY.size * len(owners)
+    for owner in sorted(owners):
+        position += outfile.write(OWNER_ENTRY.pack(ownerStrings[owner], len(owner), listOffset, len(owners[owner])))
+        listOffset += RECORD_NUMBER.size * len(owners[owner])
+    for owner in sorted(owners):
+        for number in sorted(owners[owner], key=createdKeys.__getitem__):
+            position += outfile.write(RECORD_NUMBER.pack(number))
+    createdIndexOffset = position
+    for number in sorted(range(len(createdKeys)), key=createdKeys.__getitem__):
+        position += outfile.write(RECORD_NUMBER.pack(number))
+    outfile.seek(0)
+    outfile.write(HEADER.pack(
+        MAGIC, VERSION, len(entries), len(owners), recordTableOffset, uuidIndexOffset, ownerTableOffset,
+        createdIndexOffset
+    ))
+    return len(entries)
+
+
+class OffsetList:
+    'Read-only sequence of the uint32 values stored at an offset of a buffer'
+
+    def __init__(self, buffer, offset, length):
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        return RECORD_NUMBER.unpack_from(self.buffer, self.offset + i * RECORD_NUMBER.size)[0]
+
+
+class KeyList:
+    'Read-only sequence of the strings of a list of thing or owner numbers, for binary searches'
+
+    def __init__(self, numbers, key):
+        self.numbers = numbers
+        self.key = key
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, i):
+        return self.key(self.numbers[i])
+
+
+class Snapshot:
+    '''
+    Read-only view of a snapshot file written by writeSnapshot(). The file is memory mapped and the things are only
+    parsed when they are read, so that it can serve getThing() and listThings() right after being opened.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as infile:
+            self.buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self.buffer, 0)
+        (magic, version, self.count, self.ownerCount, self.recordTableOffset, uuidIndexOffset) = header[:6]
+        self.ownerTableOffset = header[6]
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise ValueError('{0} is not a version {1} thing snapshot'.format(path, VERSION))
+        self.uuidIndex = OffsetList(self.buffer, uuidIndexOffset, self.count)
+        self.createdIndex = OffsetList(self.buffer, header[7], self.count)
+        self.uuids = KeyList(self.uuidIndex, self.uuidAt)
+        self.owners = KeyList(range(self.ownerCount), self.ownerAt)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.buffer.close()
+
+    def string(self, offset, length):
+        return self.buffer[offset:offset + length].decode()
+
+    def uuidAt(self, number):
+        (recordOffset, recordLength, uuidOffset, uuidLength) = RECORD_ENTRY.unpack_from(
+            self.buffer, self.recordTableOffset + number * RECORD_ENTRY.size
+        )
+        return self.string(uuidOffset, uuidLength)
+
+    def ownerAt(self, i):
+        (ownerOffset, ownerLength, listOffset, listLength) = OWNER_ENTRY.unpack_from(
+            self.buffer, self.ownerTableOffset + i * OWNER_ENTRY.size
+        )
+        return self.string(ownerOffset, ownerLength)
+
+    def thingAt(self, number):
+        'Parses the thing with the given number'
+        (recordOffset, recordLength, uuidOffset, uuidLength) = RECORD_ENTRY.unpack_from(
+            self.buffer, self.recordTableOffset + number * RECORD_ENTRY.size
+        )
+        thing = json.loads(self.string(recordOffset, recordLength))
+        jsonutils.convertDatetimeValues(thing)
+        return thing
+
+    def numbers(self, owner):
+        'Returns the sequence of the numbers of the things of the owner (of all the things if None), by created'
+        if owner is None:
+            return self.createdIndex
+        i = bisect.bisect_left(self.owners, owner)
+        if i == self.ownerCount or self.ownerAt(i) != owner:
+            return range(0)
+        (ownerOffset, ownerLength, listOffset, listLength) = OWNER_ENTRY.unpack_from(
+            self.buffer, self.ownerTableOffset + i * OWNER_ENTRY.size
+        )
+        return OffsetList(self.buffer, listOffset, listLength)
+
+    def getThing(self, uuid):
+        i = bisect.bisect_left(self.uuids, uuid)
+        if i == self.count or self.uuids[i] != uuid:
+            return None
+        return self.thingAt(self.uuidIndex[i])
+
+    def listThings(self, owner, offset=0, limit=None):
+        numbers = self.numbers(owner)
+        return [self.thingAt(number) for number in numbers[offset:None if limit is None else offset + limit]]
+
+    def iterThings(self, owner):
+        for number in self.numbers(owner):
+            yield self.thingAt(number)
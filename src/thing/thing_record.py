@@ -0,0 +1,44 @@
+import sys
+
+FIELDS = ('uuid', 'owner', 'name', 'description', 'created', 'lastModified')
+
+
+class ThingRecord:
+    '''
+    Compact in-memory representation of a thing: the fields are slots instead of the entries of a per-thing dict, and
+    the owner strings are interned so that the things of an organization share one. Supports the read-only subset of
+    the dict interface used by the repository indexes; it is converted back to a dict with toDict() before leaving the
+    repository.
+    '''
+
+    __slots__ = FIELDS
+
+    def __init__(self, uuid, owner, name, description, created, lastModified):
+        self.uuid = uuid
+        self.owner = None if owner is None else sys.intern(owner)
+        self.name = name
+        self.description = description
+        self.created = created
+        self.lastModified = lastModified
+
+    def fromDict(cls, thing):
+        return cls(*(thing.get(field) for field in FIELDS))
+    fromDict = classmethod(fromDict)
+
+    def toDict(self):
+        return {field: getattr(self, field) for field in FIELDS if getattr(self, field) is not None}
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        if field not in FIELDS or getattr(self, field) is None:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __eq__(self, other):
+        return isinstance(other, ThingRecord) and all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    def __repr__(self):
+        return 'ThingRecord({0})'.format(', '.join('{0}={1!r}'.format(field, getattr(self, field)) for field in FIELDS))
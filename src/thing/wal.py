@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+
+import src.commons.jsonutils as jsonutils
+import src.commons.ndjson as ndjson
+
+PUT_OPERATION = 'put'
+DELETE_OPERATION = 'delete'
+
+
+def readLog(path, logger=None, repair=False):
+    '''
+    Iterates over the records of a write-ahead log file, if it exists. A malformed or unterminated last line, left by a
+    crash in the middle of a write, ends the log; with repair the file is truncated before it, so that the records
+    appended next start on a line of their own instead of extending the torn one.
+    '''
+    if not os.path.exists(path):
+        return
+    validLength = 0
+    with open(path, 'rb') as infile:
+        for (lineNumber, line) in enumerate(infile, 1):
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('Unterminated line')
+                record = json.loads(line.decode())
+            except ValueError:
+                if logger is not None:
+                    logger.warn('Ignoring the torn write-ahead log line %d of %s', lineNumber, path)
+                break
+            validLength += len(line)
+            jsonutils.convertDatetimeValues(record)
+            yield record
+    if repair and validLength < os.path.getsize(path):
+        with open(path, 'r+b') as outfile:
+            outfile.truncate(validLength)
+            os.fsync(outfile.fileno())
+
+
+def syncDirectory(path):
+    'Makes the creation and the renames of the files of a directory durable'
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class WriteAheadLog:
+    '''
+    Append-only log of the repository writes, one json line per write. The lines are written to the operating system
+    right away, but fsynced with a group commit: a background thread fsyncs the writes of the last syncIntervalSeconds
+    at once, so that a crash loses at most that interval of writes. With syncIntervalSeconds=0 every write is fsynced
+    before returning.
+    '''
+
+    def __init__(self, path, syncIntervalSeconds=0.05, records=0):
+        'records is the number of records already in the log, counted for the compaction'
+        self.path = path
+        self.syncIntervalSeconds = syncIntervalSeconds
+        self.lock = threading.Lock()
+        self.outfile = open(path, 'a')
+        self.records = records
+        self.dirty = False
+        self.stopped = threading.Event()
+        self.syncer = None
+        if syncIntervalSeconds > 0:
+            self.syncer = threading.Thread(target=self.syncPeriodically, name='wal-sync', daemon=True)
+            self.syncer.start()
+
+    def syncPeriodically(self):
+        while not self.stopped.wait(self.syncIntervalSeconds):
+            self.sync()
+
+    def append(self, records):
+        'Appends a list of records with a single write'
+        with self.lock:
+            self.outfile.write(''.join(ndjson.dumps(record) for record in records))
+            self.outfile.flush()
+            self.records += len(records)
+            self.dirty = True
+            if self.syncer is None:
+                self.syncLocked()
+
+    def put(self, things):
+        self.append([{'operation': PUT_OPERATION, 'thing': thing} for thing in things])
+
+    def delete(self, uuid):
+        self.append([{'operation': DELETE_OPERATION, 'uuid': uuid}])
+
+    def syncLocked(self):
+        if self.dirty:
+            os.fsync(self.outfile.fileno())
+            self.dirty = False
+
+    def sync(self):
+        'Makes the records appended so far durable'
+        with self.lock:
+            if not self.outfile.closed:
+                self.syncLocked()
+
+    def truncate(self):
+        'Empties the log, once its records are in a durable snapshot'
+        with self.lock:
+            self.outfile.close()
+            self.outfile = open(self.path, 'w')
+            os.fsync(self.outfile.fileno())
+            self.records = 0
+            self.dirty = False
+
+    def close(self):
+        self.stopped.set()
+        if self.syncer is not None:
+            self.syncer.join()
+        with self.lock:
+            self.syncLocked()
+            self.outfile.close()